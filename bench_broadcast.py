@@ -0,0 +1,154 @@
+"""
+ ClassName bench_broadcast
+ Description: 观众广播微基准 (手动运行: python bench_broadcast.py)
+ 模拟 1 / 50 / 500 个观众，对比：
+   legacy   逐个观众 await send_json (每个观众各编码一次，旧实现，无攒批，每回合发完整面板)
+   percli   频道 + 每观众发送队列 + 流式攒批 + 面板补丁，但每个观众各自 json.dumps
+            (频道预先编码的那一份仍会生成，只是不被使用，计入编码次数)
+   json     同上，频道内编码一次，所有观众共用 (标准库 json)
+   orjson   同上，使用 orjson 编码 (未安装时跳过)
+ legacy 与 percli 的差别是队列 / 攒批 / 补丁，percli 与 json 的差别只是"编码一次"。
+ 每个"回合"包含 1 条日志、1 条流开始、若干流式片段和 1 次面板更新 (底池与筹码每回合都变化，不会被去重)；
+ 每次广播后让出一次事件循环，对应游戏回调中的 pacer.sleep (headless 档位)。
+ 输出耗时、编码次数、每观众收到的帧数与字节数以及所有观众合计的字节数。
+"""
+import asyncio
+import json
+import time
+
+import spectators
+
+SPECTATOR_COUNTS = (1, 50, 500)
+TURNS = 20
+CHUNKS_PER_TURN = 120
+CHUNK_TEXT = "思考中…"
+
+
+class FakeWebSocket:
+    """只统计帧数与字节数的假连接；send_json 与 Starlette 一样每次调用都编码。"""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        self.frames += 1
+        self.bytes += len(text)
+
+    async def send_json(self, message: dict):
+        await self.send_text(json.dumps(message, separators=(",", ":"), ensure_ascii=False))
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def _panel_payload(turn: int) -> dict:
+    """第 turn 回合的面板：底池与当前行动玩家的筹码每回合都变化。"""
+    players = []
+    for i in range(4):
+        players.append({
+            "name": f"Player{i}", "chips": 1000 + i * 37 - (turn * 20 if i == turn % 4 else 0),
+            "status": "在局中", "hand": "♠A ♥K ♦Q",
+            "experience": 12.5, "pressure": 0.42, "loan": None, "active_effects": ["锁筹卡 (剩余 1 回合)"],
+            "inventory": [{"id": "ITM_003", "name": "锁筹卡", "description": "暂时禁止一名对手执行 RAISE。"}] * 3,
+        })
+    return {"hand_count": 7, "current_pot": 640 + turn * 20, "global_alert_level": 35.0, "players": players}
+
+
+class CountingEncoder:
+    """包装编码函数并统计调用次数。"""
+
+    def __init__(self, encoder):
+        self.encoder = encoder
+        self.calls = 0
+
+    def __call__(self, message: dict) -> str:
+        self.calls += 1
+        return self.encoder(message)
+
+
+async def _legacy_broadcast(clients, message: dict):
+    for ws in clients:
+        await ws.send_json(message)
+    await asyncio.sleep(0)
+
+
+async def run_legacy(count: int):
+    clients = [FakeWebSocket() for _ in range(count)]
+    started = time.perf_counter()
+    for turn in range(TURNS):
+        await _legacy_broadcast(clients, {"type": "log", "message": f"--- 第 {turn} 回合 ---"})
+        await _legacy_broadcast(clients, {"type": "stream_start", "message": "【上帝视角】Player0 正在思考: "})
+        for _ in range(CHUNKS_PER_TURN):
+            await _legacy_broadcast(clients, {"type": "stream_chunk", "chunk": CHUNK_TEXT})
+        await _legacy_broadcast(clients, {"type": "panel_update", "data": _panel_payload(turn)})
+    elapsed = time.perf_counter() - started
+    return elapsed, sum(ws.frames for ws in clients), clients  # send_json 每帧编码一次
+
+
+async def run_channel(count: int, encoder, per_client: bool = False):
+    """per_client=True 时丢弃频道预先编码的文本，由各观众的写任务自行编码。"""
+    counting = spectators.encode_frame = CountingEncoder(encoder)
+    channel = spectators.ConnectionManager()
+    clients = [FakeWebSocket() for _ in range(count)]
+    for ws in clients:
+        await channel.connect(ws)
+    if per_client:
+        for client in channel.active_spectators.values():
+            client.enqueue = lambda message, text=None, _enqueue=client.enqueue: _enqueue(message)
+    counting.calls = 0  # 不计连接时的面板快照
+    started = time.perf_counter()
+    for turn in range(TURNS):
+        await channel.broadcast_log(f"--- 第 {turn} 回合 ---")
+        await asyncio.sleep(0)
+        await channel.broadcast_stream_start("【上帝视角】Player0 正在思考: ")
+        await asyncio.sleep(0)
+        for _ in range(CHUNKS_PER_TURN):
+            await channel.broadcast_stream_chunk(CHUNK_TEXT)
+            await asyncio.sleep(0)
+        await channel.broadcast_panel_data(_panel_payload(turn))
+        await asyncio.sleep(0)
+    channel._flush_stream()
+    while channel.queue_depth():
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - started
+
+    writers = [client._writer_task for client in channel.active_spectators.values()]
+    for ws in clients:
+        channel.disconnect(ws)
+    await asyncio.gather(*writers, return_exceptions=True)
+    await asyncio.sleep(0)
+    return elapsed, counting.calls, clients
+
+
+async def main():
+    modes = [("legacy", None, False), ("percli", spectators._encode_stdlib, True),
+             ("json", spectators._encode_stdlib, False)]
+    if spectators.orjson is not None:
+        modes.append(("orjson", spectators._encode_orjson, False))
+    else:
+        print("(未安装 orjson，跳过 orjson 模式)")
+
+    default_encoder = spectators.encode_frame
+    print(f"{'观众数':>6} {'模式':>8} {'耗时(ms)':>10} {'编码次数':>9} {'每观众帧数':>10} {'每观众KB':>9} {'合计MB':>8}")
+    try:
+        for count in SPECTATOR_COUNTS:
+            for name, encoder, per_client in modes:
+                if encoder is None:
+                    elapsed, encodes, clients = await run_legacy(count)
+                else:
+                    elapsed, encodes, clients = await run_channel(count, encoder, per_client)
+                frames = clients[0].frames
+                kilobytes = clients[0].bytes / 1024
+                total_mb = sum(ws.bytes for ws in clients) / 1024 / 1024
+                print(f"{count:>6} {name:>8} {elapsed * 1000:>10.1f} {encodes:>9} {frames:>10} "
+                      f"{kilobytes:>9.1f} {total_mb:>8.2f}")
+    finally:
+        spectators.encode_frame = default_encoder
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+ ClassName checkpoint
+ Description: 锦标赛检查点 (每手结束后保存，进程重启后从最后完成的一手继续)
+ - 快照来自 GameController.snapshot_state()：筹码、背包、贷款、活跃效果、人设、复盘与私有笔记等。
+ - 每张牌桌一个文件 checkpoints/<牌桌>.json，先写临时文件并 fsync，再原子改名，崩溃时不会留下半个文件。
+ - 锦标赛正常结束后删除检查点；手动停止或崩溃时保留，可通过 start(resume=True) 恢复。
+ - validate_checkpoint() 在开局前检查版本、字段与玩家，牌桌与 GameController.restore_state() 共用。
+"""
+import json
+import os
+from pathlib import Path
+from typing import Iterable, Optional
+
+CHECKPOINT_DIR = Path("checkpoints")
+CHECKPOINT_SUFFIX = ".json"
+CHECKPOINT_VERSION = 1  # 检查点快照格式版本，字段不兼容地变化时递增
+CHECKPOINT_KEYS = (
+    "version", "hand", "players", "persistent_chips", "last_winner_id", "global_alert_level",
+    "personas", "reflections", "observed_moods", "last_speech", "private_impressions",
+    "active_effects", "secret_messages", "player_states",
+)
+
+
+def checkpoint_path(table_id: str, checkpoint_dir: Path = CHECKPOINT_DIR) -> Path:
+    return Path(checkpoint_dir) / f"{table_id}{CHECKPOINT_SUFFIX}"
+
+
+def write_checkpoint(path: Path, state: dict) -> None:
+    """原子写入检查点。阻塞调用，请放在线程中执行。"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read_checkpoint(path: Path) -> Optional[dict]:
+    """读取检查点；不存在时返回 None，内容损坏时抛出 ValueError。"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def validate_checkpoint(state, player_names: Optional[Iterable[str]] = None) -> None:
+    """
+    检查快照能否用于恢复，不能时抛出 ValueError。
+    player_names 给出时，检查点中的玩家须与之相同 (座位顺序每局打乱，不比较顺序)。
+    """
+    if not isinstance(state, dict):
+        raise ValueError("检查点内容不是有效的快照。")
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"不支持的检查点版本: {state.get('version')}")
+    missing = [key for key in CHECKPOINT_KEYS if key not in state]
+    if missing:
+        raise ValueError(f"检查点缺少字段: {', '.join(missing)}")
+    players = state["players"]
+    if not isinstance(players, list) or not all(isinstance(p, dict) and "name" in p and "model" in p
+                                                for p in players):
+        raise ValueError("检查点中的玩家列表无效。")
+    if not (len(players) == len(state["persistent_chips"]) == len(state["player_states"])):
+        raise ValueError("检查点中的玩家、筹码与玩家状态数量不一致。")
+    if player_names is not None and sorted(p["name"] for p in players) != sorted(player_names):
+        raise ValueError("检查点中的玩家与本局不一致。")
+
+
+def remove_checkpoint(path: Path) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,170 @@
+"""
+ ClassName effect_registry
+ Description: 道具/作弊效果登记表 (带索引与到期调度)
+ 效果本身仍是普通 dict（结算逻辑会就地修改 data / streak 等字段），
+ 登记表只负责按 (目标, 效果) / 效果 / (效果, 手牌) 建立索引，并用最小堆调度按回合到期。
+"""
+import heapq
+from typing import Dict, Iterator, List, Optional, Tuple, TypedDict
+
+
+class ActiveEffect(TypedDict, total=False):
+    effect_id: str
+    effect_name: str
+    source_id: Optional[int]
+    target_id: Optional[int]
+    turns_left: Optional[int]  # None = 永久；登记后以 EffectRegistry.turns_left() 为准
+    hand_id: int  # 仅在某一手牌结算的效果 (double_win / loss_refund / bribe_debt)
+    category: str
+    data: dict
+    expires_after_action: bool
+
+
+class EffectRegistry:
+    """
+    活跃效果集合。
+    - 迭代顺序与登记顺序一致（与原 list 行为相同）。
+    - find / consume / with_effect / for_target / for_hand 均为索引查找，不再线性扫描。
+    - tick() 推进一个回合，从最小堆中弹出到期效果，代价与到期数量成正比。
+    """
+
+    def __init__(self):
+        self.version = 0  # 每次增删递增，供缓存判断效果是否变化
+        self._seq = 0
+        self._tick = 0
+        self._effects: Dict[int, ActiveEffect] = {}  # seq -> effect (dict 保持插入顺序)
+        self._seq_of: Dict[int, int] = {}  # id(effect) -> seq
+        self._by_target_effect: Dict[Tuple[Optional[int], str], Dict[int, ActiveEffect]] = {}
+        self._by_target: Dict[Optional[int], Dict[int, ActiveEffect]] = {}
+        self._by_effect: Dict[str, Dict[int, ActiveEffect]] = {}
+        self._by_hand: Dict[Tuple[str, int], Dict[int, ActiveEffect]] = {}
+        self._expire_at: Dict[int, int] = {}  # seq -> 到期回合
+        self._expiry_heap: List[Tuple[int, int]] = []  # (到期回合, seq)，惰性删除
+
+    # ---------- 增删 ----------
+    def add(self, effect: ActiveEffect) -> ActiveEffect:
+        self.version += 1
+        self._seq += 1
+        seq = self._seq
+        self._effects[seq] = effect
+        self._seq_of[id(effect)] = seq
+        effect_id = effect.get("effect_id")
+        target_id = effect.get("target_id")
+        self._by_target_effect.setdefault((target_id, effect_id), {})[seq] = effect
+        self._by_target.setdefault(target_id, {})[seq] = effect
+        self._by_effect.setdefault(effect_id, {})[seq] = effect
+        if effect.get("hand_id") is not None:
+            self._by_hand.setdefault((effect_id, effect["hand_id"]), {})[seq] = effect
+
+        turns_left = effect.get("turns_left")
+        if turns_left is not None:
+            expire_at = self._tick + int(turns_left)
+            self._expire_at[seq] = expire_at
+            heapq.heappush(self._expiry_heap, (expire_at, seq))
+        return effect
+
+    def remove(self, effect: ActiveEffect) -> bool:
+        seq = self._seq_of.pop(id(effect), None)
+        if seq is None or self._effects.get(seq) is not effect:
+            return False
+        del self._effects[seq]
+        self.version += 1
+        self._expire_at.pop(seq, None)  # 堆中的条目在弹出时按失效处理
+        effect_id = effect.get("effect_id")
+        target_id = effect.get("target_id")
+        self._discard(self._by_target_effect, (target_id, effect_id), seq)
+        self._discard(self._by_target, target_id, seq)
+        self._discard(self._by_effect, effect_id, seq)
+        if effect.get("hand_id") is not None:
+            self._discard(self._by_hand, (effect_id, effect["hand_id"]), seq)
+        return True
+
+    @staticmethod
+    def _discard(index: dict, key, seq: int):
+        bucket = index.get(key)
+        if bucket is None:
+            return
+        bucket.pop(seq, None)
+        if not bucket:
+            del index[key]
+
+    def clear(self):
+        version = self.version
+        self.__init__()
+        self.version = version + 1
+
+    # ---------- 查询 ----------
+    def find(self, target_id: Optional[int], effect_id: str) -> Optional[ActiveEffect]:
+        """返回目标身上最早登记的该效果。"""
+        bucket = self._by_target_effect.get((target_id, effect_id))
+        return next(iter(bucket.values())) if bucket else None
+
+    def find_all(self, target_id: Optional[int], effect_id: str) -> List[ActiveEffect]:
+        return list(self._by_target_effect.get((target_id, effect_id), {}).values())
+
+    def consume(self, target_id: Optional[int], effect_id: str) -> Optional[ActiveEffect]:
+        effect = self.find(target_id, effect_id)
+        if effect:
+            self.remove(effect)
+        return effect
+
+    def first(self, effect_id: str) -> Optional[ActiveEffect]:
+        """返回全局最早登记的该效果 (例如伪造底池，与目标无关)。"""
+        bucket = self._by_effect.get(effect_id)
+        return next(iter(bucket.values())) if bucket else None
+
+    def with_effect(self, effect_id: str) -> List[ActiveEffect]:
+        return list(self._by_effect.get(effect_id, {}).values())
+
+    def for_target(self, target_id: Optional[int]) -> List[ActiveEffect]:
+        return list(self._by_target.get(target_id, {}).values())
+
+    def for_hand(self, effect_id: str, hand_id: int) -> List[ActiveEffect]:
+        """只在指定手牌结算的效果。"""
+        return list(self._by_hand.get((effect_id, hand_id), {}).values())
+
+    def turns_left(self, effect: ActiveEffect) -> Optional[int]:
+        seq = self._seq_of.get(id(effect))
+        if seq is None or seq not in self._expire_at:
+            return effect.get("turns_left")
+        return self._expire_at[seq] - self._tick
+
+    # ---------- 到期调度 ----------
+    def tick(self) -> List[ActiveEffect]:
+        """推进一个回合，移除并返回到期的效果 (按登记顺序)。"""
+        self._tick += 1
+        expired: List[ActiveEffect] = []
+        while self._expiry_heap and self._expiry_heap[0][0] <= self._tick:
+            expire_at, seq = heapq.heappop(self._expiry_heap)
+            if self._expire_at.get(seq) != expire_at:
+                continue  # 已被提前移除
+            effect = self._effects[seq]
+            effect["turns_left"] = 0
+            self.remove(effect)
+            expired.append(effect)
+        return expired
+
+    def snapshot(self) -> List[ActiveEffect]:
+        """导出当前效果的副本，turns_left 为实时剩余回合。"""
+        result = []
+        for effect in self._effects.values():
+            copy = dict(effect)
+            if "turns_left" in effect:
+                copy["turns_left"] = self.turns_left(effect)
+            result.append(copy)
+        return result
+
+    def restore(self, effects: List[ActiveEffect]):
+        """(新) 从 snapshot() 的结果重建 (检查点恢复)，剩余回合从当前回合重新计算。"""
+        self.clear()
+        for effect in effects:
+            self.add(dict(effect))
+
+    def __iter__(self) -> Iterator[ActiveEffect]:
+        return iter(list(self._effects.values()))
+
+    def __len__(self) -> int:
+        return len(self._effects)
+
+    def __bool__(self) -> bool:
+        return bool(self._effects)
@@ -0,0 +1,188 @@
+"""
+ ClassName game_assets
+ Description: 进程级共享的静态资源缓存 (Prompt 模板 / 道具目录 / 拍卖权重)
+ 资源只在首次使用或文件修改时间变化时重新加载；每次加载生成一份不可变快照，
+ 控制器在创建时取用当前快照，同一进程内的多张牌桌共享同一份解析结果。
+"""
+import json
+import string
+import threading
+import time
+from dataclasses import dataclass
+from itertools import accumulate
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Mapping, Optional, Tuple
+
+from prompt_layout import split_template
+
+BASE_DIR = Path(__file__).parent.resolve()
+ITEM_STORE_PATH = BASE_DIR / "items_store.json"
+PROMPT_DIR = BASE_DIR / "prompt"
+
+# 模板名 -> (文件, 调用方会提供的占位符)
+TEMPLATE_SPECS: Dict[str, Tuple[Path, FrozenSet[str]]] = {
+    "auction": (PROMPT_DIR / "auction_bid_prompt.txt", frozenset({
+        "item_name", "item_description", "item_value", "my_assets_str", "other_bidders_status",
+        "auction_context", "current_highest_bid", "min_next_bid_to_raise"})),
+    "create_persona": (PROMPT_DIR / "create_persona_prompt.txt", frozenset({"self_name", "used_aliases_str"})),
+    "decide_action": (PROMPT_DIR / "decide_action_prompt.txt", frozenset({
+        "self_name", "game_state_summary", "my_hand", "available_actions", "next_player_name", "my_persona",
+        "my_status", "opponent_personas", "opponent_reflections", "opponent_private_impressions_str", "observed_speech_str",
+        "received_secret_messages", "player_inventory", "field_item_intel", "min_raise_increment", "dealer_name",
+        "observed_moods", "multiplier", "call_cost", "table_seating", "opponent_reference"})),
+    "defend": (PROMPT_DIR / "defend_prompt.txt", frozenset({
+        "self_name", "accuser_name", "partner_name", "evidence_log"})),
+    "reflect": (PROMPT_DIR / "reflect_prompt_template.txt", frozenset({
+        "self_name", "round_history", "round_result", "current_impressions_json", "player_self_details",
+        "opponent_name_list"})),
+    "vote": (PROMPT_DIR / "vote_prompt.txt", frozenset({
+        "self_name", "accuser_name", "target_name_1", "target_name_2", "evidence_log", "defense_speech_1",
+        "defense_speech_2"})),
+    "bribe": (PROMPT_DIR / "bribe_prompt.txt", frozenset({
+        "self_name", "bribe_cost", "success_chance_percent", "penalty_chips", "success_chance",
+        "payment_method_string", "consequence_string"})),
+}
+
+RELOAD_CHECK_INTERVAL = 2.0  # 两次检查文件修改时间的最短间隔 (秒)
+
+
+@dataclass(frozen=True)
+class ItemInfo:
+    item_id: str
+    name: str
+    type: str
+    cost_estimate: int
+    description: str
+    auction_weight: int
+
+
+@dataclass(frozen=True)
+class GameAssets:
+    templates: Mapping[str, str]
+    template_placeholders: Mapping[str, FrozenSet[str]]
+    items: Mapping[str, ItemInfo]
+    item_catalog: Mapping[str, Mapping[str, object]]  # 原始 JSON 结构 (只读)，兼容按 .get() 取字段的旧代码
+    auction_item_ids: Tuple[str, ...]
+    auction_cum_weights: Tuple[int, ...]  # 与 auction_item_ids 对应的累计权重，可直接用于 random.choices
+    loaded_at: float
+
+
+def _template_placeholders(text: str) -> FrozenSet[str]:
+    names = set()
+    for _literal, field, _spec, _conv in string.Formatter().parse(text):
+        if field:
+            names.add(field.split(".")[0].split("[")[0])
+    return frozenset(names)
+
+
+def _load_templates() -> Tuple[Dict[str, str], Dict[str, FrozenSet[str]]]:
+    templates: Dict[str, str] = {}
+    placeholders: Dict[str, FrozenSet[str]] = {}
+    for name, (path, allowed) in TEMPLATE_SPECS.items():
+        try:
+            text = path.read_text(encoding="utf-8").strip()
+            found = _template_placeholders(text)
+        except Exception as e:
+            templates[name] = ""  # 存入空字符串以防 KeyError
+            placeholders[name] = frozenset()
+            print(f"【上帝(严重警告)】: 加载 Prompt 模板 {path.name} 失败: {e}")
+            continue
+
+        unknown = found - allowed
+        if unknown:
+            print(f"【上帝(严重警告)】: Prompt 模板 {path.name} 含有调用方不会提供的占位符: "
+                  f"{', '.join(sorted(unknown))}，调用时将出错。")
+        prefix = split_template(text)[0]
+        if prefix and _template_placeholders(prefix):
+            print(f"【上帝(警告)】: Prompt 模板 {path.name} 的规则前缀含有占位符，前缀缓存将失效。")
+        templates[name] = text
+        placeholders[name] = found
+    return templates, placeholders
+
+
+def _load_item_catalog() -> Dict[str, Dict[str, object]]:
+    try:
+        with ITEM_STORE_PATH.open("r", encoding="utf-8") as fp:
+            return json.load(fp)
+    except FileNotFoundError:
+        print(f"【上帝(警告)】: 未找到 {ITEM_STORE_PATH.name}，拍卖行暂不可用。")
+    except json.JSONDecodeError as exc:
+        print(f"【上帝(错误)】: 解析 {ITEM_STORE_PATH.name} 失败: {exc}。")
+    return {}
+
+
+def _build_assets() -> GameAssets:
+    templates, placeholders = _load_templates()
+    raw_catalog = _load_item_catalog()
+
+    items: Dict[str, ItemInfo] = {}
+    for item_id, info in raw_catalog.items():
+        items[item_id] = ItemInfo(
+            item_id=item_id,
+            name=str(info.get("name", item_id)),
+            type=str(info.get("type", "")),
+            cost_estimate=int(info.get("cost_estimate", 0) or 0),
+            description=str(info.get("description", "")),
+            auction_weight=max(1, int(info.get("auction_weight", 1))),
+        )
+
+    item_ids = tuple(raw_catalog.keys())
+    return GameAssets(
+        templates=MappingProxyType(templates),
+        template_placeholders=MappingProxyType(placeholders),
+        items=MappingProxyType(items),
+        item_catalog=MappingProxyType({
+            item_id: MappingProxyType(dict(info)) for item_id, info in raw_catalog.items()
+        }),
+        auction_item_ids=item_ids,
+        auction_cum_weights=tuple(accumulate(items[item_id].auction_weight for item_id in item_ids)),
+        loaded_at=time.time(),
+    )
+
+
+class AssetCache:
+    """线程安全的资源缓存；文件修改时间变化时自动重新加载。"""
+
+    def __init__(self, check_interval: float = RELOAD_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self.reload_count = 0
+        self._lock = threading.Lock()
+        self._assets: Optional[GameAssets] = None
+        self._mtimes: Dict[Path, Optional[float]] = {}
+        self._last_check = 0.0
+
+    @staticmethod
+    def _watched_paths():
+        return [ITEM_STORE_PATH] + [path for path, _allowed in TEMPLATE_SPECS.values()]
+
+    @staticmethod
+    def _mtime(path: Path) -> Optional[float]:
+        try:
+            return path.stat().st_mtime
+        except OSError:
+            return None
+
+    def get(self) -> GameAssets:
+        now = time.monotonic()
+        assets = self._assets
+        if assets is not None and now - self._last_check < self.check_interval:
+            return assets
+
+        with self._lock:
+            self._last_check = now
+            mtimes = {path: self._mtime(path) for path in self._watched_paths()}
+            if self._assets is None or mtimes != self._mtimes:
+                if self._assets is not None:
+                    print("【上帝(提示)】: 检测到模板或道具目录已修改，重新加载资源。")
+                self._assets = _build_assets()
+                self._mtimes = mtimes
+                self.reload_count += 1
+            return self._assets
+
+
+ASSET_CACHE = AssetCache()
+
+
+def get_game_assets() -> GameAssets:
+    return ASSET_CACHE.get()
@@ -3,17 +3,27 @@ import json
 import asyncio
 import random
 from pathlib import Path
-from typing import List, Dict, Callable, Awaitable, Tuple, Optional, Set
+from typing import List, Dict, Callable, Awaitable, Tuple, Optional, Set, Mapping
 
 from zhajinhua import ZhajinhuaGame, GameConfig, Action
 from game_rules import ActionType, INT_TO_RANK, SUITS, GameConfig, evaluate_hand, Card, RANK_TO_INT, HandType, \
     PlayerState
 from player import Player
+from llm_client import PROMPT_CACHE_STATS
+from pacing import Pacer
+from effect_registry import EffectRegistry
+from hand_event_log import HandEventLog, DEFAULT_ARCHIVE_PER_PLAYER
+from prompt_context import PromptContextCache, TOPIC_PERSONA, TOPIC_REFLECTION, TOPIC_IMPRESSION, TOPIC_SPEECH, \
+    TOPIC_MOOD, TOPIC_INVENTORY
+from prompt_budget import PromptBudgeter
+from prompt_layout import build_messages, render_text
+from game_assets import get_game_assets
+from persona_store import get_persona_store
+from checkpoint import CHECKPOINT_VERSION, validate_checkpoint
 
 BASE_DIR = Path(__file__).parent.resolve()
-ITEM_STORE_PATH = BASE_DIR / "items_store.json"
-AUCTION_PROMPT_PATH = BASE_DIR / "prompt/auction_bid_prompt.txt"
-USED_PERSONA_PATH = BASE_DIR / "used_personas.json"  # <-- 📌 新增人设记录路径
+# (新) 决策失败时返回的 FOLD 以 mood 标明原因，按此归类强制弃牌 (forced_fold 事件)
+FORCED_FOLD_CAUSES = {"超时": "timeout", "解析失败": "parse", "错误": "exception", "崩溃": "exception"}
 
 
 class SystemVault:
@@ -132,6 +142,44 @@ class SystemVault:
         return None
 
 
+class DeferredStream:
+    """(新) 流式输出缓冲器：先缓存 stream_start / stream_chunk，轮到时按序回放，之后直接直播。"""
+
+    def __init__(self,
+                 stream_start_cb: Callable[..., Awaitable[None]],
+                 stream_chunk_cb: Callable[..., Awaitable[None]]):
+        self._stream_start_cb = stream_start_cb
+        self._stream_chunk_cb = stream_chunk_cb
+        self._buffer: List[Tuple[str, str]] = []
+        self._live = False
+        self._lock = asyncio.Lock()  # 保证回放与后续直播的顺序
+
+    async def stream_start(self, message: str) -> None:
+        async with self._lock:
+            if self._live:
+                await self._stream_start_cb(message)
+            else:
+                self._buffer.append(("start", message))
+
+    async def stream_chunk(self, chunk: str) -> None:
+        async with self._lock:
+            if self._live:
+                await self._stream_chunk_cb(chunk)
+            else:
+                self._buffer.append(("chunk", chunk))
+
+    async def go_live(self) -> None:
+        """回放已缓存的内容，并切换为直播模式。"""
+        async with self._lock:
+            for kind, text in self._buffer:
+                if kind == "start":
+                    await self._stream_start_cb(text)
+                else:
+                    await self._stream_chunk_cb(text)
+            self._buffer.clear()
+            self._live = True
+
+
 class GameController:
     """
     (已修改：修复 _build_panel_data 中的 NameError)
@@ -142,7 +190,11 @@ class GameController:
                  god_print_callback: Callable[..., Awaitable[None]],
                  god_stream_start_callback: Callable[..., Awaitable[None]],
                  god_stream_chunk_callback: Callable[..., Awaitable[None]],
-                 god_panel_update_callback: Callable[..., Awaitable[None]]):
+                 god_panel_update_callback: Callable[..., Awaitable[None]],
+                 pacer: Optional[Pacer] = None,
+                 event_callback: Optional[Callable[[str, dict], None]] = None,
+                 rng: Optional[random.Random] = None,
+                 checkpoint_callback: Optional[Callable[[dict], Awaitable[None]]] = None):
 
         self.player_configs = player_configs
         self.num_players = len(player_configs)
@@ -164,62 +216,40 @@ class GameController:
         self.LEAK_DEALER_FAVOR_BASE = 0.40
         self.LEAK_BRIBE_SWAP_BASE = 0.40
 
-        try:
-            with ITEM_STORE_PATH.open("r", encoding="utf-8") as fp:
-                self.item_catalog: Dict[str, Dict[str, object]] = json.load(fp)
-        except FileNotFoundError:
-            self.item_catalog = {}
-            print(f"【上帝(警告)】: 未找到 {ITEM_STORE_PATH.name}，拍卖行暂不可用。")
-        except json.JSONDecodeError as exc:
-            self.item_catalog = {}
-            print(f"【上帝(错误)】: 解析 {ITEM_STORE_PATH.name} 失败: {exc}。")
-
-            # --- [代码一致性修复]：集中加载所有 Prompt 模板 ---
-        self.prompt_templates = {}
-        prompt_paths = {
-            "auction": AUCTION_PROMPT_PATH,
-            "create_persona": BASE_DIR / "prompt/create_persona_prompt.txt",
-            "decide_action": BASE_DIR / "prompt/decide_action_prompt.txt",
-            "defend": BASE_DIR / "prompt/defend_prompt.txt",
-            "reflect": BASE_DIR / "prompt/reflect_prompt_template.txt",
-            "vote": BASE_DIR / "prompt/vote_prompt.txt",
-            "bribe": BASE_DIR / "prompt/bribe_prompt.txt",  # <-- [新功能] 增加贿赂 Prompt
+        # (新) 密信记录保留窗口：最近 N 手保留在索引区，更早的压缩存档 (审判仍可调取)
+        self.SECRET_LOG_RETENTION_HANDS = 5
+        self.EVIDENCE_ARCHIVE_PER_PLAYER = DEFAULT_ARCHIVE_PER_PLAYER
+        self.PERSONA_MAX_ATTEMPTS = 2  # (新) 人设与历史近似重复时最多重新生成 1 次
 
-        }
-        for name, path in prompt_paths.items():
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    self.prompt_templates[name] = f.read().strip()
-            except Exception as e:
-                self.prompt_templates[name] = ""  # 存入空字符串以防 KeyError
-                print(f"【上帝(严重警告)】: 加载 Prompt 模板 {path.name} 失败: {e}")
-        # --- [修复结束] ---
+        # (新) 模板与道具目录来自进程级共享缓存 (只读快照，文件修改后自动重新加载)
+        self.assets = get_game_assets()
+        self.item_catalog: Mapping[str, Mapping[str, object]] = self.assets.item_catalog
+        self.prompt_templates: Mapping[str, str] = self.assets.templates
 
         self.vault = SystemVault()
-        self.active_effects: List[Dict[str, object]] = []
+        self.active_effects: EffectRegistry = EffectRegistry()
 
         default_chips = GameConfig.initial_chips
         self.persistent_chips: List[int] = [default_chips] * self.num_players
 
-        # --- [人设记录] 加载已使用的代号 (现在是完整的文本) ---
-        self.used_personas: Set[str] = set()
-        try:
-            if USED_PERSONA_PATH.exists():
-                with USED_PERSONA_PATH.open("r", encoding="utf-8") as fp:
-                    content = fp.read().strip()
-                    if content:
-                        data = json.loads(content)
-                        # 📌 关键：从简化的 [{"text": ...}, ...] 格式中提取完整的文本
-                        self.used_personas.update(p.get("text") for p in data if p.get("text"))
-        except Exception as exc:
-            # 这里的 exc 可能是 json.JSONDecodeError 或其他，均视为加载失败
-            print(f"【上帝(警告)】: 加载人设记录失败: {exc}。将从空白开始。")
-        # --- [修复结束] ---
+        # --- [人设记录] 追加式人设存储 (进程内共享，带近似重复索引) ---
+        self.persona_store = get_persona_store()
 
         self.god_print = god_print_callback
         self.god_stream_start = god_stream_start_callback
         self.god_stream_chunk = god_stream_chunk_callback
         self.god_panel_update = god_panel_update_callback
+        # (新) 所有停顿统一交给节奏控制器 (由服务器持有，可随时切换档位)
+        self.pacer = pacer or Pacer()
+        # (新) 牌局用到的所有随机数都来自 self.rng；牌桌传入带种子的实例，重放时即可复现 (默认使用全局随机数)
+        self.rng = rng if rng is not None else random
+        # (新) 结构化事件 (开局、发牌、动作、道具、作弊、审判、结算、LLM 调用)，由牌桌写入 JSONL
+        self.god_event = event_callback
+        if event_callback is not None:
+            for i, player in enumerate(self.players):
+                player.llm_client.call_listener = lambda meta, i=i: self._emit("llm_call", player=i, **meta)
+        # (新) 每手结束后收到检查点快照 (snapshot_state)，由牌桌原子写入磁盘
+        self.checkpoint = checkpoint_callback
 
         self.hand_count = 0
         self.last_winner_id = 0
@@ -229,9 +259,18 @@ class GameController:
         self.player_observed_moods: Dict[int, str] = {}
         self.player_last_speech: Dict[int, str | None] = {}
         self.player_private_impressions: Dict[int, Dict[int, str]] = {}
-
-        self.secret_message_log: List[Tuple[int, int, int, str]] = []
-        self.cheat_action_log: List[Tuple[int, int, str, Dict]] = []  # (新) 记录作弊
+        # (新) 决策 prompt 段落缓存，上述字典或背包变化时需调用 invalidate
+        self.prompt_context = PromptContextCache()
+        self.prompt_budgeter = PromptBudgeter()  # (新) 按模型预算裁剪低优先级段落
+
+        # (hand, sender, recipient, message)
+        self.secret_message_log = HandEventLog(
+            participant_fields=(1, 2),
+            retention_hands=self.SECRET_LOG_RETENTION_HANDS,
+            archive_per_player=self.EVIDENCE_ARCHIVE_PER_PLAYER
+        )
+        # (hand, actor, cheat_type, payload)，每手开始时清空
+        self.cheat_action_log = HandEventLog(participant_fields=(1,))  # (新) 记录作弊
 
         # (新) 用于在解析动作后输出额外的警告信息
         self._parse_warnings: List[str] = []
@@ -259,6 +298,62 @@ class GameController:
         self._ante_increase_interval = 5
         self._ante_increment = 20
 
+    def _emit(self, kind: str, **fields) -> None:
+        """(新) 记录一条结构化事件 (未设置回调时不做任何事)。"""
+        if self.god_event is not None:
+            self.god_event(kind, dict(fields, hand=self.hand_count))
+
+    # ---------- (新) 检查点 ----------
+    def snapshot_state(self) -> dict:
+        """导出手牌之间需要保留的全部状态 (JSON 可序列化)，用于进程重启后恢复锦标赛。"""
+        rng_state = self.rng.getstate() if isinstance(self.rng, random.Random) else None
+        return {
+            "version": CHECKPOINT_VERSION,
+            "hand": self.hand_count,
+            "players": [dict(config) for config in self.player_configs],
+            "persistent_chips": list(self.persistent_chips),
+            "last_winner_id": self.last_winner_id,
+            "global_alert_level": self.global_alert_level,
+            "personas": dict(self.player_personas),
+            "reflections": dict(self.player_reflections),
+            "observed_moods": dict(self.player_observed_moods),
+            "last_speech": dict(self.player_last_speech),
+            "private_impressions": {i: dict(notes) for i, notes in self.player_private_impressions.items()},
+            "active_effects": self.active_effects.snapshot(),
+            "secret_messages": self.secret_message_log.snapshot(),
+            "player_states": [player.snapshot() for player in self.players],
+            "rng": [rng_state[0], list(rng_state[1]), rng_state[2]] if rng_state else None,
+        }
+
+    def restore_state(self, state: dict) -> None:
+        """从 snapshot_state() 的结果恢复 (座位顺序须与快照一致)。"""
+        validate_checkpoint(state)
+        if [p["name"] for p in state["players"]] != [p.name for p in self.players]:
+            raise ValueError("检查点中的玩家与本局不一致。")
+
+        def by_player(data: dict) -> dict:
+            return {int(k): v for k, v in data.items()}  # JSON 的键是字符串
+
+        self.hand_count = state["hand"]
+        self.persistent_chips = list(state["persistent_chips"])
+        self.last_winner_id = state["last_winner_id"]
+        self.global_alert_level = state["global_alert_level"]
+        self.player_personas = by_player(state["personas"])
+        self.player_reflections = by_player(state["reflections"])
+        self.player_observed_moods = by_player(state["observed_moods"])
+        self.player_last_speech = by_player(state["last_speech"])
+        self.player_private_impressions = {i: by_player(notes)
+                                           for i, notes in by_player(state["private_impressions"]).items()}
+        self.active_effects.restore(state["active_effects"])
+        self.secret_message_log.restore(state["secret_messages"])
+        for player, player_state in zip(self.players, state["player_states"]):
+            player.restore(player_state)
+        if state.get("rng") and isinstance(self.rng, random.Random):
+            version, internal, gauss = state["rng"]
+            self.rng.setstate((version, tuple(internal), gauss))
+        self._hand_start_persistent = list(self.persistent_chips)
+        self.prompt_context.clear()
+
     def get_alive_player_count(self) -> int:
         return sum(1 for chips in self.persistent_chips if chips > 0)
 
@@ -360,10 +455,9 @@ class GameController:
     def _select_item_for_auction(self) -> tuple[str, Dict[str, object]]:
         if not self.item_catalog:
             raise ValueError("item catalog empty")
-        items = list(self.item_catalog.items())
-        weights = [max(1, int(info.get("auction_weight", 1))) for _, info in items]
-        index = random.choices(range(len(items)), weights=weights, k=1)[0]
-        return items[index]
+        # 累计权重在加载目录时已预先计算
+        item_id = self.rng.choices(self.assets.auction_item_ids, cum_weights=self.assets.auction_cum_weights, k=1)[0]
+        return item_id, self.item_catalog[item_id]
 
     def _find_player_by_name(self, name: str) -> Optional[int]:
         for idx, player in enumerate(self.players):
@@ -373,7 +467,7 @@ class GameController:
         return None
 
     def _get_effects_for_player(self, player_id: int) -> List[Dict[str, object]]:
-        return [effect for effect in self.active_effects if effect.get("target_id") == player_id]
+        return self.active_effects.for_target(player_id)
 
     def _clear_system_messages(self) -> None:
         for msg_list in self.player_system_messages.values():
@@ -393,19 +487,10 @@ class GameController:
             await self.god_print(text, delay)
 
     def _find_effect(self, player_id: int, effect_id: str) -> Optional[Dict[str, object]]:
-        for effect in self.active_effects:
-            if effect.get("target_id") == player_id and effect.get("effect_id") == effect_id:
-                return effect
-        return None
+        return self.active_effects.find(player_id, effect_id)
 
     def _consume_effect(self, player_id: int, effect_id: str) -> Optional[Dict[str, object]]:
-        effect = self._find_effect(player_id, effect_id)
-        if effect:
-            try:
-                self.active_effects.remove(effect)
-            except ValueError:
-                pass
-        return effect
+        return self.active_effects.consume(player_id, effect_id)
 
     def _player_has_effect(self, player_id: int, effect_id: str) -> bool:
         return self._find_effect(player_id, effect_id) is not None
@@ -482,7 +567,7 @@ class GameController:
         old_card = player_state.hand[lowest_index]
         player_state.hand[lowest_index] = new_card
         deck.append(old_card)
-        random.shuffle(deck)
+        self.rng.shuffle(deck)
 
         self._append_system_message(
             player_id,
@@ -515,7 +600,7 @@ class GameController:
                 deck = game.state.deck
                 if len(deck) >= 3:
                     deck.extend(player_state.hand)
-                    random.shuffle(deck)
+                    self.rng.shuffle(deck)
                     player_state.hand = [deck.pop() for _ in range(3)]
                     new_rank = evaluate_hand(player_state.hand)
                     self._append_system_message(
@@ -639,12 +724,9 @@ class GameController:
             else:
                 data["streak"] = 0
 
-        for effect in list(self.active_effects):
-            if effect.get("effect_id") != "loss_refund":
-                continue
-            hand_id = effect.get("hand_id")
+        for effect in self.active_effects.for_hand("loss_refund", self.hand_count):
             player_id = effect.get("target_id")
-            if hand_id != self.hand_count or player_id is None:
+            if player_id is None:
                 continue
             refund_amount = int(effect.get("refund", 0))
             if refund_amount > 0:
@@ -663,10 +745,7 @@ class GameController:
         """(新) 结算所有贿赂欠款"""
         messages: List[tuple[str, float]] = []
 
-        for effect in list(self.active_effects):
-            if effect.get("effect_id") != "bribe_debt":
-                continue
-
+        for effect in self.active_effects.with_effect("bribe_debt"):
             player_id = effect.get("target_id")
             if player_id is None:
                 self.active_effects.remove(effect)
@@ -847,7 +926,7 @@ class GameController:
                 await self.god_print(f"达到 {max_auction_rounds} 轮硬上限，拍卖结束。", 0.5)
                 break
 
-            await asyncio.sleep(0.5)
+            await self.pacer.sleep(0.5)
 
         # --- 拍卖结束，结算 ---
         if current_highest_bidder_id is None or not is_first_bid_placed:
@@ -858,6 +937,8 @@ class GameController:
         winning_bid = current_highest_bid
         self.persistent_chips[winner_id] -= winning_bid
         self.players[winner_id].inventory.append(item_id)
+        self.prompt_context.invalidate(TOPIC_INVENTORY)
+        self._emit("auction", player=winner_id, item_id=item_id, bid=winning_bid)
         await self.god_print(
             f"【系统拍卖行】{self.players[winner_id].name} 以 {winning_bid} 筹码拍得 "
             f"{item_info.get('name', item_id)} ({item_id})。",
@@ -927,7 +1008,8 @@ class GameController:
     - (出价低于 {min_next_bid_to_raise} 将视为放弃)"""
         # --- [修复 11.2 结束] ---
 
-        prompt = template.format(
+        messages = build_messages(
+            template,
             item_name=item_info.get("name", item_id),
             item_description=item_info.get("description", ""),
             item_value=item_value,
@@ -938,8 +1020,6 @@ class GameController:
             min_next_bid_to_raise=min_next_bid_to_raise
         )
 
-        messages = [{"role": "user", "content": prompt}]
-
         # ( ... 省略 stream_callback 和 LLM 调用 ...)
         if stream_prefix:
             await self.god_stream_start(stream_prefix)
@@ -949,7 +1029,8 @@ class GameController:
                 await self.god_stream_chunk(chunk)
 
         try:
-            response = await player.llm_client.chat_stream(messages, player.model_name, _stream)
+            response = await player.llm_client.chat_stream(messages, player.model_name, _stream,
+                                                           call_site="auction_bid")
         finally:
             if stream_prefix:
                 await self.god_stream_chunk("\n")
@@ -1001,20 +1082,8 @@ class GameController:
         }
 
     async def _process_turn_based_effects(self):
-        if not self.active_effects:
-            return
-
-        expired: List[Dict[str, object]] = []
-        for effect in self.active_effects:
-            if effect.get("turns_left") is not None:
-                effect["turns_left"] -= 1
-
-        for effect in list(self.active_effects):
-            if effect.get("turns_left") is not None and effect["turns_left"] <= 0:
-                expired.append(effect)
-
-        for effect in expired:
-            self.active_effects.remove(effect)
+        # 到期调度由登记表的最小堆完成，只处理本回合到期的效果
+        for effect in self.active_effects.tick():
             target_id = effect.get("target_id")
             if target_id is None:
                 continue
@@ -1046,6 +1115,7 @@ class GameController:
                 player.inventory.remove(item_id)
             except ValueError:
                 pass
+            self.prompt_context.invalidate(TOPIC_INVENTORY)
 
         result_flags: Dict[str, object] = {}
 
@@ -1059,10 +1129,10 @@ class GameController:
             except (TypeError, ValueError):
                 card_index = -1
             if card_index not in range(len(player_state.hand)):
-                card_index = random.randrange(len(player_state.hand))
+                card_index = self.rng.randrange(len(player_state.hand))
             old_card = player_state.hand[card_index]
             game.state.deck.append(old_card)
-            random.shuffle(game.state.deck)
+            self.rng.shuffle(game.state.deck)
             new_card = game.state.deck.pop()
             player_state.hand[card_index] = new_card
             card_old_str = self._format_card(old_card)
@@ -1100,7 +1170,7 @@ class GameController:
             except (TypeError, ValueError):
                 card_index = -1
             if card_index not in range(len(target_hand)):
-                card_index = random.randrange(len(target_hand))
+                card_index = self.rng.randrange(len(target_hand))
             peek_card = target_hand[card_index]
             card_str = self._format_card(peek_card)
             self._append_system_message(player_id, f"窥牌镜看到 {self.players[target_id].name} 的 {card_str}。")
@@ -1126,7 +1196,7 @@ class GameController:
                 "category": "debuff",
                 "expires_after_action": True
             }
-            self.active_effects.append(effect_payload)
+            self.active_effects.add(effect_payload)
             await self.god_print(
                 f"【道具生效】{player.name} 对 {self.players[target_id].name} 使用了锁筹卡，其下一次行动无法 RAISE。",
                 0.5
@@ -1135,7 +1205,7 @@ class GameController:
 
         if item_id == "ITM_004":  # 双倍卡
             consume_item()
-            self.active_effects.append({
+            self.active_effects.add({
                 "effect_id": "double_win",
                 "effect_name": item_info.get("name", "双倍卡"),
                 "source_id": player_id,
@@ -1160,7 +1230,7 @@ class GameController:
             if not alive_targets:
                 await self.god_print("【系统提示】暂无可偷看的对手。", 0.5)
                 return None
-            target_id = random.choice(alive_targets)
+            target_id = self.rng.choice(alive_targets)
             consume_item()
             blocked, reason = self._check_peek_blockers(player_id, target_id)
             if blocked:
@@ -1170,7 +1240,7 @@ class GameController:
             if not target_hand:
                 await self.god_print("【系统提示】目标暂无可偷看的手牌。", 0.5)
                 return result_flags
-            peek_card = random.choice(target_hand)
+            peek_card = self.rng.choice(target_hand)
             card_str = self._format_card(peek_card)
             self._append_system_message(player_id, f"偷看卡窥见 {self.players[target_id].name} 的 {card_str}。")
             # (新) 将 card_str 添加到上帝日志
@@ -1184,9 +1254,9 @@ class GameController:
                 return None
             consume_item()
             game.state.deck.extend(player_state.hand)
-            random.shuffle(game.state.deck)
+            self.rng.shuffle(game.state.deck)
             game.state.deck.extend(player_state.hand)
-            random.shuffle(game.state.deck)
+            self.rng.shuffle(game.state.deck)
             player_state.hand = [game.state.deck.pop() for _ in range(3)]
             # (新) 获取新手牌详情
             new_hand_str = " ".join(self._format_card(card) for card in player_state.hand)
@@ -1221,13 +1291,13 @@ class GameController:
             except (TypeError, ValueError):
                 my_index = -1
             if my_index not in range(len(player_state.hand)):
-                my_index = random.randrange(len(player_state.hand))
+                my_index = self.rng.randrange(len(player_state.hand))
             try:
                 target_index = int(item_payload.get("target_index", -1)) - 1
             except (TypeError, ValueError):
                 target_index = -1
             if target_index not in range(len(target_state.hand)):
-                target_index = random.randrange(len(target_state.hand))
+                target_index = self.rng.randrange(len(target_state.hand))
             player_card = player_state.hand[my_index]
             target_card = target_state.hand[target_index]
             player_card_str = self._format_card(player_card)
@@ -1248,7 +1318,7 @@ class GameController:
 
         if item_id == "ITM_009":  # 免比符
             consume_item()
-            self.active_effects.append({
+            self.active_effects.add({
                 "effect_id": "compare_decline",
                 "effect_name": item_info.get("name", "免比符"),
                 "source_id": player_id,
@@ -1271,7 +1341,7 @@ class GameController:
 
         if item_id == "ITM_011":  # 反转卡
             consume_item()
-            self.active_effects.append({
+            self.active_effects.add({
                 "effect_id": "compare_reverse",
                 "effect_name": item_info.get("name", "反转卡"),
                 "source_id": player_id,
@@ -1299,7 +1369,7 @@ class GameController:
                 await self.god_print(f"【道具生效】{player.name} 自动完成跟注。", 0.5)
             next_player = self._get_next_active_player(game, player_id)
             if next_player is not None:
-                self.active_effects.append({
+                self.active_effects.add({
                     "effect_id": "force_double_raise",
                     "effect_name": item_info.get("name", "压注加倍符"),
                     "source_id": player_id,
@@ -1318,7 +1388,7 @@ class GameController:
             consume_item()
             ante_paid = self._current_ante_distribution[player_id] if self._current_ante_distribution else 0
             refund_amount = max(10, ante_paid // 2) if ante_paid else 20
-            self.active_effects.append({
+            self.active_effects.add({
                 "effect_id": "loss_refund",
                 "effect_name": item_info.get("name", "定输免赔"),
                 "source_id": player_id,
@@ -1340,7 +1410,7 @@ class GameController:
 
         if item_id == "ITM_015":  # 护身符
             consume_item()
-            self.active_effects.append({
+            self.active_effects.add({
                 "effect_id": "compare_immunity",
                 "effect_name": item_info.get("name", "护身符"),
                 "source_id": player_id,
@@ -1353,7 +1423,7 @@ class GameController:
 
         if item_id == "ITM_016":  # 反侦测烟雾
             consume_item()
-            self.active_effects.append({
+            self.active_effects.add({
                 "effect_id": "anti_peek_once",
                 "effect_name": item_info.get("name", "反侦测烟雾"),
                 "source_id": player_id,
@@ -1366,7 +1436,7 @@ class GameController:
 
         if item_id == "ITM_017":  # 屏蔽卡
             consume_item()
-            self.active_effects.append({
+            self.active_effects.add({
                 "effect_id": "peek_shield",
                 "effect_name": item_info.get("name", "屏蔽卡"),
                 "source_id": player_id,
@@ -1379,7 +1449,7 @@ class GameController:
 
         if item_id == "ITM_018":  # 隐形符
             consume_item()
-            self.active_effects.append({
+            self.active_effects.add({
                 "effect_id": "chip_invisible",
                 "effect_name": item_info.get("name", "隐形符"),
                 "source_id": player_id,
@@ -1392,7 +1462,7 @@ class GameController:
 
         if item_id == "ITM_019":  # 护运珠
             consume_item()
-            self.active_effects.append({
+            self.active_effects.add({
                 "effect_id": "bad_luck_guard",
                 "effect_name": item_info.get("name", "护运珠"),
                 "source_id": player_id,
@@ -1406,7 +1476,7 @@ class GameController:
 
         if item_id == "ITM_020":  # 护牌罩
             consume_item()
-            self.active_effects.append({
+            self.active_effects.add({
                 "effect_id": "compare_draw",
                 "effect_name": item_info.get("name", "护牌罩"),
                 "source_id": player_id,
@@ -1419,7 +1489,7 @@ class GameController:
 
         if item_id == "ITM_021":  # 反窥镜
             consume_item()
-            self.active_effects.append({
+            self.active_effects.add({
                 "effect_id": "peek_reflect",
                 "effect_name": item_info.get("name", "反窥镜"),
                 "source_id": player_id,
@@ -1432,7 +1502,7 @@ class GameController:
 
         if item_id == "ITM_022":  # 幸运币
             consume_item()
-            self.active_effects.append({
+            self.active_effects.add({
                 "effect_id": "luck_boost",
                 "effect_name": item_info.get("name", "幸运币"),
                 "source_id": player_id,
@@ -1445,7 +1515,7 @@ class GameController:
 
         if item_id == "ITM_023":  # 财神符
             consume_item()
-            self.active_effects.append({
+            self.active_effects.add({
                 "effect_id": "win_bonus",
                 "effect_name": item_info.get("name", "财神符"),
                 "source_id": player_id,
@@ -1459,7 +1529,7 @@ class GameController:
 
         if item_id == "ITM_024":  # 连胜加成
             consume_item()
-            self.active_effects.append({
+            self.active_effects.add({
                 "effect_id": "win_streak_boost",
                 "effect_name": item_info.get("name", "连胜加成"),
                 "source_id": player_id,
@@ -1555,74 +1625,26 @@ class GameController:
 
         await self.god_panel_update(self._build_panel_data(game, -1))
 
-    async def run_game(self):
-        # ... (此函数无修改) ...
-        await self.god_print(f"--- 锦标赛开始 ---", 1)
-        await self.god_print(f"初始筹码: {self.persistent_chips}", 1)
-        await self.god_panel_update(self._build_panel_data(None, -1))
-
-        await self.god_print(f"--- 牌桌介绍开始 ---", 1.5)
-        await self.god_print(f"（AI 正在为自己杜撰人设...）", 0.5)
-
-        final_personas_data = []  # 收集本轮所有玩家的人设数据 (需要保留在循环外定义)
-
-        for i, player in enumerate(self.players):
-            if self.persistent_chips[i] <= 0 and player.alive:
-                self.player_personas[i] = f"我是 {player.name} (已淘汰)"
-                continue
-
-            await self.god_stream_start(f"【上帝(赛前介绍)】: [{player.name}]: ")
-
-            # 📌 这里的 player.create_persona 逻辑被修改以适应新的返回格式
-            intro_text, alias = await player.create_persona(
-                self.prompt_templates.get("create_persona", ""),
-                list(self.used_personas),
-                stream_chunk_cb=self.god_stream_chunk
-            )
-
-            if "(创建人设时出错:" in intro_text:
-                await self.god_stream_chunk(f" {intro_text}")
-            else:
-                # 📌 简化记录逻辑，只记录完整的文本
-                if intro_text:
-                    self.used_personas.add(intro_text)
-                    final_personas_data.append({"text": intro_text})  # 只需要 text 字段
-
-            await self.god_stream_chunk("\n")
-
-            self.player_personas[i] = intro_text
-            self.players[i].register_persona(intro_text)
-            await asyncio.sleep(0.5)
-
-        await self.god_print(f"--- 牌桌介绍结束 ---", 2)
-
-        # --- [人设记录] 写入文件：立即执行 ---
-        try:
-            # 1. 找到所有现存的人设文本
-            all_saved_persona_texts = set()
-            if USED_PERSONA_PATH.exists():
-                with USED_PERSONA_PATH.open("r", encoding="utf-8") as fp:
-                    content = fp.read().strip()
-                    if content:
-                        data = json.loads(content)
-                        all_saved_persona_texts.update(p.get("text") for p in data if p.get("text"))
-
-            # 2. 合并当前轮新生成的人设
-            all_saved_persona_texts.update(player.persona_text for player in self.players if player.persona_text)
-
-            # 3. 转换为最终的简化列表格式 [{"text": persona_text}, ...]
-            final_list = [{"text": text} for text in sorted(list(all_saved_persona_texts))]
-
-            with USED_PERSONA_PATH.open("w", encoding="utf-8") as fp:
-                json.dump(final_list, fp, ensure_ascii=False, indent=2)
-
-        except Exception as exc:
-            print(f"【上帝(警告)】: 写入人设记录失败: {exc}")
-        # --- [修复结束] ---
+    async def run_game(self, resume_state: Optional[dict] = None):
+        """
+        运行整场锦标赛。
+        (新) 传入 resume_state (检查点快照) 时跳过人设阶段，从最后完成的一手之后继续。
+        """
+        if resume_state is not None:
+            self.restore_state(resume_state)
+            await self.god_print(f"--- 锦标赛从第 {self.hand_count} 手之后恢复 ---", 1)
+            await self.god_print(f"当前筹码: {self.persistent_chips}", 1)
+            await self.god_panel_update(self._build_panel_data(None, -1))
+        else:
+            await self.god_print(f"--- 锦标赛开始 ---", 1)
+            await self.god_print(f"初始筹码: {self.persistent_chips}", 1)
+            await self.god_panel_update(self._build_panel_data(None, -1))
+            await self._run_introductions()
 
-        await asyncio.sleep(3)
+        await self.pacer.sleep(3)
 
         while self.get_alive_player_count() > 1:
+            await self.pacer.safe_point()  # (新) 无人观看被暂停时，在两手之间停住
             self.hand_count += 1
 
             # --- [起始玩家修复]：确保第一手牌从 P0 (索引 0) 开始 ---
@@ -1641,6 +1663,8 @@ class GameController:
                     # 极端情况下所有玩家都淘汰时，回退到 0
                     start_player_id = 0
                     break
+            self._emit("hand_start", dealer=start_player_id, chips=list(self.persistent_chips),
+                       alert_level=round(self.global_alert_level, 2))
             await self._run_auction_phase()
             p_name = self.players[start_player_id].name
             await self.god_print(f"--- 第 {self.hand_count} 手牌开始 (庄家: {p_name}) ---", 1.5)
@@ -1667,14 +1691,118 @@ class GameController:
                         p.alive = False
             await self.god_print(f"本手牌结束。存活玩家: {', '.join(alive_players_post_hand)}", 2)
             await self.god_panel_update(self._build_panel_data(None, -1))
-            await asyncio.sleep(3)
+            if self.checkpoint is not None:
+                await self.checkpoint(self.snapshot_state())
+            await self.pacer.sleep(3)
 
         await self.god_print(f"--- 锦标赛结束 ---", 2)
+        print(f"【上帝(统计)】: {self.prompt_context.format_stats()}")
+        print(f"【上帝(统计)】: Prompt 前缀缓存 {PROMPT_CACHE_STATS.format_stats()}")
+        print(f"【上帝(统计)】: Prompt 预算裁剪 {self.prompt_budgeter.trimmed_prompts} 次，"
+              f"共节省约 {self.prompt_budgeter.tokens_saved} tokens。")
         for i, p in enumerate(self.players):
             if self.persistent_chips[i] > 0:
                 await self.god_print(f"最终胜利者是: {p.name} (剩余筹码: {self.persistent_chips[i]})!", 5)
                 break
 
+    async def _run_introductions(self):
+        """赛前介绍：每名存活玩家杜撰人设 (与历史人设近似重复时重新生成)。"""
+        await self.god_print(f"--- 牌桌介绍开始 ---", 1.5)
+        await self.god_print(f"（AI 正在为自己杜撰人设...）", 0.5)
+
+        for i, player in enumerate(self.players):
+            if self.persistent_chips[i] <= 0 and player.alive:
+                self.player_personas[i] = f"我是 {player.name} (已淘汰)"
+                self.prompt_context.invalidate(TOPIC_PERSONA)
+                continue
+
+            await self.god_stream_start(f"【上帝(赛前介绍)】: [{player.name}]: ")
+
+            # 📌 Prompt 中只放有限条历史人设样本，生成后再在本地查重
+            used_samples = self.persona_store.sample_for_prompt()
+            for attempt in range(self.PERSONA_MAX_ATTEMPTS):
+                intro_text, alias = await player.create_persona(
+                    self.prompt_templates.get("create_persona", ""),
+                    used_samples,
+                    stream_chunk_cb=self.god_stream_chunk
+                )
+                if "(创建人设时出错:" in intro_text or not intro_text:
+                    break
+                duplicate = self.persona_store.find_near_duplicate(intro_text)
+                if duplicate is None or attempt == self.PERSONA_MAX_ATTEMPTS - 1:
+                    break
+                # 与历史人设过于相似：把撞车的那条加入“请勿模仿”列表后重新生成
+                used_samples = used_samples + [duplicate[0]]
+                await self.god_stream_chunk(
+                    f"\n[系统提示: 人设与历史记录相似度 {duplicate[1]:.0%}，要求重新构思...]\n"
+                )
+
+            if "(创建人设时出错:" in intro_text:
+                await self.god_stream_chunk(f" {intro_text}")
+            elif intro_text:
+                # 📌 只追加一行，不再整文件重写
+                self.persona_store.add(intro_text)
+
+            await self.god_stream_chunk("\n")
+
+            self.player_personas[i] = intro_text
+            self.prompt_context.invalidate(TOPIC_PERSONA)
+            self.players[i].register_persona(intro_text)
+            await self.pacer.sleep(0.5)
+
+        await self.god_print(f"--- 牌桌介绍结束 ---", 2)
+
+    def _build_opponent_lines(self, player_id: int, source: Dict[int, Optional[str]], line_format: str,
+                              empty_text: str) -> str:
+        """按座次列出其他玩家的某项文字信息 (人设/复盘/发言/情绪)。"""
+        lines = []
+        for i, p in enumerate(self.players):
+            if i == player_id: continue
+            text = source.get(i)
+            if text: lines.append(line_format.format(name=p.name, text=text))
+        return "\n".join(lines) if lines else empty_text
+
+    def _build_seating_section(self, game: ZhajinhuaGame, player_id: int, start_player_id: int,
+                               player_status_list: List[str]) -> Tuple[str, str]:
+        st = game.state
+        seating_lines = []
+        opponent_reference_lines = []
+        for seat_offset in range(self.num_players):
+            seat_player_id = (start_player_id + seat_offset) % self.num_players
+            seat_player = self.players[seat_player_id]
+            seat_role_parts = [f"座位{seat_offset + 1}"]
+            if seat_offset == 0:
+                seat_role_parts.append("庄家")
+            if seat_player_id == player_id:
+                seat_role_parts.append("你")
+            relation_offset = (seat_player_id - player_id) % self.num_players
+            if relation_offset == 1:
+                relation_desc = "你的下家"
+            elif relation_offset == 0:
+                relation_desc = "你自己"
+            elif relation_offset == self.num_players - 1:
+                relation_desc = "你的上家"
+            else:
+                relation_desc = f"距离你 {relation_offset} 位"
+
+            seat_role = " / ".join(seat_role_parts)
+            status = player_status_list[seat_player_id] if seat_player_id < len(player_status_list) else "未知"
+            actual_chip_val = st.players[seat_player_id].chips if seat_player_id < len(st.players) else \
+                self.persistent_chips[seat_player_id]
+            seat_chip_info = self._get_visible_chips(player_id, seat_player_id, actual_chip_val)
+            seating_lines.append(
+                f"  - {seat_role}: {seat_player.name} (筹码={seat_chip_info}, 状态={status})"
+            )
+
+            if seat_player_id != player_id:
+                opponent_reference_lines.append(
+                    f"  - {seat_player.name}: 座位={seat_role}，相对位置={relation_desc}，筹码={seat_chip_info}，状态={status}"
+                )
+
+        table_seating_str = "\n".join(seating_lines)
+        opponent_reference_str = "\n".join(opponent_reference_lines) if opponent_reference_lines else "暂无其他对手。"
+        return table_seating_str, opponent_reference_str
+
     def _build_llm_prompt(self, game: ZhajinhuaGame, player_id: int, start_player_id: int,
                           player_debuffs: Optional[set[str]] = None) -> tuple:
         # ... (此函数无修改) ...
@@ -1687,7 +1815,7 @@ class GameController:
         display_pot = real_pot  # 默认显示真实底池
 
         # 2. 检查是否有伪造底池的效果
-        falsify_effect = next((e for e in self.active_effects if e.get("effect_id") == "falsified_pot"), None)
+        falsify_effect = self.active_effects.first("falsified_pot")
 
         if falsify_effect:
             source_id = falsify_effect.get("source_id")
@@ -1707,7 +1835,7 @@ class GameController:
         player_status_list: list[str] = []
 
         # (↓) 检查是否有伪造筹码的效果 (↓)
-        counterfeit_effect = next((e for e in self.active_effects if e.get("effect_id") == "counterfeit_chips"), None)
+        counterfeit_effect = self.active_effects.first("counterfeit_chips")
         for i, p in enumerate(st.players):
             p_name = self.players[i].name
             if self.persistent_chips[i] <= 0:
@@ -1770,83 +1898,56 @@ class GameController:
         next_player_id = game.next_player(start_from=player_id)
         next_player_name = self.players[next_player_id].name
 
-        seating_lines = []
-        opponent_reference_lines = []
-        for seat_offset in range(self.num_players):
-            seat_player_id = (start_player_id + seat_offset) % self.num_players
-            seat_player = self.players[seat_player_id]
-            seat_role_parts = [f"座位{seat_offset + 1}"]
-            if seat_offset == 0:
-                seat_role_parts.append("庄家")
-            if seat_player_id == player_id:
-                seat_role_parts.append("你")
-            relation_offset = (seat_player_id - player_id) % self.num_players
-            if relation_offset == 1:
-                relation_desc = "你的下家"
-            elif relation_offset == 0:
-                relation_desc = "你自己"
-            elif relation_offset == self.num_players - 1:
-                relation_desc = "你的上家"
-            else:
-                relation_desc = f"距离你 {relation_offset} 位"
-
-            seat_role = " / ".join(seat_role_parts)
-            status = player_status_list[seat_player_id] if seat_player_id < len(player_status_list) else "未知"
-            actual_chip_val = st.players[seat_player_id].chips if seat_player_id < len(st.players) else \
-                self.persistent_chips[seat_player_id]
-            seat_chip_info = self._get_visible_chips(player_id, seat_player_id, actual_chip_val)
-            seating_lines.append(
-                f"  - {seat_role}: {seat_player.name} (筹码={seat_chip_info}, 状态={status})"
-            )
+        cache = self.prompt_context
 
-            if seat_player_id != player_id:
-                opponent_reference_lines.append(
-                    f"  - {seat_player.name}: 座位={seat_role}，相对位置={relation_desc}，筹码={seat_chip_info}，状态={status}"
-                )
+        def build_seating() -> Tuple[str, str]:
+            return self._build_seating_section(game, player_id, start_player_id, player_status_list)
 
-        table_seating_str = "\n".join(seating_lines)
-        opponent_reference_str = "\n".join(opponent_reference_lines) if opponent_reference_lines else "暂无其他对手。"
+        # 座位表只随庄家、筹码、状态和可见性效果变化
+        table_seating_str, opponent_reference_str = cache.get(
+            "seating", player_id, build_seating,
+            key=(start_player_id, tuple(player_status_list), tuple(p.chips for p in st.players),
+                 self.active_effects.version)
+        )
 
         player_obj = self.players[player_id]
-        opponent_personas_lines = []
-        for i, p in enumerate(self.players):
-            if i == player_id: continue
-            persona = self.player_personas.get(i)
-            if persona: opponent_personas_lines.append(f"  - {p.name}: {persona}")
-        opponent_personas_str = "\n".join(opponent_personas_lines) if opponent_personas_lines else "暂无对手的开场介绍。"
-
-        reflection_lines = []
-        for i, p in enumerate(self.players):
-            if i == player_id: continue
-            reflection = self.player_reflections.get(i)
-            if reflection: reflection_lines.append(f"  - {p.name}: {reflection}")
-        opponent_reflections_str = "\n".join(reflection_lines) if reflection_lines else "暂无对手的过往复盘发言。"
-
-        private_impressions_lines = []
-        player_notes = self.player_private_impressions.get(player_id, {})
-        for opp_id, note in player_notes.items():
-            if opp_id != player_id:
-                private_impressions_lines.append(f"  - {self.players[opp_id].name}: {note}")
-        opponent_private_impressions_str = "\n".join(
-            private_impressions_lines) if private_impressions_lines else "暂无你对对手的私有笔记。"
-
-        speech_lines = []
-        for i, p in enumerate(self.players):
-            if i == player_id: continue
-            speech = self.player_last_speech.get(i)
-            if speech: speech_lines.append(f"  - {p.name} (上一轮) 说: {speech}")
-        observed_speech_str = "\n".join(speech_lines) if speech_lines else "暂无牌桌发言。"
+        opponent_personas_str = cache.get(
+            "opponent_personas", player_id, lambda: self._build_opponent_lines(
+                player_id, self.player_personas, "  - {name}: {text}", "暂无对手的开场介绍。"),
+            topics=(TOPIC_PERSONA,)
+        )
+        opponent_reflections_str = cache.get(
+            "opponent_reflections", player_id, lambda: self._build_opponent_lines(
+                player_id, self.player_reflections, "  - {name}: {text}", "暂无对手的过往复盘发言。"),
+            topics=(TOPIC_REFLECTION,)
+        )
 
-        mood_lines = []
-        for i, p in enumerate(self.players):
-            if i == player_id: continue
-            mood = self.player_observed_moods.get(i)
-            if mood: mood_lines.append(f"  - {p.name} 看起来: {mood}")
-        observed_moods_str = "\n".join(mood_lines) if mood_lines else "暂未观察到对手的明显情绪。"
+        def build_private_impressions() -> str:
+            private_impressions_lines = []
+            player_notes = self.player_private_impressions.get(player_id, {})
+            for opp_id, note in player_notes.items():
+                if opp_id != player_id:
+                    private_impressions_lines.append(f"  - {self.players[opp_id].name}: {note}")
+            return "\n".join(
+                private_impressions_lines) if private_impressions_lines else "暂无你对对手的私有笔记。"
+
+        opponent_private_impressions_str = cache.get(
+            "private_impressions", player_id, build_private_impressions, topics=(TOPIC_IMPRESSION,)
+        )
+        observed_speech_str = cache.get(
+            "observed_speech", player_id, lambda: self._build_opponent_lines(
+                player_id, self.player_last_speech, "  - {name} (上一轮) 说: {text}", "暂无牌桌发言。"),
+            topics=(TOPIC_SPEECH,)
+        )
+        observed_moods_str = cache.get(
+            "observed_moods", player_id, lambda: self._build_opponent_lines(
+                player_id, self.player_observed_moods, "  - {name} 看起来: {text}", "暂未观察到对手的明显情绪。"),
+            topics=(TOPIC_MOOD,)
+        )
 
         secret_message_lines = []
-        for (hand_num, sender, recipient, message) in self.secret_message_log:
-            if hand_num == self.hand_count and recipient == player_id:
+        for (hand_num, sender, recipient, message) in self.secret_message_log.for_hand_player(self.hand_count, player_id):
+            if recipient == player_id:
                 sender_name = self.players[sender].name
                 secret_message_lines.append(f"  - [密信] 来自 {sender_name}: {message}")
         for message in self.player_system_messages.get(player_id, []):
@@ -1854,16 +1955,14 @@ class GameController:
 
         # (↓↓ 新增此块 ↓↓)
         # 检查是否有待处理的贿赂换牌要约
-        for effect in self.active_effects:
-            if (effect.get("effect_id") == "bribe_swap_pending" and
-                    effect.get("target_id") == player_id):
-                source_name = self.players[effect['source_id']].name
-                payment = effect['payment']
-                secret_message_lines.append(
-                    f"  - 【!! 秘密要约 !!】: {source_name} 提出支付你 {payment} 筹码，"
-                    f"以换取你们双方的*全部手牌*。"
-                    f"请在JSON中使用 'accept_bribe_swap' 键回应。"
-                )
+        for effect in self.active_effects.find_all(player_id, "bribe_swap_pending"):
+            source_name = self.players[effect['source_id']].name
+            payment = effect['payment']
+            secret_message_lines.append(
+                f"  - 【!! 秘密要约 !!】: {source_name} 提出支付你 {payment} 筹码，"
+                f"以换取你们双方的*全部手牌*。"
+                f"请在JSON中使用 'accept_bribe_swap' 键回应。"
+            )
         # (↑↑ 新增结束 ↑↑)
 
         received_secret_messages_str = "\n".join(secret_message_lines) if secret_message_lines else "你没有收到任何秘密消息。"
@@ -1873,31 +1972,34 @@ class GameController:
         multiplier = 2 if ps.looked else 1
 
         # --- [修复 18.2] 构建全场道具情报 ---
-        field_item_intel_lines = []
-        for i, p in enumerate(self.players):
-            if i == player_id or not p.inventory:  # 跳过自己和空背包
-                continue
-            inventory_names = [self.item_catalog.get(item_id, {}).get("name", item_id) for item_id in p.inventory]
-            inventory_str = ", ".join(inventory_names)
-            field_item_intel_lines.append(f"  - {p.name} 持有: [{inventory_str}]")
+        def build_field_item_intel() -> str:
+            field_item_intel_lines = []
+            for i, p in enumerate(self.players):
+                if i == player_id or not p.inventory:  # 跳过自己和空背包
+                    continue
+                inventory_names = [self.item_catalog.get(item_id, {}).get("name", item_id) for item_id in p.inventory]
+                field_item_intel_lines.append(f"  - {p.name} 持有: [{', '.join(inventory_names)}]")
+            return "\n".join(field_item_intel_lines) if field_item_intel_lines else "场上暂无其他道具。"
 
-        field_item_intel_str = "\n".join(field_item_intel_lines) if field_item_intel_lines else "场上暂无其他道具。"
+        field_item_intel_str = cache.get("field_item_intel", player_id, build_field_item_intel,
+                                         topics=(TOPIC_INVENTORY,))
         # --- [修复 18.2 结束] ---
 
         player_obj.update_pressure_snapshot(ps.chips, call_cost)
+        # (新) 人设整局不变，放在玩家稳定块；经验、压力、筹码与贷款每轮变化，单独放在本轮状态
         my_persona_str = f"你正在扮演: {self.player_personas.get(player_id, '(暂无)')}"
-        my_persona_str += f"\n【你的牌局经验】{player_obj.get_experience_summary()}"
-        my_persona_str += f"\n【当前心理压力】{player_obj.get_pressure_descriptor()}"
+        my_status_str = f"【你的牌局经验】{player_obj.get_experience_summary()}"
+        my_status_str += f"\n【当前心理压力】{player_obj.get_pressure_descriptor()}"
         if ps.chips < 300:
-            my_persona_str += f"\n【筹码警报】你的筹码只有 {ps.chips} (<300)，再不出招就会被淘汰。权衡是否需要孤注一掷或动用作弊手段。"
+            my_status_str += f"\n【筹码警报】你的筹码只有 {ps.chips} (<300)，再不出招就会被淘汰。权衡是否需要孤注一掷或动用作弊手段。"
         else:
-            my_persona_str += f"\n【筹码状态】当前筹码 {ps.chips}，警戒线为 300。"
+            my_status_str += f"\n【筹码状态】当前筹码 {ps.chips}，警戒线为 300。"
 
         if player_obj.loan_data:
             due_hand = player_obj.loan_data.get("due_hand", self.hand_count)
             due_amount = player_obj.loan_data.get("due_amount", 0)
             hands_left = max(0, due_hand - self.hand_count)
-            my_persona_str += (
+            my_status_str += (
                 f"\n【!! 债务警报 !!】你欠系统金库 {due_amount} 筹码，距离强制清算还剩 {hands_left} 手。"
             )
         else:
@@ -1912,7 +2014,7 @@ class GameController:
             # 如果未看牌，max_loan 只会包含基础额度。
             max_loan = self.vault.get_max_loan(player_obj.experience, current_hand, has_looked)
 
-            my_persona_str += (
+            my_status_str += (
                 f"\n【系统金库】你信誉良好。你的最高可贷额度为: {max_loan} 筹码。"
             )
 
@@ -1921,33 +2023,36 @@ class GameController:
 
             if has_looked and max_loan > base_loan_calc:
                 # 玩家已看牌，且额度高于基础额度，提示他们
-                my_persona_str += f" (已包含你当前手牌的额外额度)"
+                my_status_str += f" (已包含你当前手牌的额外额度)"
 
             elif not has_looked:
                 # [修复] 修正错字 (my_nota_str -> my_persona_str)
                 # [修复] 移除信息泄露 (不再暗示手牌“不错”)
-                my_persona_str += f" (如果你看牌，手牌强度也可能会提高额度)"
+                my_status_str += f" (如果你看牌，手牌强度也可能会提高额度)"
 
         # --- [修复 17.1 (修正版) 结束] ---
 
         # --- [修复 21.1] 向 AI 背包添加道具描述 ---
-        inventory_display = []
-        for item_id in player_obj.inventory:
-            item_info = self.item_catalog.get(item_id, {})
+        def build_inventory() -> str:
+            inventory_display = []
+            for item_id in player_obj.inventory:
+                item_info = self.item_catalog.get(item_id, {})
 
-            item_name = item_info.get('name', item_id)
-            # (新) 从 items_store.json 获取描述
-            item_desc = item_info.get('description', '效果未知')
+                item_name = item_info.get('name', item_id)
+                # (新) 从 items_store.json 获取描述
+                item_desc = item_info.get('description', '效果未知')
 
-            # (新) 将描述添加到提示中
-            inventory_display.append(f"  - {item_name} ({item_id}): {item_desc}")
+                # (新) 将描述添加到提示中
+                inventory_display.append(f"  - {item_name} ({item_id}): {item_desc}")
 
-        inventory_str = "空" if not inventory_display else "\n".join(inventory_display)
+            return "空" if not inventory_display else "\n".join(inventory_display)
+
+        inventory_str = cache.get("inventory", player_id, build_inventory, topics=(TOPIC_INVENTORY,))
         # --- [修复 21.1 结束] ---
 
         return (
             "\n".join(state_summary_lines), my_hand, available_actions_str, available_actions_tuples,
-            next_player_name, my_persona_str, opponent_personas_str, opponent_reflections_str,
+            next_player_name, my_persona_str, my_status_str, opponent_personas_str, opponent_reflections_str,
             opponent_private_impressions_str, observed_speech_str,
             received_secret_messages_str, inventory_str,
             field_item_intel_str,  # (新) 在 inventory_str 之后添加
@@ -2127,7 +2232,7 @@ class GameController:
                 return Action(player=player_id,
                               type=ActionType.FOLD), f"警告: {self.players[player_id].name} COMPARE 失败: {err}。强制弃牌。"
             # (已修改) 修复：应为 target_id
-            if any(effect.get("effect_id") == "compare_immunity" for effect in self._get_effects_for_player(target_id)):
+            if self._player_has_effect(target_id, "compare_immunity"):
                 return Action(player=player_id,
                               type=ActionType.FOLD), (
                     f"警告: {self.players[player_id].name} 试图比牌的目标受到护身符保护，操作无效。强制弃牌。"
@@ -2176,7 +2281,7 @@ class GameController:
         final_leak_prob = base_probability - experience_mitigation + alert_penalty
         final_leak_prob = max(0.05, min(0.80, final_leak_prob))  # 确保概率在 5% 到 80% 之间
 
-        if random.random() >= final_leak_prob:
+        if self.rng.random() >= final_leak_prob:
             return  # 本次未触发泄密
         # --- [修复 20.1 结束] ---
 
@@ -2189,7 +2294,7 @@ class GameController:
         if not witnesses:
             return  # 没有目击者
 
-        witness_id = random.choice(witnesses)
+        witness_id = self.rng.choice(witnesses)
         witness_name = self.players[witness_id].name
 
         self._append_system_message(witness_id, f"【!! 绝密情报 !!】{leak_message}")
@@ -2512,7 +2617,7 @@ class GameController:
                 f"第 {m['card_index_display']} 张 {m['from']}→{m['to']}" for m in modifications
             )
 
-        detected = random.random() < detection_probability
+        detected = self.rng.random() < detection_probability
         if detected:
             await self.god_print(
                 f"【上帝(抓现行)】: {player_name} 偷换牌被巡逻荷官发现！({len(modifications)} 张, 类型: {cheat_type_raw})",
@@ -2573,10 +2678,10 @@ class GameController:
                         await self.god_print(f"【上帝(贿赂失败)】: {player_name} 拒绝了荷官的提议。", 0.5)
                     else:
                         bribe_attempted = True
-                        d20_roll = random.randint(1, 20)
+                        d20_roll = self.rng.randint(1, 20)
                         await self.god_print(f"【上帝(命运)】: {player_name} 试图说服荷官... D20 掷骰结果: {d20_roll}",
                                              0.5)
-                        await asyncio.sleep(1)
+                        await self.pacer.sleep(1)
 
                         if d20_roll == 1:
                             bribe_successful = False
@@ -2603,9 +2708,9 @@ class GameController:
                             await self.god_print(
                                 f"【上帝(常规检定)】: (掷骰 {d20_roll}) ...荷官正在权衡利弊 (检定成功率: {success_chance:.0%})",
                                 0.5)
-                            await asyncio.sleep(1)
+                            await self.pacer.sleep(1)
 
-                            if random.random() < success_chance:
+                            if self.rng.random() < success_chance:
                                 bribe_successful = True
                                 if payment_type == "UPFRONT":
                                     ps.chips -= bribe_cost
@@ -2613,7 +2718,7 @@ class GameController:
                                     await self.god_print(f"【上帝(贿赂成功)】: 荷官收下了钱 ({bribe_cost})，假装无事发生。",
                                                          0.5)
                                 else:  # IOU
-                                    self.active_effects.append({
+                                    self.active_effects.add({
                                         "effect_id": "bribe_debt",
                                         "effect_name": "贿赂欠款",
                                         "source_id": player_id,
@@ -2790,11 +2895,11 @@ class GameController:
         self.persistent_chips[player_id] -= COST
 
         # 移除旧效果（防止叠加）
-        for effect in list(self.active_effects):
-            if effect.get("effect_id") == "falsified_pot" and effect.get("source_id") == player_id:
+        for effect in self.active_effects.with_effect("falsified_pot"):
+            if effect.get("source_id") == player_id:
                 self.active_effects.remove(effect)
 
-        self.active_effects.append({
+        self.active_effects.add({
             "effect_id": "falsified_pot",
             "effect_name": "伪造底池",
             "source_id": player_id,
@@ -2835,11 +2940,11 @@ class GameController:
         self.persistent_chips[player_id] -= COST
 
         # 移除旧效果
-        for effect in list(self.active_effects):
-            if effect.get("effect_id") == "counterfeit_chips" and effect.get("source_id") == player_id:
+        for effect in self.active_effects.with_effect("counterfeit_chips"):
+            if effect.get("source_id") == player_id:
                 self.active_effects.remove(effect)
 
-        self.active_effects.append({
+        self.active_effects.add({
             "effect_id": "counterfeit_chips",
             "effect_name": "伪造筹码",
             "source_id": player_id,
@@ -2924,7 +3029,7 @@ class GameController:
         player_state.chips -= COST
         self.persistent_chips[player_id] -= COST
 
-        self.active_effects.append({
+        self.active_effects.add({
             "effect_id": "dealer_favor",
             "effect_name": "荷官的偏爱",
             "target_id": player_id,
@@ -2965,11 +3070,11 @@ class GameController:
             return
 
         # 移除旧的待处理要约 (防止刷屏)
-        for effect in list(self.active_effects):
-            if effect.get("effect_id") == "bribe_swap_pending" and effect.get("source_id") == player_id:
+        for effect in self.active_effects.with_effect("bribe_swap_pending"):
+            if effect.get("source_id") == player_id:
                 self.active_effects.remove(effect)
 
-        self.active_effects.append({
+        self.active_effects.add({
             "effect_id": "bribe_swap_pending",
             "source_id": player_id,
             "target_id": target_id,
@@ -2997,10 +3102,8 @@ class GameController:
         accept = payload.get("accept", False)
 
         offer_effect = None
-        for effect in self.active_effects:
-            if (effect.get("effect_id") == "bribe_swap_pending" and
-                    effect.get("target_id") == player_id and
-                    effect.get("source_id") == source_id):
+        for effect in self.active_effects.find_all(player_id, "bribe_swap_pending"):
+            if effect.get("source_id") == source_id:
                 offer_effect = effect
                 break
 
@@ -3128,74 +3231,79 @@ class GameController:
         await self.god_print(f"上帝正在审查 {target_name_1} 和 {target_name_2} (及相关者) 的*所有*秘密通讯...", 2)
 
         evidence_log_entries = []
-        for (hand_num, sender, recipient, message) in self.secret_message_log:
-            if sender == target_id_1 or recipient == target_id_1 or \
-                    sender == target_id_2 or recipient == target_id_2:
-                sender_name = self.players[sender].name
-                recipient_name = self.players[recipient].name
-                log = f"  - [H{hand_num}] {sender_name} -> {recipient_name}: {message}"
-                evidence_log_entries.append(log)
-                await self.god_print(log, 0.5)
-
-        for (hand_num, actor_id, cheat_type, payload) in self.cheat_action_log:
-            if actor_id == target_id_1 or actor_id == target_id_2:
-                actor_name = self.players[actor_id].name
-                status = "成功" if payload.get("success") else "失败"
-                detail = payload.get(
-                    "error") or f"第 {payload.get('card_index')} 张: {payload.get('from')} -> {payload.get('to')}"
-                log = f"  - [H{hand_num}] {actor_name} 试图使用非法动作 {cheat_type} ({status}): {detail}"
-                evidence_log_entries.append(log)
-                await self.god_print(log, 0.5)
+        for (hand_num, sender, recipient, message) in self.secret_message_log.involving((target_id_1, target_id_2)):
+            sender_name = self.players[sender].name
+            recipient_name = self.players[recipient].name
+            log = f"  - [H{hand_num}] {sender_name} -> {recipient_name}: {message}"
+            evidence_log_entries.append(log)
+            await self.god_print(log, 0.5)
+
+        for (hand_num, actor_id, cheat_type, payload) in self.cheat_action_log.involving((target_id_1, target_id_2)):
+            actor_name = self.players[actor_id].name
+            status = "成功" if payload.get("success") else "失败"
+            detail = payload.get(
+                "error") or f"第 {payload.get('card_index')} 张: {payload.get('from')} -> {payload.get('to')}"
+            log = f"  - [H{hand_num}] {actor_name} 试图使用非法动作 {cheat_type} ({status}): {detail}"
+            evidence_log_entries.append(log)
+            await self.god_print(log, 0.5)
 
         if not evidence_log_entries:
             evidence_log_entries.append("  - (未发现任何相关秘密通讯)")
             await self.god_print("  - (未发现任何相关秘密通讯)", 0.5)
 
         evidence_log_str = "\n".join(evidence_log_entries)
-        await asyncio.sleep(2)
+        await self.pacer.sleep(2)
 
         await self.god_print(f"--- 审判阶段 2: 被告辩护 ---", 1)
 
-        defense_speech_1 = await self.players[target_id_1].defend(
-            self.prompt_templates.get("defend", ""),  # <-- [修复] 传入模板
-            accuser_name, target_name_2, evidence_log_str,
-            self.god_stream_start, self.god_stream_chunk
+        # (新) 两名被告的辩护互不依赖，同时发起；第二名被告的输出先缓冲，待第一名说完后再回放
+        defend_template = self.prompt_templates.get("defend", "")
+        deferred_stream_2 = DeferredStream(self.god_stream_start, self.god_stream_chunk)
+        defense_task_2 = asyncio.create_task(
+            self.players[target_id_2].defend(
+                defend_template,
+                accuser_name, target_name_1, evidence_log_str,
+                deferred_stream_2.stream_start, deferred_stream_2.stream_chunk
+            )
         )
-        await asyncio.sleep(1)
+        try:
+            defense_speech_1 = await self.players[target_id_1].defend(
+                defend_template,
+                accuser_name, target_name_2, evidence_log_str,
+                self.god_stream_start, self.god_stream_chunk
+            )
+            await self.pacer.sleep(1)
 
-        defense_speech_2 = await self.players[target_id_2].defend(
-            self.prompt_templates.get("defend", ""),  # <-- [修复] 传入模板
-            accuser_name, target_name_1, evidence_log_str,
-            self.god_stream_start, self.god_stream_chunk
-        )
-        await asyncio.sleep(2)
+            await deferred_stream_2.go_live()
+            defense_speech_2 = await defense_task_2
+        finally:
+            if not defense_task_2.done():
+                defense_task_2.cancel()
+        await self.pacer.sleep(2)
 
         await self.god_print(f"--- 审判阶段 3: 陪审团投票 ---", 1)
 
-        vote_tasks = []
-        for jury_id in jury_list:
-            vote_tasks.append(
-                self.players[jury_id].vote(
-                    self.prompt_templates.get("vote", ""),  # <-- [修复] 传入模板
-                    accuser_name, target_name_1, target_name_2,
-                    evidence_log_str, defense_speech_1, defense_speech_2,
-                    self.god_stream_start, self.god_stream_chunk
-                )
-            )
-
-        votes = await asyncio.gather(*vote_tasks)
-        await asyncio.sleep(1)
+        votes = await self._collect_jury_votes(
+            jury_list, accuser_name, target_name_1, target_name_2,
+            evidence_log_str, defense_speech_1, defense_speech_2
+        )
+        await self.pacer.sleep(1)
 
         await self.god_print(f"--- 审判阶段 4: 裁决 ---", 1)
 
         all_guilty = True
-        for i, jury_id in enumerate(jury_list):
-            vote_result = "有罪" if votes[i] == "GUILTY" else "无罪"
+        for jury_id in jury_list:
+            vote = votes.get(jury_id)
+            if vote is None:
+                # (新) 该陪审员的投票在裁决已定后被取消，没有票可以公布
+                all_guilty = False
+                continue
+            vote_result = "有罪" if vote == "GUILTY" else "无罪"
             await self.god_print(f"陪审团 {self.players[jury_id].name} 投票: {vote_result}", 1)
-            if votes[i] != "GUILTY":
+            if vote != "GUILTY":
                 all_guilty = False
 
-        await asyncio.sleep(2)
+        await self.pacer.sleep(2)
 
         await self.god_print(f"--- 审判阶段 5: 执行判决 ---", 1)
 
@@ -3252,9 +3360,57 @@ class GameController:
 
             await self.god_print(f"{target_name_1} 和 {target_name_2} 瓜分了 {accuser_name} 的所有筹码。", 1)
 
+        self._emit("trial", accuser=accuser_id, targets=[target_id_1, target_id_2], jury=list(jury_list),
+                   votes={str(jury_id): votes.get(jury_id) for jury_id in jury_list},
+                   guilty=all_guilty, penalty_pool=penalty_pool)
         await self.god_print(f"--- 审判结束 ---", 1)
         await self.god_panel_update(self._build_panel_data(game, start_player_id))
-        await asyncio.sleep(5)
+        await self.pacer.sleep(5)
+
+    async def _collect_jury_votes(self, jury_list: List[int], accuser_name: str,
+                                  target_name_1: str, target_name_2: str, evidence_log_str: str,
+                                  defense_speech_1: str, defense_speech_2: str) -> Dict[int, Optional[str]]:
+        """
+        (新) 按完成顺序收集陪审团投票。
+        只要出现一张无罪票 (或投票失败)，“一致有罪”已不可能，立即取消其余仍在进行的投票请求。
+        返回 {jury_id: "GUILTY" / "NOT_GUILTY" / None(已取消)}。
+        """
+        vote_template = self.prompt_templates.get("vote", "")
+        task_to_jury: Dict[asyncio.Task, int] = {}
+        for jury_id in jury_list:
+            task = asyncio.create_task(
+                self.players[jury_id].vote(
+                    vote_template,
+                    accuser_name, target_name_1, target_name_2,
+                    evidence_log_str, defense_speech_1, defense_speech_2,
+                    self.god_stream_start, self.god_stream_chunk
+                )
+            )
+            task_to_jury[task] = jury_id
+
+        votes: Dict[int, Optional[str]] = {jury_id: None for jury_id in jury_list}
+        pending = set(task_to_jury)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                verdict_decided = False
+                for task in done:
+                    try:
+                        vote = task.result()
+                    except Exception:
+                        vote = "NOT_GUILTY"  # 投票失败按无罪处理 (与 Player.vote 一致)
+                    votes[task_to_jury[task]] = vote
+                    if vote != "GUILTY":
+                        verdict_decided = True
+                if verdict_decided:
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        return votes
 
     async def run_round(self, start_player_id: int):
         # (已修改) 增加调试打印
@@ -3285,7 +3441,7 @@ class GameController:
                 0.5
             )
 
-        game = ZhajinhuaGame(config, self.persistent_chips, start_player_id)
+        game = ZhajinhuaGame(config, self.persistent_chips, start_player_id, rng=self.rng)
         game.set_event_listener(
             "before_compare_resolution",
             lambda **kwargs: self._handle_compare_resolution(game, **kwargs)
@@ -3295,10 +3451,14 @@ class GameController:
 
         self._record_hand_start_state(game)
         await self._apply_start_of_hand_effects(game)  # <-- 在此添加 await
+        self._emit("deal", dealer=start_player_id, ante=list(ante_distribution),
+                   hands=[[self._format_card(card) for card in ps.hand] for ps in game.state.players])
 
         self.player_observed_moods.clear()
         self.player_last_speech.clear()
+        self.prompt_context.invalidate(TOPIC_MOOD, TOPIC_SPEECH)
         self.cheat_action_log.clear()
+        self.secret_message_log.start_hand(self.hand_count)
 
         await self.god_panel_update(self._build_panel_data(game, start_player_id))
         for i, p in enumerate(game.state.players):
@@ -3338,16 +3498,17 @@ class GameController:
                 await self.god_panel_update(self._build_panel_data(game, start_player_id))
                 continue
 
+            await self.pacer.safe_point()  # (新) 暂停时在两次动作之间停住，不再发起新的 LLM 调用
             await self.god_print(f"--- 轮到 {current_player_obj.name} ---", 1)
 
             player_debuffs = {
                 effect["effect_id"]
-                for effect in self.active_effects
-                if effect.get("target_id") == current_player_idx and effect.get("category") == "debuff"
+                for effect in self.active_effects.for_target(current_player_idx)
+                if effect.get("category") == "debuff"
             }
 
             (state_summary, my_hand, actions_str, actions_list,
-             next_player_name, my_persona_str, opponent_personas_str, opponent_reflections_str,
+             next_player_name, my_persona_str, my_status_str, opponent_personas_str, opponent_reflections_str,
              opponent_private_impressions_str, observed_speech_str,
              received_secret_messages_str, inventory_str,
              field_item_intel_str,  # (新) 接收新变量
@@ -3357,10 +3518,51 @@ class GameController:
                 game, current_player_idx, start_player_id, player_debuffs
             )
 
+            # (新) 超出模型预算时，按优先级裁剪复盘、人设、道具描述等段落
+            decide_action_template = self.prompt_templates.get("decide_action", "")
+            # 可裁剪段落留空后渲染的整份模板 (规则前缀、局面、手牌、可选动作、各项数值) 计入固定开销
+            fixed_prompt = render_text(
+                decide_action_template,
+                self_name=current_player_obj.name, game_state_summary=state_summary, my_hand=my_hand,
+                available_actions=actions_str, next_player_name=next_player_name, my_status=my_status_str,
+                min_raise_increment=min_raise_increment, dealer_name=dealer_name, multiplier=multiplier,
+                call_cost=call_cost, table_seating=table_seating_str, opponent_reference=opponent_reference_str,
+                my_persona="", opponent_personas="", opponent_reflections="", opponent_private_impressions_str="",
+                observed_speech_str="", received_secret_messages="", player_inventory="", field_item_intel="",
+                observed_moods="",
+            ) if decide_action_template else ""
+            fitted, tokens_saved = self.prompt_budgeter.fit(
+                current_player_obj.model_name,
+                (fixed_prompt,),
+                {
+                    "my_persona": my_persona_str,
+                    "opponent_personas": opponent_personas_str,
+                    "opponent_reflections": opponent_reflections_str,
+                    "opponent_private_impressions": opponent_private_impressions_str,
+                    "observed_speech": observed_speech_str,
+                    "received_secret_messages": received_secret_messages_str,
+                    "player_inventory": inventory_str,
+                    "field_item_intel": field_item_intel_str,
+                    "observed_moods": observed_moods_str,
+                }
+            )
+            if tokens_saved:
+                print(f"【上帝(预算)】: {current_player_obj.name} 的决策 prompt 超出预算，"
+                      f"裁剪约 {tokens_saved} tokens (累计 {self.prompt_budgeter.tokens_saved})。")
+                my_persona_str = fitted["my_persona"]
+                opponent_personas_str = fitted["opponent_personas"]
+                opponent_reflections_str = fitted["opponent_reflections"]
+                opponent_private_impressions_str = fitted["opponent_private_impressions"]
+                observed_speech_str = fitted["observed_speech"]
+                received_secret_messages_str = fitted["received_secret_messages"]
+                inventory_str = fitted["player_inventory"]
+                field_item_intel_str = fitted["field_item_intel"]
+                observed_moods_str = fitted["observed_moods"]
+
             try:
                 action_json = await current_player_obj.decide_action(
                     state_summary, my_hand, actions_str, next_player_name,
-                    my_persona_str, opponent_personas_str, opponent_reflections_str,
+                    my_persona_str, my_status_str, opponent_personas_str, opponent_reflections_str,
                     opponent_private_impressions_str, observed_speech_str,
                     received_secret_messages_str,
                     inventory_str,
@@ -3372,7 +3574,7 @@ class GameController:
                     call_cost,
                     table_seating_str,
                     opponent_reference_str,
-                    self.prompt_templates.get("decide_action", ""),  # <-- [修复] 传入模板
+                    decide_action_template,  # <-- [修复] 传入模板
                     stream_start_cb=self.god_stream_start,
                     stream_chunk_cb=self.god_stream_chunk
                 )
@@ -3393,7 +3595,14 @@ class GameController:
                         f"【上帝(错误详情)】: [{current_player_obj.name}] 决策失败并强制弃牌，原因: {error_reason}", 0.5)
                 # --- 调试块结束 ---
 
+            if str(action_json.get("action", "")).upper() == "FOLD" and action_json.get("mood") in FORCED_FOLD_CAUSES:
+                self._emit("forced_fold", player=current_player_idx, cause=FORCED_FOLD_CAUSES[action_json["mood"]])
+
             cheat_context = await self._handle_cheat_move(game, current_player_idx, action_json.get("cheat_move"))
+            if cheat_context.get("attempted"):
+                self._emit("cheat", player=current_player_idx, cheat_type=cheat_context.get("type"),
+                           success=bool(cheat_context.get("success")), detected=bool(cheat_context.get("detected")),
+                           eliminated=bool(cheat_context.get("penalty_elimination")))
 
             # --- [修改点 1.2 (修正版)]：如果玩家因作弊被淘汰，则跳过本轮后续动作 ---
             if cheat_context.get("penalty_elimination"):
@@ -3451,6 +3660,9 @@ class GameController:
             re_decide = False  # <-- 📌 新增：定义 re_decide 标志
             if item_to_use:
                 item_result = await self._handle_item_effect(game, current_player_idx, item_to_use)
+                self._emit("item_use", player=current_player_idx,
+                           item_id=item_to_use.get("item_id") if isinstance(item_to_use, dict) else None,
+                           applied=item_result is not None, flags=sorted(item_result or ()))
                 if item_result:
                     if item_result.get("panel_refresh"):
                         await self.god_panel_update(self._build_panel_data(game, start_player_id))
@@ -3492,6 +3704,7 @@ class GameController:
             if error_msg:
                 await self.god_print(error_msg, 0.5)
                 action_obj = Action(player=current_player_idx, type=ActionType.FOLD)
+                self._emit("forced_fold", player=current_player_idx, cause="invalid")
 
             if action_obj.type == ActionType.ACCUSE:
                 trial_happened = await self._handle_accusation(game, action_obj, start_player_id)
@@ -3501,10 +3714,11 @@ class GameController:
 
             player_speech = action_json.get("speech")
             self.player_last_speech[current_player_idx] = player_speech
+            self.prompt_context.invalidate(TOPIC_SPEECH, TOPIC_MOOD)
 
             player_mood = action_json.get("mood", "未知")
             leak_probability = current_player_obj.get_mood_leak_probability()
-            if random.random() < leak_probability:
+            if self.rng.random() < leak_probability:
                 self.player_observed_moods[current_player_idx] = player_mood
                 await self.god_print(f"【上帝视角】: {current_player_obj.name} 似乎泄露了一丝情绪: {player_mood}", 0.5)
             else:
@@ -3518,13 +3732,17 @@ class GameController:
             if player_speech:
                 await self.god_print(f"[{current_player_obj.name} 发言]: {player_speech}", 1)
 
+            self._emit("action", player=current_player_idx, action=action_obj.type.name,
+                       amount=action_obj.amount, target=action_obj.target, pot=game.state.pot)
             try:
                 game.step(action_obj)
                 await self.god_panel_update(self._build_panel_data(game, start_player_id))
                 await self._flush_queued_messages()
             except Exception as e:
+                self._emit("action_failed", player=current_player_idx, error=str(e))
                 await self.god_print(f"!! 动作执行失败: {e}。强制玩家 {current_player_obj.name} 弃牌。", 0)
                 if not game.state.finished:
+                    self._emit("forced_fold", player=current_player_idx, cause="exception")
                     game.step(Action(player=current_player_idx, type=ActionType.FOLD))
                     await self.god_panel_update(self._build_panel_data(game, start_player_id))
                 await self._flush_queued_messages()
@@ -3540,8 +3758,8 @@ class GameController:
                 await self.god_print(f"{current_player_obj.name} 刚刚看了牌，现在轮到他/她再次行动...", 1)
                 continue
 
-            for effect in list(self.active_effects):
-                if effect.get("expires_after_action") and effect.get("target_id") == current_player_idx:
+            for effect in self.active_effects.for_target(current_player_idx):
+                if effect.get("expires_after_action"):
                     self.active_effects.remove(effect)
                     effect_name = effect.get("effect_name", effect.get("effect_id", "效果"))
                     await self.god_print(
@@ -3549,13 +3767,14 @@ class GameController:
                         0.5
                     )
 
-            await asyncio.sleep(1)
+            await self.pacer.sleep(1)
 
         if self._redeal_requested:
             self._redeal_requested = False
             self.persistent_chips = list(self._hand_start_persistent)
-            self.secret_message_log = [entry for entry in self.secret_message_log if entry[0] != self.hand_count]
-            self.cheat_action_log = [entry for entry in self.cheat_action_log if entry[0] != self.hand_count]
+            self.secret_message_log.drop_hand(self.hand_count)
+            self.cheat_action_log.drop_hand(self.hand_count)
+            self._emit("redeal", chips=list(self.persistent_chips))
             await self.god_print("【系统提示】重发令生效，本手作废并重新发牌。", 0.5)
             await self.god_panel_update(self._build_panel_data(None, -1))
             return await self.run_round(start_player_id)
@@ -3587,6 +3806,7 @@ class GameController:
 
         # (新) 在循环外获取 'game' 对象，因为 'game' 在此作用域内 100% 可用。
         current_game_state = game.state
+        chips_before_payout = list(self.persistent_chips)
 
         for i, p_state in enumerate(game.state.players):
             old_chips = self.persistent_chips[i]
@@ -3602,6 +3822,7 @@ class GameController:
                             p.inventory.remove("ITM_005")
                         except ValueError:
                             pass
+                        self.prompt_context.invalidate(TOPIC_INVENTORY)
 
                         revive_chips = 300
                         new_chips = revive_chips  # (新) 将新筹码设为复活筹码
@@ -3632,6 +3853,8 @@ class GameController:
             # (新) 最终更新 persistent_chips
             self.persistent_chips[i] = new_chips
 
+        self._emit("payout", winner=winner_id, pot=final_pot_size, chips_before=chips_before_payout,
+                   chips=list(self.persistent_chips))
         await self.god_panel_update(self._build_panel_data(None, -1))
 
         # --- [新] 经验系统 V2：调用获胜者奖励 ---
@@ -3689,6 +3912,7 @@ class GameController:
 
         for i, player in enumerate(self.players):
             if self.persistent_chips[i] > 0 and self.players[i].alive:
+                await self.pacer.safe_point()
 
                 current_player_impressions = self.player_private_impressions.get(i, {})
 
@@ -3727,9 +3951,10 @@ class GameController:
                 )
 
                 self.player_reflections[i] = reflection_text
+                self.prompt_context.invalidate(TOPIC_REFLECTION)
                 new_impressions_map[i] = private_impressions_dict
                 player.update_experience_from_reflection(reflection_text, private_impressions_dict)
-                await asyncio.sleep(0.5)
+                await self.pacer.sleep(0.5)
 
         for player_id, impressions_dict in new_impressions_map.items():
             if not isinstance(impressions_dict, dict): continue
@@ -3743,3 +3968,4 @@ class GameController:
                 if found_opponent_id != -1 and found_opponent_id != player_id:
                     current_player_impressions[found_opponent_id] = impression_text
             self.player_private_impressions[player_id] = current_player_impressions
+            self.prompt_context.invalidate(TOPIC_IMPRESSION)
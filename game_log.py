@@ -0,0 +1,237 @@
+"""
+ ClassName game_log
+ Description: 牌局日志的追加式写入 (每张牌桌一个实例)
+ - 每条日志作为一行记录写入带缓冲的文件句柄，后台任务定期 flush，进程崩溃最多丢失最后一个刷新周期。
+ - 流式消息直接追加到文件 (不再在内存中拼接字符串)，下一条消息开始时补上换行。
+ - 文件超过 LOG_ROTATE_BYTES，或到达每 LOG_ROTATE_HANDS 手的边界时切换到下一个分卷。
+ - 内存中不保留完整日志；观众界面需要的有限尾部由观众频道的 RecentLog 保存。
+ - (新) 结构化事件另写入 <日志名>.events.jsonl (每行一个 JSON 对象，不分卷)，
+   并在 <日志名>.index.jsonl 中为每手牌记录一行 {"hand", "offset", "seq", "log_part", "log_offset"}，
+   工具与回放可以直接 seek 到第 N 手，无需扫描整个文件。
+"""
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, TextIO
+
+LOG_DIR = Path("logs")
+LOG_FLUSH_INTERVAL = 1.0  # 后台刷新间隔 (秒)
+LOG_BUFFER_BYTES = 64 * 1024  # 文件句柄缓冲区大小
+LOG_ROTATE_BYTES = 8 * 1024 * 1024  # 单个分卷的大小上限 (None 为不按大小切分)
+LOG_ROTATE_HANDS: Optional[int] = None  # 每多少手牌切换一个分卷 (None 为不按手数切分)
+EVENTS_SUFFIX = ".events.jsonl"
+INDEX_SUFFIX = ".index.jsonl"
+HAND_START_EVENT = "hand_start"  # 写入索引的事件类型
+
+
+def encode_event(event: dict) -> bytes:
+    return (json.dumps(event, ensure_ascii=False, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+
+
+class GameLogWriter:
+    """追加式牌局日志；open() 后即可写入，close() 写入结尾并关闭文件。"""
+
+    def __init__(self, base_name: str, log_dir: Path = LOG_DIR,
+                 rotate_bytes: Optional[int] = LOG_ROTATE_BYTES,
+                 rotate_hands: Optional[int] = LOG_ROTATE_HANDS,
+                 flush_interval: float = LOG_FLUSH_INTERVAL,
+                 hand_probe: Optional[Callable[[], int]] = None):
+        self.base_name = base_name
+        self.log_dir = Path(log_dir)
+        self.rotate_bytes = rotate_bytes
+        self.rotate_hands = rotate_hands
+        self.flush_interval = flush_interval
+        self.hand_probe = hand_probe  # 返回当前手数，用于按手切分
+        self.paths: List[Path] = []
+        self.bytes_written = 0  # 当前分卷已写入的字节
+        self.lines_written = 0
+        self._fp: Optional[TextIO] = None
+        self._in_stream = False
+        self._part_start_hand = 0
+        self._flush_task: Optional[asyncio.Task] = None
+        self.events_path = self.log_dir / f"{base_name}{EVENTS_SUFFIX}"
+        self.index_path = self.log_dir / f"{base_name}{INDEX_SUFFIX}"
+        self.events_written = 0
+        self._events_fp: Optional[BinaryIO] = None
+        self._events_offset = 0
+        self._index_fp: Optional[TextIO] = None
+
+    @property
+    def path(self) -> Optional[Path]:
+        """当前 (最后一个) 分卷。"""
+        return self.paths[-1] if self.paths else None
+
+    # ---------- 文件 ----------
+    def open(self):
+        self.log_dir.mkdir(exist_ok=True)
+        self._open_part()
+        self._events_fp = open(self.events_path, "ab", buffering=LOG_BUFFER_BYTES)
+        self._events_offset = self._events_fp.tell()
+        self._index_fp = open(self.index_path, "a", encoding="utf-8")
+        try:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+        except RuntimeError:
+            self._flush_task = None  # 没有事件循环时 (脚本 / 测试) 只在关闭时刷新
+
+    def _open_part(self):
+        part = len(self.paths) + 1
+        suffix = "" if part == 1 else f"_part{part}"
+        path = self.log_dir / f"{self.base_name}{suffix}.txt"
+        self._fp = open(path, "a", encoding="utf-8", buffering=LOG_BUFFER_BYTES)
+        self.paths.append(path)
+        self.bytes_written = 0
+        self._part_start_hand = self._current_hand()
+        header = f"--- 游戏日志 ({time.strftime('%Y-%m-%d %H:%M:%S')}) ---"
+        if part > 1:
+            header += f" [分卷 {part}，接上一分卷，当前第 {self._part_start_hand} 手]"
+        self._write(header + "\n\n")
+
+    def _current_hand(self) -> int:
+        return self.hand_probe() if self.hand_probe else 0
+
+    def _write(self, text: str):
+        self._fp.write(text)
+        self.bytes_written += len(text.encode("utf-8"))
+
+    def _maybe_rotate(self):
+        """只在行边界调用，分卷不会截断流式消息。"""
+        if self.rotate_bytes and self.bytes_written >= self.rotate_bytes:
+            self._rotate()
+            return
+        if self.rotate_hands:
+            # 第一个分卷包含开局前的内容与第 1..N 手，之后每 N 手一个分卷
+            if self._current_hand() >= max(self._part_start_hand, 1) + self.rotate_hands:
+                self._rotate()
+
+    def _rotate(self):
+        self._fp.close()
+        self._open_part()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        for fp in (self._fp, self._events_fp, self._index_fp):
+            if fp is not None:
+                fp.flush()
+
+    # ---------- 写入 ----------
+    def _end_stream(self):
+        if self._in_stream:
+            self._write("\n")
+            self._in_stream = False
+            self.lines_written += 1
+
+    def add_log(self, message: str):
+        """为非流式消息（如 god_print）写入一行。"""
+        if self._fp is None:
+            return
+        self._end_stream()
+        self._maybe_rotate()
+        self._write(message + "\n")
+        self.lines_written += 1
+
+    def start_stream(self, message: str):
+        """开始一条新的流式消息（如 god_stream_start）。"""
+        if self._fp is None:
+            return
+        self._end_stream()
+        self._maybe_rotate()
+        self._write(message)
+        self._in_stream = True
+
+    def append_stream(self, chunk: str):
+        """向当前流式消息追加内容（如 god_stream_chunk），直接写入文件。"""
+        if self._fp is None:
+            return
+        if not self._in_stream:
+            self.start_stream("")
+        self._write(chunk)
+
+    def add_event(self, kind: str, data: dict):
+        """写入一条结构化事件；每手开始的事件同时写入索引 (先刷新事件文件，索引指向的偏移一定可读)。"""
+        if self._events_fp is None:
+            return
+        self.events_written += 1
+        event = {"seq": self.events_written, "t": round(time.time(), 3), "type": kind}
+        event.update(data)
+        if kind == HAND_START_EVENT and self._index_fp is not None:
+            # 文本日志在行边界处切分，同时给出该手在文本日志中的位置
+            self._end_stream()
+            self._maybe_rotate()
+            self._events_fp.flush()
+            self._index_fp.write(json.dumps({
+                "hand": event.get("hand"), "offset": self._events_offset, "seq": self.events_written,
+                "log_part": len(self.paths), "log_offset": self.bytes_written,
+            }) + "\n")
+        line = encode_event(event)
+        self._events_fp.write(line)
+        self._events_offset += len(line)
+
+    async def close(self, footer_lines: List[str] = ()):
+        """写入结尾、刷新并关闭文件；返回所有分卷路径。"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        for attr in ("_events_fp", "_index_fp"):
+            fp = getattr(self, attr)
+            if fp is not None:
+                fp.close()
+                setattr(self, attr, None)
+        if self._fp is None:
+            return self.paths
+        self._end_stream()
+        if footer_lines:
+            self._write("\n" + "\n".join(footer_lines) + "\n")
+        self._fp.close()
+        self._fp = None
+        return self.paths
+
+    def describe(self) -> dict:
+        return {
+            "path": str(self.path) if self.path else None,
+            "parts": len(self.paths),
+            "lines": self.lines_written,
+            "part_bytes": self.bytes_written,
+            "events": self.events_written,
+        }
+
+
+# ---------- 读取 ----------
+def read_hand_index(index_path: Path) -> Dict[int, dict]:
+    """读取索引文件：手牌编号 -> 索引行 (重发牌时同一手会出现多次，保留第一次)。"""
+    index: Dict[int, dict] = {}
+    with open(index_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # 进程崩溃时最后一行可能不完整
+            index.setdefault(entry.get("hand"), entry)
+    return index
+
+
+def hand_byte_range(index: Dict[int, dict], first_hand: int, last_hand: Optional[int] = None) -> tuple:
+    """事件文件中 [first_hand, last_hand] 对应的字节范围 (end 为 None 表示直到文件末尾)。"""
+    last_hand = first_hand if last_hand is None else last_hand
+    if first_hand not in index:
+        raise KeyError(first_hand)
+    start = index[first_hand]["offset"]
+    later = [entry["offset"] for hand, entry in index.items() if hand > last_hand]
+    return start, (min(later) if later else None)
+
+
+def iter_events(events_path: Path, start: int = 0, end: Optional[int] = None) -> Iterator[dict]:
+    """从给定偏移开始逐行读取事件 (惰性，不把整个文件读入内存)。"""
+    with open(events_path, "rb") as f:
+        f.seek(start)
+        while end is None or f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            if not line.endswith(b"\n"):
+                break  # 尚未刷新完整的最后一行
+            yield json.loads(line)
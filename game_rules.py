@@ -177,10 +177,11 @@ class GameState:
     winner: Optional[int] = None
 
 
-def create_deck() -> List[Card]:
+def create_deck(rng=random) -> List[Card]:
+    """rng: 洗牌用的随机源 (random.Random 实例)，默认使用全局随机数。"""
     deck = []
     for r in RANKS:
         for s in SUITS:
             deck.append(make_card(r, s))
-    random.shuffle(deck)
+    rng.shuffle(deck)
     return deck
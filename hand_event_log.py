@@ -0,0 +1,134 @@
+"""
+ ClassName hand_event_log
+ Description: 按手牌分段、带索引的事件日志 (密信 / 作弊记录)
+ 条目仍是元组，第 0 位固定为手牌编号；participant_fields 指定哪些位置是玩家 ID (发送者/接收者/行动者)。
+ 最近 retention_hands 手牌保留在带索引的活跃区，更早的条目压缩后转入按玩家分桶的证据存档，供审判调取。
+"""
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_ARCHIVE_PER_PLAYER = 40  # 每名玩家最多保留的存档条数
+ARCHIVE_TEXT_LIMIT = 160  # 存档中文本字段的最大长度
+
+
+class HandEventLog:
+
+    def __init__(self, participant_fields: Sequence[int], retention_hands: Optional[int] = None,
+                 archive_per_player: int = DEFAULT_ARCHIVE_PER_PLAYER):
+        self.participant_fields = tuple(participant_fields)
+        self.retention_hands = retention_hands  # None = 全部保留在活跃区
+        self.archive_per_player = archive_per_player
+        self._seq = 0
+        self._by_hand: Dict[int, Dict[int, tuple]] = {}
+        self._by_hand_player: Dict[Tuple[int, int], Dict[int, tuple]] = {}
+        self._by_player: Dict[int, Dict[int, tuple]] = {}
+        self._archive: Dict[int, Deque[Tuple[int, tuple]]] = {}
+
+    def _players_of(self, entry: tuple) -> set:
+        return {entry[field] for field in self.participant_fields if entry[field] is not None}
+
+    # ---------- 写入 ----------
+    def append(self, entry: tuple):
+        self._seq += 1
+        seq = self._seq
+        hand = entry[0]
+        self._by_hand.setdefault(hand, {})[seq] = entry
+        for player_id in self._players_of(entry):
+            self._by_hand_player.setdefault((hand, player_id), {})[seq] = entry
+            self._by_player.setdefault(player_id, {})[seq] = entry
+
+    def start_hand(self, hand: int):
+        """新一手开始时调用：超出保留窗口的旧手牌转入压缩存档。"""
+        if self.retention_hands is None:
+            return
+        cutoff = hand - self.retention_hands
+        for old_hand in [h for h in self._by_hand if h < cutoff]:
+            for seq, entry in self._remove_hand(old_hand).items():
+                compact = self._compact(entry)
+                for player_id in self._players_of(entry):
+                    bucket = self._archive.get(player_id)
+                    if bucket is None:
+                        bucket = self._archive[player_id] = deque(maxlen=self.archive_per_player)
+                    bucket.append((seq, compact))
+
+    def drop_hand(self, hand: int):
+        """作废某一手的全部记录 (重发牌)。"""
+        self._remove_hand(hand)
+
+    def clear(self):
+        self._by_hand.clear()
+        self._by_hand_player.clear()
+        self._by_player.clear()
+        self._archive.clear()
+
+    def _remove_hand(self, hand: int) -> Dict[int, tuple]:
+        entries = self._by_hand.pop(hand, {})
+        for seq, entry in entries.items():
+            for player_id in self._players_of(entry):
+                self._discard(self._by_hand_player, (hand, player_id), seq)
+                self._discard(self._by_player, player_id, seq)
+        return entries
+
+    @staticmethod
+    def _discard(index: dict, key, seq: int):
+        bucket = index.get(key)
+        if bucket is None:
+            return
+        bucket.pop(seq, None)
+        if not bucket:
+            del index[key]
+
+    @staticmethod
+    def _compact(entry: tuple) -> tuple:
+        return tuple(
+            value[:ARCHIVE_TEXT_LIMIT] + "…" if isinstance(value, str) and len(value) > ARCHIVE_TEXT_LIMIT else value
+            for value in entry
+        )
+
+    # ---------- 检查点 ----------
+    def snapshot(self) -> dict:
+        """(新) 导出活跃区与存档 (JSON 可序列化)，供检查点保存。"""
+        entries = sorted((seq, entry) for bucket in self._by_hand.values() for seq, entry in bucket.items())
+        return {
+            "seq": self._seq,
+            "entries": [[seq, list(entry)] for seq, entry in entries],
+            "archive": {str(player_id): [[seq, list(entry)] for seq, entry in bucket]
+                        for player_id, bucket in self._archive.items()},
+        }
+
+    def restore(self, data: dict):
+        """(新) 从 snapshot() 的结果重建索引。"""
+        self.clear()
+        for seq, entry in data.get("entries", []):
+            self._seq = seq - 1
+            self.append(tuple(entry))
+        for player_id, items in data.get("archive", {}).items():
+            self._archive[int(player_id)] = deque(((seq, tuple(entry)) for seq, entry in items),
+                                                  maxlen=self.archive_per_player)
+        self._seq = max(self._seq, data.get("seq", 0))
+
+    # ---------- 查询 ----------
+    def for_hand(self, hand: int) -> List[tuple]:
+        return list(self._by_hand.get(hand, {}).values())
+
+    def for_hand_player(self, hand: int, player_id: int) -> List[tuple]:
+        """某一手中与该玩家相关的条目 (无论其是发送者还是接收者)。"""
+        return list(self._by_hand_player.get((hand, player_id), {}).values())
+
+    def involving(self, player_ids: Iterable[int], include_archive: bool = True) -> List[tuple]:
+        """与任一玩家相关的全部条目 (含压缩存档)，按记录顺序去重返回。"""
+        merged: Dict[int, tuple] = {}
+        for player_id in player_ids:
+            if include_archive:
+                merged.update(self._archive.get(player_id, ()))
+            merged.update(self._by_player.get(player_id, {}))
+        return [merged[seq] for seq in sorted(merged)]
+
+    def __iter__(self) -> Iterator[tuple]:
+        merged: Dict[int, tuple] = {}
+        for entries in self._by_hand.values():
+            merged.update(entries)
+        return iter([merged[seq] for seq in sorted(merged)])
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._by_hand.values())
@@ -1,7 +1,9 @@
-from openai import AsyncOpenAI, APITimeoutError
+from openai import AsyncOpenAI, APITimeoutError, BadRequestError
 import asyncio
 import json
-from typing import Callable, Awaitable
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Awaitable, Dict, Optional, Set, Tuple
 
 # 配置文件自己添加即可
 try:
@@ -10,53 +12,246 @@ except ImportError:
     API_KEY = ""
     API_BASE_URL = ""
 
+# (新) 按模型配置是否请求在流末尾附带 usage 统计 (stream_options，用于计算前缀缓存命中)
+# 未列出的模型使用 "default"；已知不支持 stream_options 的服务商可在此把对应模型设为 False
+MODEL_STREAM_USAGE: Dict[str, bool] = {
+    "default": True,
+}
 
-class LLMClient:
-    def __init__(self, api_key=API_KEY, base_url=API_BASE_URL):
-        self.async_client = AsyncOpenAI(
+# (新) 多牌桌共享的限流配置：每个模型同时进行的请求数上限与每分钟请求数上限 (None 为不限)
+# 未列出的模型使用 "default"
+MODEL_CONCURRENCY_LIMITS: Dict[str, int] = {
+    "default": 8,
+}
+MODEL_RPM_LIMITS: Dict[str, Optional[int]] = {
+    "default": None,
+}
+
+
+class PromptCacheStats:
+    """按模型累计 prompt token 与服务商报告的缓存命中 token。"""
+
+    def __init__(self):
+        self.by_model: Dict[str, Dict[str, int]] = {}
+
+    def record(self, model: str, usage) -> None:
+        if usage is None:
+            return
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) if details is not None else None
+        if cached is None and isinstance(details, dict):
+            cached = details.get("cached_tokens")
+        if cached is None:
+            cached = getattr(usage, "prompt_cache_hit_tokens", None)  # DeepSeek 风格字段
+        entry = self.by_model.setdefault(model, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0,
+                                                 "reported_calls": 0})
+        entry["calls"] += 1
+        entry["prompt_tokens"] += int(prompt_tokens)
+        if cached is not None:
+            entry["reported_calls"] += 1
+            entry["cached_tokens"] += int(cached)
+
+    def describe(self) -> Dict[str, dict]:
+        result = {}
+        for model, entry in self.by_model.items():
+            ratio = entry["cached_tokens"] / entry["prompt_tokens"] if entry["prompt_tokens"] else 0.0
+            result[model] = dict(entry, cached_ratio=round(ratio, 3))
+        return result
+
+    def format_stats(self) -> str:
+        if not self.by_model:
+            return "暂无服务商 usage 数据。"
+        parts = []
+        for model, entry in self.describe().items():
+            if entry["reported_calls"]:
+                parts.append(f"{model}: 缓存命中 {entry['cached_ratio']:.0%} "
+                             f"({entry['cached_tokens']}/{entry['prompt_tokens']} tokens)")
+            else:
+                parts.append(f"{model}: 服务商未返回缓存数据 ({entry['prompt_tokens']} tokens)")
+        return "; ".join(parts)
+
+
+# 进程内共享，所有 LLMClient 实例写入同一份统计
+PROMPT_CACHE_STATS = PromptCacheStats()
+
+# (新) 服务商以 400 拒绝过 stream_options 的 (base_url, 模型)，之后不再附带
+STREAM_USAGE_REJECTED: Set[Tuple[str, str]] = set()
+
+
+class ModelRateLimiter:
+    """
+    按模型限流，进程内所有牌桌共用。
+    - 并发上限：同一模型同时在途的请求数 (asyncio.Semaphore，首次使用时创建)。
+    - 每分钟请求数：相邻两次请求的开始时间至少间隔 60/rpm 秒。
+    """
+
+    def __init__(self, concurrency_limits: Dict[str, int] = None,
+                 rpm_limits: Dict[str, Optional[int]] = None):
+        self.concurrency_limits = dict(MODEL_CONCURRENCY_LIMITS if concurrency_limits is None else concurrency_limits)
+        self.rpm_limits = dict(MODEL_RPM_LIMITS if rpm_limits is None else rpm_limits)
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._next_start: Dict[str, float] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.waiting: Dict[str, int] = {}
+
+    def _limit_for(self, limits: Dict, model: str):
+        return limits.get(model, limits.get("default"))
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        sem = self._semaphores.get(model)
+        if sem is None:
+            limit = self._limit_for(self.concurrency_limits, model) or 8
+            sem = self._semaphores[model] = asyncio.Semaphore(max(1, int(limit)))
+        return sem
+
+    async def _wait_for_rpm(self, model: str):
+        rpm = self._limit_for(self.rpm_limits, model)
+        if not rpm:
+            return
+        now = time.monotonic()
+        start_at = max(now, self._next_start.get(model, 0.0))
+        self._next_start[model] = start_at + 60.0 / rpm  # 先占位，再等待
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+    @asynccontextmanager
+    async def slot(self, model: str):
+        """占用该模型的一个请求名额，离开 with 块时释放。"""
+        self.waiting[model] = self.waiting.get(model, 0) + 1
+        try:
+            await self._semaphore(model).acquire()
+        finally:
+            self.waiting[model] -= 1
+        self.in_flight[model] = self.in_flight.get(model, 0) + 1
+        try:
+            await self._wait_for_rpm(model)
+            yield
+        finally:
+            self.in_flight[model] -= 1
+            self._semaphores[model].release()
+
+    def describe(self) -> Dict[str, dict]:
+        models = sorted(set(self.in_flight) | set(self.waiting))
+        return {
+            model: {
+                "in_flight": self.in_flight.get(model, 0),
+                "waiting": self.waiting.get(model, 0),
+                "limit": self._limit_for(self.concurrency_limits, model),
+            }
+            for model in models
+        }
+
+
+MODEL_RATE_LIMITER = ModelRateLimiter()
+
+# (新) 连接池：相同 (api_key, base_url) 的客户端共享一个 AsyncOpenAI (及其 HTTP 连接池)
+_CLIENT_POOL: Dict[Tuple[str, str], AsyncOpenAI] = {}
+
+
+def get_pooled_async_client(api_key: str = API_KEY, base_url: str = API_BASE_URL) -> AsyncOpenAI:
+    key = (api_key or "", base_url or "")
+    client = _CLIENT_POOL.get(key)
+    if client is None:
+        client = _CLIENT_POOL[key] = AsyncOpenAI(
             api_key=api_key,
             base_url=base_url
         )
+    return client
 
-    async def chat_stream(self, messages, model, stream_callback: Callable[[str], Awaitable[None]]) -> str:
-        full_content = ""
-        REQUEST_TIMEOUT_SECONDS = 35.0
 
+class LLMClient:
+    def __init__(self, api_key=API_KEY, base_url=API_BASE_URL):
+        # (新) 不再为每个玩家单独创建 AsyncOpenAI，多张牌桌共用连接池 (首次请求时才取用，重放时无需凭据)
+        self.api_key = api_key
+        self.base_url = base_url
+        self.rate_limiter = MODEL_RATE_LIMITER
+        # (新) 每次调用结束后回调一次调用元数据 (模型、调用点、耗时、prompt 大小、返回文本)，由控制器写入结构化日志
+        # 记录的返回文本可供 replay.ReplayLLMClient 按调用顺序重放
+        self.call_listener: Optional[Callable[[dict], None]] = None
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        return get_pooled_async_client(self.api_key, self.base_url)
+
+    def wants_stream_usage(self, model: str) -> bool:
+        if (self.base_url or "", model) in STREAM_USAGE_REJECTED:
+            return False
+        return bool(MODEL_STREAM_USAGE.get(model, MODEL_STREAM_USAGE.get("default", False)))
+
+    async def _create_stream(self, model, messages, timeout: float):
+        """
+        发起流式请求；按模型配置附带 stream_options。
+        服务商以 400 拒绝 stream_options 时去掉它重试一次，并记住该 (base_url, 模型)。
+        """
+        include_usage = self.wants_stream_usage(model)
+        extra_args = {"stream_options": {"include_usage": True}} if include_usage else {}
         try:
-            stream = await self.async_client.chat.completions.create(
+            return await self.async_client.chat.completions.create(
                 model=model,
                 messages=messages,
                 temperature=0.7,
                 stream=True,
-                timeout=REQUEST_TIMEOUT_SECONDS
+                timeout=timeout,
+                **extra_args
+            )
+        except BadRequestError as e:
+            if not include_usage or "stream_options" not in str(e):
+                raise
+            STREAM_USAGE_REJECTED.add((self.base_url or "", model))
+            print(f"【上帝(警告)】: {model} 不支持 stream_options，之后的请求不再附带 usage 统计。")
+            return await self.async_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.7,
+                stream=True,
+                timeout=timeout,
             )
 
-            async for chunk in stream:
-                if not chunk.choices:
-                    continue
+    async def chat_stream(self, messages, model, stream_callback: Callable[[str], Awaitable[None]],
+                          call_site: str = "") -> str:
+        full_content = ""
+        REQUEST_TIMEOUT_SECONDS = 35.0
+        started = time.monotonic()
+        slot_acquired = None
+        outcome, result, usage_seen = "cancelled", "", None
+
+        try:
+            async with self.rate_limiter.slot(model):
+                slot_acquired = time.monotonic()
+                stream = await self._create_stream(model, messages, REQUEST_TIMEOUT_SECONDS)
 
-                delta = chunk.choices[0].delta
+                async for chunk in stream:
+                    usage = getattr(chunk, "usage", None)
+                    if usage is not None:
+                        PROMPT_CACHE_STATS.record(model, usage)
+                        usage_seen = usage
+                    if not chunk.choices:
+                        continue
 
-                # (新) 修复流逻辑
-                # -----------------------------------
-                text_to_stream = ""
+                    delta = chunk.choices[0].delta
 
-                # 1. 检查推理
-                reasoning_chunk = getattr(delta, 'reasoning_content', None) or ""
-                if reasoning_chunk:
-                    text_to_stream = reasoning_chunk
+                    # (新) 修复流逻辑
+                    # -----------------------------------
+                    text_to_stream = ""
 
-                # 2. 检查内容
-                content_chunk = delta.content or ""
-                if content_chunk:
-                    full_content += content_chunk  # 只有 content_chunk 被计入 full_content
-                    text_to_stream = content_chunk  # content 优先覆盖
+                    # 1. 检查推理
+                    reasoning_chunk = getattr(delta, 'reasoning_content', None) or ""
+                    if reasoning_chunk:
+                        text_to_stream = reasoning_chunk
 
-                # 3. 流式传输
-                if text_to_stream:
-                    await stream_callback(text_to_stream)
-                # -----------------------------------
+                    # 2. 检查内容
+                    content_chunk = delta.content or ""
+                    if content_chunk:
+                        full_content += content_chunk  # 只有 content_chunk 被计入 full_content
+                        text_to_stream = content_chunk  # content 优先覆盖
 
+                    # 3. 流式传输
+                    if text_to_stream:
+                        await stream_callback(text_to_stream)
+                    # -----------------------------------
+
+            outcome, result = "ok", full_content
             return full_content
 
         except APITimeoutError as e:
@@ -65,6 +260,7 @@ class LLMClient:
             await stream_callback(f"\n[LLM 思考超时，强制弃牌...]\n")
             # (新) 确保返回的 JSON 包含所有字段
             error_json_str = f'\n{{\n  "action": "FOLD", "reason": "{error_msg}", "target_name": null, "mood": "超时", "speech": null, "secret_message": null \n}}'
+            outcome, result = "timeout", error_json_str
             return error_json_str
 
         except Exception as e:
@@ -73,4 +269,21 @@ class LLMClient:
             await stream_callback(error_msg)
             # (新) 确保返回的 JSON 包含所有字段
             error_json_str = f'\n{{\n  "action": "FOLD", "reason": "{error_msg}", "target_name": null, "mood": "错误", "speech": null, "secret_message": null \n}}'
+            outcome, result = "error", error_json_str
             return error_json_str
+
+        finally:
+            if self.call_listener is not None:
+                finished = time.monotonic()
+                self.call_listener({
+                    "model": model,
+                    "call_site": call_site,
+                    "outcome": outcome,
+                    "latency_ms": round((finished - started) * 1000, 1),
+                    "queue_ms": round(((slot_acquired or finished) - started) * 1000, 1),
+                    "prompt_chars": sum(len(str(m.get("content") or "")) for m in messages),
+                    "response_chars": len(result),
+                    "prompt_tokens": getattr(usage_seen, "prompt_tokens", None),
+                    "completion_tokens": getattr(usage_seen, "completion_tokens", None),
+                    "response": result,
+                })
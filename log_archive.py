@@ -0,0 +1,261 @@
+"""
+ ClassName log_archive
+ Description: 历史日志的列出与下载 (文本日志、结构化事件、手牌索引)
+ - 文件名只接受 logs/ 目录下的 game_log_* 文件，拒绝任何路径。
+ - 按 Accept-Encoding 协商压缩：优先使用保存时生成的预压缩文件 (.zst / .gz)，否则边读边压缩。
+ - 支持单区间 HTTP Range 请求 (Range 总是针对未压缩内容，此时不压缩)。
+ - 借助手牌索引只返回第 N..M 手的事件，无需扫描整个事件文件。
+"""
+import gzip
+import os
+import re
+import shutil
+import zlib
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from game_log import LOG_DIR, EVENTS_SUFFIX, INDEX_SUFFIX, read_hand_index, hand_byte_range
+
+# (新) 可选的 zstd 压缩：安装了 zstandard 时自动启用 (pip install zstandard)
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+LOG_NAME_PATTERN = re.compile(r"^game_log_[A-Za-z0-9_.-]+$")
+PRECOMPRESSED_SUFFIXES = {"zstd": ".zst", "gzip": ".gz"}
+PRECOMPRESS_ON_SAVE = True  # 牌局结束后为日志生成预压缩文件
+COMPRESS_MIN_BYTES = 1024  # 小于此大小的内容不压缩
+READ_CHUNK_BYTES = 64 * 1024
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+
+_PART_SUFFIX = re.compile(r"_part\d+\.txt$")
+_RANGE_HEADER = re.compile(r"^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$", re.IGNORECASE)
+_MEDIA_TYPES = {
+    ".txt": "text/plain; charset=utf-8",
+    ".jsonl": "application/x-ndjson",
+}
+
+
+def _supported_encodings() -> List[str]:
+    return ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+
+# ---------- 文件 ----------
+def resolve_log(name: str, log_dir: Path = LOG_DIR) -> Path:
+    """把文件名解析为 logs/ 下的路径；名称无效时抛出 ValueError，文件不存在时抛出 FileNotFoundError。"""
+    if not name or not LOG_NAME_PATTERN.match(name) or name.endswith(tuple(PRECOMPRESSED_SUFFIXES.values())):
+        raise ValueError(f"无效的日志文件名: {name!r}")
+    path = Path(log_dir) / name
+    if not path.is_file():
+        raise FileNotFoundError(name)
+    return path
+
+
+def log_base_name(name: str) -> str:
+    """任一日志文件 (文本分卷 / 事件 / 索引) 对应的日志名。"""
+    for suffix in (EVENTS_SUFFIX, INDEX_SUFFIX):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return _PART_SUFFIX.sub("", name).removesuffix(".txt")
+
+
+def list_logs(log_dir: Path = LOG_DIR) -> List[dict]:
+    """列出所有日志文件 (最新的在前)，附带可用的预压缩版本。"""
+    log_dir = Path(log_dir)
+    if not log_dir.is_dir():
+        return []
+    entries = []
+    for entry in os.scandir(log_dir):
+        name = entry.name
+        if not entry.is_file() or not LOG_NAME_PATTERN.match(name):
+            continue
+        if name.endswith(tuple(PRECOMPRESSED_SUFFIXES.values())):
+            continue
+        stat = entry.stat()
+        entries.append({
+            "name": name,
+            "log": log_base_name(name),
+            "kind": "events" if name.endswith(EVENTS_SUFFIX) else "index" if name.endswith(INDEX_SUFFIX) else "text",
+            "size": stat.st_size,
+            "modified": round(stat.st_mtime, 3),
+            "precompressed": [
+                encoding for encoding, suffix in PRECOMPRESSED_SUFFIXES.items()
+                if (log_dir / f"{name}{suffix}").is_file()
+            ],
+        })
+    entries.sort(key=lambda item: (item["modified"], item["name"]), reverse=True)
+    return entries
+
+
+def precompress(path: Path) -> List[Path]:
+    """为已写完的日志生成 .gz (以及可用时的 .zst)，返回生成的文件。阻塞调用，请放在线程中执行。"""
+    path = Path(path)
+    written = []
+    targets = [("gzip", path.with_name(path.name + PRECOMPRESSED_SUFFIXES["gzip"]))]
+    if zstandard is not None:
+        targets.append(("zstd", path.with_name(path.name + PRECOMPRESSED_SUFFIXES["zstd"])))
+    for encoding, target in targets:
+        tmp = target.with_name(target.name + ".tmp")
+        with open(path, "rb") as src:
+            if encoding == "gzip":
+                with gzip.open(tmp, "wb", compresslevel=GZIP_LEVEL) as dst:
+                    shutil.copyfileobj(src, dst, READ_CHUNK_BYTES)
+            else:
+                with open(tmp, "wb") as dst:
+                    zstandard.ZstdCompressor(level=ZSTD_LEVEL).copy_stream(src, dst)
+        os.replace(tmp, target)  # 写完再改名，下载方不会读到半个文件
+        written.append(target)
+    return written
+
+
+# ---------- HTTP ----------
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单区间 Range 头，返回 [start, end)。
+    语法无效、first > last 或多区间时返回 None，按 RFC 9110 忽略该头 (返回完整的 200)；
+    语法有效但无法满足 (起点超出文件、末尾 0 字节) 时抛出 ValueError (416)。
+    """
+    match = _RANGE_HEADER.match(header)
+    if match is None:
+        return None
+    first, last = match.groups()
+    if first:
+        if last and int(last) < int(first):
+            return None
+        start = int(first)
+        end = min(int(last) + 1, size) if last else size
+    elif last:
+        start, end = max(0, size - int(last)), size  # 末尾 N 字节
+    else:
+        return None
+    if start >= end:
+        raise ValueError(header)
+    return start, end
+
+
+def negotiate_encoding(accept_encoding: str) -> List[str]:
+    """按 q 值从高到低返回客户端接受、且本服务支持的编码。"""
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            weights[coding] = quality
+    supported = _supported_encodings()
+    wildcard = weights.get("*")
+    accepted = []
+    for coding in supported:
+        quality = weights.get(coding, wildcard if wildcard is not None else 0.0)
+        if quality > 0:
+            accepted.append((quality, -supported.index(coding), coding))
+    return [coding for _, _, coding in sorted(accepted, reverse=True)]
+
+
+def iter_file(path: Path, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    """逐块读取文件的 [start, end) 区间 (同步生成器，StreamingResponse 会放到线程池中迭代)。"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = None if end is None else end - start
+        while remaining is None or remaining > 0:
+            chunk = f.read(READ_CHUNK_BYTES if remaining is None else min(READ_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def iter_compressed(chunks: Iterator[bytes], encoding: str) -> Iterator[bytes]:
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits=31: gzip 格式
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def log_response(path: Path, headers: Mapping[str, str], download_name: Optional[str] = None,
+                 window: Optional[Tuple[int, Optional[int]]] = None) -> Response:
+    """
+    返回日志文件 (或其中 window 指定的字节区间) 的响应：
+    - 整个文件且带有效 Range 头时返回 206 / 416 (未压缩)；语法无效的 Range 头被忽略。
+    - 否则按 Accept-Encoding 返回预压缩文件、边读边压缩的流，或原始内容。
+    """
+    size = path.stat().st_size
+    media_type = _MEDIA_TYPES.get(path.suffix, "application/octet-stream")
+    base_headers = {"Vary": "Accept-Encoding"}
+    if download_name:
+        base_headers["Content-Disposition"] = f'attachment; filename="{download_name}"'
+
+    if window is not None:
+        start, end = window[0], size if window[1] is None else min(window[1], size)
+    else:
+        start, end = 0, size
+        base_headers["Accept-Ranges"] = "bytes"
+        range_header = headers.get("range")
+        try:
+            byte_range = parse_range(range_header, size) if range_header else None
+        except ValueError:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            return StreamingResponse(
+                iter_file(path, start, end), status_code=206, media_type=media_type,
+                headers=dict(base_headers, **{"Content-Range": f"bytes {start}-{end - 1}/{size}",
+                                              "Content-Length": str(end - start)}),
+            )
+
+    length = end - start
+    encodings = negotiate_encoding(headers.get("accept-encoding", "")) if length >= COMPRESS_MIN_BYTES else []
+    if window is None:
+        for encoding in encodings:
+            variant = path.with_name(path.name + PRECOMPRESSED_SUFFIXES[encoding])
+            # 预压缩文件比原文件旧时 (例如进行中的牌局日志) 不使用
+            if variant.is_file() and variant.stat().st_mtime >= path.stat().st_mtime:
+                return StreamingResponse(
+                    iter_file(variant), media_type=media_type,
+                    headers=dict(base_headers, **{"Content-Encoding": encoding,
+                                                  "Content-Length": str(variant.stat().st_size)}),
+                )
+    if encodings:
+        return StreamingResponse(
+            iter_compressed(iter_file(path, start, end), encodings[0]), media_type=media_type,
+            headers=dict(base_headers, **{"Content-Encoding": encodings[0]}),
+        )
+    return StreamingResponse(iter_file(path, start, end), media_type=media_type,
+                             headers=dict(base_headers, **{"Content-Length": str(length)}))
+
+
+def hand_slice_response(name: str, first_hand: int, last_hand: Optional[int],
+                        headers: Mapping[str, str], log_dir: Path = LOG_DIR) -> Response:
+    """返回第 first_hand..last_hand 手的结构化事件 (NDJSON)。"""
+    base = log_base_name(name)
+    try:
+        events_path = resolve_log(base + EVENTS_SUFFIX, log_dir)
+        index = read_hand_index(resolve_log(base + INDEX_SUFFIX, log_dir))
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except FileNotFoundError:
+        return JSONResponse(status_code=404, content={"error": f"日志 {base} 没有结构化事件或索引。"})
+    if last_hand is not None and last_hand < first_hand:
+        return JSONResponse(status_code=400, content={"error": "last 不能小于 first。"})
+    try:
+        window = hand_byte_range(index, first_hand, last_hand)
+    except KeyError:
+        return JSONResponse(status_code=404, content={"error": f"日志中没有第 {first_hand} 手。",
+                                                      "hands": sorted(index)})
+    return log_response(events_path, headers, window=window)
@@ -0,0 +1,201 @@
+"""
+ ClassName metrics
+ Description: 进程内的运行指标，以 Prometheus 文本格式从 /metrics 导出 (无需外部服务或依赖)
+ - 计数器与直方图由牌桌的结构化事件驱动 (hand_start / action / forced_fold / llm_call / game_end)。
+ - 慢观众丢弃的帧与被断开的观众由频道直接累加到进程级计数器 (牌桌回收后也不会回退)。
+ - 牌桌数、观众数、广播队列深度、LLM 在途请求数等瞬时值在抓取时从各 describe() 读取。
+ - 事件循环延迟由后台任务按固定间隔采样。
+"""
+import asyncio
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+METRIC_PREFIX = "zhajinhua_"
+LLM_LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)  # 秒
+LLM_QUEUE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30)  # 秒 (按模型限流的排队时间)
+PROMPT_CHARS_BUCKETS = (1000, 2000, 4000, 8000, 12000, 16000, 24000, 32000, 64000)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)  # 秒
+LOOP_LAG_INTERVAL = 0.5  # 事件循环延迟采样间隔 (秒)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = METRIC_PREFIX + name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        key = tuple(str(label) for label in labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        if not self.values and not self.labelnames:
+            lines.append(f"{self.name} 0")
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.name = METRIC_PREFIX + name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.series: Dict[LabelValues, list] = {}  # 标签 -> [各桶计数 (非累计), 总和, 次数]
+
+    def observe(self, value: float, *labels) -> None:
+        key = tuple(str(label) for label in labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][index] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(round(total, 6))}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def render_gauge(name: str, help_text: str, samples: Iterable[Tuple[dict, float]]) -> List[str]:
+    """抓取时计算的瞬时值；samples 为 (标签 dict, 数值)。"""
+    name = METRIC_PREFIX + name
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_number(value)}")
+    return lines
+
+
+def game_end_reason(reason: str) -> str:
+    """牌桌的结束原因 (含错误信息) 归类为有限的标签值。"""
+    if reason == "正常结束":
+        return "completed"
+    if reason == "手动停止":
+        return "stopped"
+    return "crashed" if str(reason).startswith("崩溃") else "other"
+
+
+class GameMetrics:
+    """进程内共享的指标集合；牌桌把结构化事件交给 observe_event。"""
+
+    def __init__(self):
+        self.hands = Counter("hands_total", "已开始的手牌数")
+        self.games = Counter("games_finished_total", "已结束的锦标赛", ("reason",))
+        self.actions = Counter("actions_total", "玩家执行的动作", ("action",))
+        self.forced_folds = Counter("forced_folds_total", "被强制弃牌的次数 (按原因)", ("cause",))
+        self.llm_calls = Counter("llm_calls_total", "LLM 调用次数", ("model", "call_site", "outcome"))
+        self.llm_tokens = Counter("llm_tokens_total", "服务商报告的 token 数", ("model", "kind"))
+        self.llm_latency = Histogram("llm_latency_seconds", "LLM 调用耗时 (含排队)", LLM_LATENCY_BUCKETS,
+                                     ("model", "call_site"))
+        self.llm_queue = Histogram("llm_queue_seconds", "LLM 调用在按模型限流处的排队时间", LLM_QUEUE_BUCKETS,
+                                   ("model",))
+        self.prompt_chars = Histogram("llm_prompt_chars", "Prompt 字符数", PROMPT_CHARS_BUCKETS, ("call_site",))
+        self.loop_lag = Histogram("event_loop_lag_seconds", "事件循环调度延迟", LOOP_LAG_BUCKETS)
+        self.dropped_frames = Counter("broadcast_dropped_frames_total", "因观众发送过慢而丢弃的帧")
+        self.slow_disconnects = Counter("broadcast_slow_disconnects_total", "因发送过慢 / 超时被断开的观众")
+        self.last_loop_lag = 0.0
+
+    # ---------- 事件 ----------
+    def observe_event(self, kind: str, data: dict) -> None:
+        if kind == "hand_start":
+            self.hands.inc()
+        elif kind == "action":
+            self.actions.inc(data.get("action", "UNKNOWN"))
+        elif kind == "forced_fold":
+            self.forced_folds.inc(data.get("cause", "unknown"))
+        elif kind == "llm_call":
+            model, call_site = data.get("model", ""), data.get("call_site", "")
+            self.llm_calls.inc(model, call_site, data.get("outcome", ""))
+            if data.get("latency_ms") is not None:
+                self.llm_latency.observe(data["latency_ms"] / 1000, model, call_site)
+            if data.get("queue_ms") is not None:
+                self.llm_queue.observe(data["queue_ms"] / 1000, model)
+            if data.get("prompt_chars") is not None:
+                self.prompt_chars.observe(data["prompt_chars"], call_site)
+            for kind_name in ("prompt", "completion"):
+                tokens = data.get(f"{kind_name}_tokens")
+                if tokens:
+                    self.llm_tokens.inc(model, kind_name, amount=tokens)
+        elif kind == "game_end":
+            self.games.inc(game_end_reason(data.get("reason", "")))
+
+    async def monitor_loop_lag(self, interval: float = LOOP_LAG_INTERVAL):
+        """后台任务：测量 sleep(interval) 实际多等了多久。"""
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(interval)
+            self.last_loop_lag = max(0.0, loop.time() - started - interval)
+            self.loop_lag.observe(self.last_loop_lag)
+
+    # ---------- 导出 ----------
+    def render(self, tables: Optional[dict] = None, llm: Optional[dict] = None) -> str:
+        """
+        Prometheus 文本格式。
+        tables: TableManager.describe() 的结果；llm: MODEL_RATE_LIMITER.describe() 的结果。
+        """
+        lines: List[str] = []
+        for metric in (self.hands, self.games, self.actions, self.forced_folds, self.llm_calls, self.llm_tokens,
+                       self.llm_latency, self.llm_queue, self.prompt_chars, self.loop_lag,
+                       self.dropped_frames, self.slow_disconnects):
+            lines += metric.render()
+        lines += render_gauge("event_loop_lag_last_seconds", "最近一次采样的事件循环延迟",
+                              [({}, round(self.last_loop_lag, 6))])
+
+        if tables is not None:
+            rows = tables.get("tables", [])
+            channels = [row["channel"] for row in rows]
+            lines += render_gauge("tables", "牌桌数 (按状态)", [
+                ({"state": "running"}, sum(1 for row in rows if row["running"] and not row.get("suspended"))),
+                ({"state": "suspended"}, sum(1 for row in rows if row["running"] and row.get("suspended"))),
+                ({"state": "idle"}, sum(1 for row in rows if not row["running"])),
+            ])
+            lines += render_gauge("tables_max", "牌桌数量上限", [({}, tables.get("max_tables", 0))])
+            lines += render_gauge("spectators", "已连接的观众", [({}, sum(c["spectators"] for c in channels))])
+            lines += render_gauge("broadcast_queue_depth", "所有观众发送队列中的帧数",
+                                  [({}, sum(c["queue_depth"] for c in channels))])
+            lines += render_gauge("broadcast_max_queue_depth", "单个观众的最大发送队列长度",
+                                  [({}, max((c["max_queue_depth"] for c in channels), default=0))])
+        if llm is not None:
+            lines += render_gauge("llm_in_flight", "正在进行的 LLM 请求 (按模型)",
+                                  [({"model": model}, entry["in_flight"]) for model, entry in sorted(llm.items())])
+            lines += render_gauge("llm_waiting", "等待限流名额的 LLM 请求 (按模型)",
+                                  [({"model": model}, entry["waiting"]) for model, entry in sorted(llm.items())])
+        return "\n".join(lines) + "\n"
+
+
+# 进程内共享，所有牌桌写入同一份指标
+METRICS = GameMetrics()
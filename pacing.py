@@ -0,0 +1,105 @@
+"""
+ ClassName pacing
+ Description: 节奏控制器 (观战延时与游戏逻辑分离)
+ 游戏逻辑只声明“这里适合停顿 N 秒”，实际等待多久由服务器持有的 Pacer 按速度档位决定。
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+
+@dataclass(frozen=True)
+class PacingProfile:
+    name: str
+    label: str
+    scale: float  # 延时倍率：1.0 = 直播原速，0 = 完全不等待
+
+
+PACING_PROFILES: Dict[str, PacingProfile] = {
+    "live": PacingProfile("live", "直播观战", 1.0),
+    "x4": PacingProfile("x4", "4 倍速", 0.25),
+    "fast": PacingProfile("fast", "10 倍速", 0.1),
+    "x16": PacingProfile("x16", "16 倍速", 0.0625),
+    "headless": PacingProfile("headless", "无延时 (后台)", 0.0),
+}
+
+DEFAULT_PACING_PROFILE = "live"
+
+
+class Pacer:
+    """
+    统一的延时入口。
+    - 切换档位会立即唤醒所有正在等待的 sleep，新档位马上生效。
+    - 可选的 audience_probe 返回 False (无人观看) 时，所有延时跳过，游戏以 LLM 速度运行。
+    - (新) suspend() 后，游戏逻辑在下一个安全点 (safe_point，动作 / 手牌之间) 停住，resume() 后继续。
+    """
+
+    def __init__(self, profile: str = DEFAULT_PACING_PROFILE,
+                 audience_probe: Optional[Callable[[], bool]] = None):
+        self.profile: PacingProfile = self._resolve(profile)
+        self._audience_probe = audience_probe
+        self._wake_event = asyncio.Event()
+        self._resume_event = asyncio.Event()
+        self._resume_event.set()
+        self.requested_seconds: float = 0.0  # 游戏逻辑申请的总延时
+        self.applied_seconds: float = 0.0  # 实际等待的总延时
+
+    @staticmethod
+    def _resolve(name: str) -> PacingProfile:
+        profile = PACING_PROFILES.get(str(name or "").strip().lower())
+        if profile is None:
+            raise ValueError(f"未知的节奏档位: {name} (可选: {', '.join(PACING_PROFILES)})")
+        return profile
+
+    def set_profile(self, name: str) -> PacingProfile:
+        """切换速度档位 (未知档位抛出 ValueError)。"""
+        self.profile = self._resolve(name)
+        # 唤醒正在等待的延时，让新档位立即生效
+        self._wake_event.set()
+        self._wake_event = asyncio.Event()
+        return self.profile
+
+    @property
+    def suspended(self) -> bool:
+        return not self._resume_event.is_set()
+
+    def suspend(self) -> None:
+        self._resume_event.clear()
+
+    def resume(self) -> None:
+        self._resume_event.set()
+
+    async def safe_point(self) -> None:
+        """暂停时在此等待恢复；未暂停时立即返回 (不让出事件循环)。"""
+        if not self._resume_event.is_set():
+            await self._resume_event.wait()
+
+    def scaled(self, delay: float) -> float:
+        if not delay or delay <= 0:
+            return 0.0
+        if self._audience_probe is not None and not self._audience_probe():
+            return 0.0
+        return delay * self.profile.scale
+
+    async def sleep(self, delay: float) -> None:
+        self.requested_seconds += max(0.0, delay or 0.0)
+        actual = self.scaled(delay)
+        if actual <= 0:
+            await asyncio.sleep(0)  # 仍然让出事件循环，保证广播等任务可以运行
+            return
+
+        self.applied_seconds += actual
+        try:
+            await asyncio.wait_for(self._wake_event.wait(), timeout=actual)
+        except asyncio.TimeoutError:
+            pass
+
+    def describe(self) -> dict:
+        return {
+            "profile": self.profile.name,
+            "label": self.profile.label,
+            "scale": self.profile.scale,
+            "suspended": self.suspended,
+            "requested_seconds": round(self.requested_seconds, 2),
+            "applied_seconds": round(self.applied_seconds, 2),
+        }
@@ -0,0 +1,79 @@
+"""
+ ClassName panel_state
+ Description: 版本化的上帝面板状态 (增量 panel 协议)
+ - panel_update: {"type": "panel_update", "v": 版本, "data": 完整快照}，连接 / 重新同步时发送
+ - panel_patch:  {"type": "panel_patch", "v": 版本, "ops": [[路径, 新值], [路径], ...]}
+   只包含相对上一版本变化的字段；只有路径没有值的项表示删除该键。
+   客户端只在 v == 本地版本 + 1 时应用补丁，否则发送 PANEL_RESYNC 请求完整快照。
+"""
+from typing import Any, List, Optional, Tuple
+
+PATCH_MAX_OPS = 48  # 修改项超过此数时直接发送完整快照
+
+
+def diff_panel(old: Any, new: Any, path: Tuple = (), ops: Optional[List[list]] = None) -> List[list]:
+    """
+    计算两个 JSON 结构的差异。字典按键递归；等长列表按下标递归；
+    长度变化的列表或类型变化的值整体替换。
+    """
+    if ops is None:
+        ops = []
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key, value in new.items():
+            if key not in old:
+                ops.append([[*path, key], value])
+            else:
+                diff_panel(old[key], value, (*path, key), ops)
+        for key in old.keys() - new.keys():
+            ops.append([[*path, key]])
+    elif isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        for index, (old_item, new_item) in enumerate(zip(old, new)):
+            diff_panel(old_item, new_item, (*path, index), ops)
+    elif type(old) is not type(new) or old != new:
+        ops.append([list(path), new])
+    return ops
+
+
+class PanelState:
+    """每个房间一份：保存最近的完整快照与版本号，把新快照转换为补丁。"""
+
+    def __init__(self, max_ops: int = PATCH_MAX_OPS):
+        self.max_ops = max_ops
+        self.version = 0
+        self.snapshot: Optional[dict] = None
+        self.patches = 0
+        self.full_snapshots = 0
+        self.unchanged = 0
+
+    def full_message(self) -> Optional[dict]:
+        if self.snapshot is None:
+            return None
+        return {"type": "panel_update", "v": self.version, "data": self.snapshot}
+
+    def update(self, data: dict) -> Optional[dict]:
+        """记录新快照，返回应广播的消息；与上一版本完全相同时返回 None。"""
+        if self.snapshot is None:
+            self.version += 1
+            self.snapshot = data
+            self.full_snapshots += 1
+            return self.full_message()
+
+        ops = diff_panel(self.snapshot, data)
+        if not ops:
+            self.unchanged += 1
+            return None
+        self.version += 1
+        self.snapshot = data
+        if len(ops) > self.max_ops:
+            self.full_snapshots += 1
+            return self.full_message()
+        self.patches += 1
+        return {"type": "panel_patch", "v": self.version, "ops": ops}
+
+    def describe(self) -> dict:
+        return {
+            "version": self.version,
+            "patches": self.patches,
+            "full_snapshots": self.full_snapshots,
+            "unchanged": self.unchanged,
+        }
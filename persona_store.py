@@ -0,0 +1,176 @@
+"""
+ ClassName persona_store
+ Description: 已使用人设的追加式存储 + 相似度索引
+ - 每条人设一行 JSONL，新增时只追加，不再整文件重写。
+ - 以字符 n-gram (shingle) 计算 MinHash 签名，配合 LSH 分桶快速找出近似重复。
+ - 创建人设时只把有限条样本放进 Prompt，生成后在本地做近似重复检查。
+"""
+import json
+import random
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+BASE_DIR = Path(__file__).parent.resolve()
+PERSONA_STORE_PATH = BASE_DIR / "used_personas.jsonl"
+LEGACY_PERSONA_PATH = BASE_DIR / "used_personas.json"  # 旧格式：[{"text": ...}, ...]
+
+SHINGLE_SIZE = 3  # 中文按 3 字切片
+NUM_PERM = 64  # MinHash 签名长度
+LSH_BANDS = 16  # 16 段 x 4 行
+NEAR_DUPLICATE_THRESHOLD = 0.5  # shingle Jaccard 相似度超过此值视为近似重复
+PROMPT_RECENT_SAMPLE = 8  # Prompt 中放入最近使用的人设条数
+PROMPT_RANDOM_SAMPLE = 4  # 另外随机抽取的较早人设条数
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_perm_rng = random.Random(20240601)  # 固定种子，保证签名跨进程一致
+_PERMUTATIONS: List[Tuple[int, int]] = [
+    (_perm_rng.randrange(1, _MERSENNE_PRIME), _perm_rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)
+]
+
+
+def _shingles(text: str) -> Set[str]:
+    compact = "".join(text.split())
+    if len(compact) <= SHINGLE_SIZE:
+        return {compact} if compact else set()
+    return {compact[i:i + SHINGLE_SIZE] for i in range(len(compact) - SHINGLE_SIZE + 1)}
+
+
+def _minhash(shingles: Set[str]) -> Tuple[int, ...]:
+    if not shingles:
+        return tuple([_MAX_HASH] * NUM_PERM)
+    hashed = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashed)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class PersonaStore:
+
+    def __init__(self, path: Path = PERSONA_STORE_PATH, legacy_path: Optional[Path] = LEGACY_PERSONA_PATH):
+        self.path = Path(path)
+        self.legacy_path = Path(legacy_path) if legacy_path else None
+        self._lock = threading.Lock()
+        self._texts: List[str] = []
+        self._known: Set[str] = set()
+        self._shingles: List[Set[str]] = []
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        self._sample_rng = random.Random()  # 独立随机源，不影响牌局的全局随机数
+        self._load()
+
+    # ---------- 加载 ----------
+    def _load(self):
+        try:
+            if not self.path.exists() and self.legacy_path and self.legacy_path.exists():
+                self._migrate_legacy()
+            if self.path.exists():
+                with self.path.open("r", encoding="utf-8") as fp:
+                    for line in fp:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            text = json.loads(line).get("text")
+                        except (json.JSONDecodeError, AttributeError):
+                            continue  # 跳过写坏的行 (例如进程中途退出)
+                        if text:
+                            self._index(text)
+        except Exception as exc:
+            print(f"【上帝(警告)】: 加载人设记录失败: {exc}。将从空白开始。")
+
+    def _migrate_legacy(self):
+        content = self.legacy_path.read_text(encoding="utf-8").strip()
+        data = json.loads(content) if content else []
+        texts = [p.get("text") for p in data if isinstance(p, dict) and p.get("text")]
+        with self.path.open("w", encoding="utf-8") as fp:
+            for text in texts:
+                fp.write(json.dumps({"text": text}, ensure_ascii=False) + "\n")
+        print(f"【上帝(提示)】: 已将 {len(texts)} 条旧人设记录迁移到 {self.path.name}。")
+
+    def _index(self, text: str) -> bool:
+        if text in self._known:
+            return False
+        idx = len(self._texts)
+        shingles = _shingles(text)
+        self._texts.append(text)
+        self._known.add(text)
+        self._shingles.append(shingles)
+        for key in self._band_keys(_minhash(shingles)):
+            self._buckets.setdefault(key, []).append(idx)
+        return True
+
+    @staticmethod
+    def _band_keys(signature: Tuple[int, ...]):
+        rows = NUM_PERM // LSH_BANDS
+        for band in range(LSH_BANDS):
+            yield band, signature[band * rows:(band + 1) * rows]
+
+    # ---------- 对外接口 ----------
+    def add(self, text: str) -> bool:
+        """记录一条新人设 (追加一行)。已存在时返回 False。"""
+        text = (text or "").strip()
+        if not text:
+            return False
+        with self._lock:
+            if not self._index(text):
+                return False
+            try:
+                with self.path.open("a", encoding="utf-8") as fp:
+                    fp.write(json.dumps({"text": text}, ensure_ascii=False) + "\n")
+            except OSError as exc:
+                print(f"【上帝(警告)】: 写入人设记录失败: {exc}")
+            return True
+
+    def find_near_duplicate(self, text: str,
+                            threshold: float = NEAR_DUPLICATE_THRESHOLD) -> Optional[Tuple[str, float]]:
+        """返回最相似的历史人设及相似度 (超过阈值时)，否则 None。"""
+        shingles = _shingles(text or "")
+        if not shingles:
+            return None
+        with self._lock:
+            candidates: Set[int] = set()
+            for key in self._band_keys(_minhash(shingles)):
+                candidates.update(self._buckets.get(key, ()))
+            best: Optional[Tuple[str, float]] = None
+            for idx in candidates:
+                similarity = _jaccard(shingles, self._shingles[idx])
+                if similarity >= threshold and (best is None or similarity > best[1]):
+                    best = (self._texts[idx], similarity)
+            return best
+
+    def sample_for_prompt(self, recent: int = PROMPT_RECENT_SAMPLE,
+                          random_count: int = PROMPT_RANDOM_SAMPLE) -> List[str]:
+        """最近使用的若干条 + 较早记录中随机若干条，条数有上限。"""
+        with self._lock:
+            recent_texts = self._texts[-recent:] if recent > 0 else []
+            older = self._texts[:-recent] if recent > 0 else list(self._texts)
+            picked = self._sample_rng.sample(older, min(random_count, len(older))) if older else []
+            return picked + recent_texts
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def __contains__(self, text: str) -> bool:
+        return text in self._known
+
+
+_STORE: Optional[PersonaStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_persona_store() -> PersonaStore:
+    """进程内共享的人设存储 (首次调用时加载)。"""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = PersonaStore()
+        return _STORE
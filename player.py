@@ -5,6 +5,7 @@ import asyncio
 import ast
 from typing import List, Dict, Callable, Awaitable, Optional, Tuple
 from llm_client import LLMClient
+from prompt_layout import build_messages
 import pathlib
 import traceback  # (新) 导入 traceback
 
@@ -37,6 +38,36 @@ class Player:
         # [新] 贷款系统：记录未清贷款的到期手数与金额
         self.loan_data: Dict[str, int] = {}
 
+    # --- (新) 检查点 ---
+    def snapshot(self) -> Dict[str, object]:
+        """导出跨手牌保留的状态 (JSON 可序列化)；LLM 客户端不保存。"""
+        return {
+            "alive": self.alive,
+            "experience": self.experience,
+            "persona_tags": sorted(self.persona_tags),
+            "persona_text": self.persona_text,
+            "play_history": list(self.play_history),
+            "current_pressure": self.current_pressure,
+            "cheat_attempts": self.cheat_attempts,
+            "cheat_success": self.cheat_success,
+            "mindgame_moves": self.mindgame_moves,
+            "inventory": list(self.inventory),
+            "loan_data": dict(self.loan_data),
+        }
+
+    def restore(self, state: Dict[str, object]) -> None:
+        self.alive = bool(state.get("alive", True))
+        self.experience = float(state.get("experience", 0.0))
+        self.persona_tags = set(state.get("persona_tags", ()))
+        self.persona_text = state.get("persona_text", "")
+        self.play_history = list(state.get("play_history", ()))
+        self.current_pressure = float(state.get("current_pressure", 0.0))
+        self.cheat_attempts = int(state.get("cheat_attempts", 0))
+        self.cheat_success = int(state.get("cheat_success", 0))
+        self.mindgame_moves = int(state.get("mindgame_moves", 0))
+        self.inventory = list(state.get("inventory", ()))
+        self.loan_data = dict(state.get("loan_data", {}))
+
     # --- (新) 经验系统辅助常量 ---
     _EXPERIENCE_KEYWORDS: Dict[str, float] = {
         "老手": 18.0,
@@ -363,7 +394,8 @@ class Player:
             full_intro = await self.llm_client.chat_stream(
                 messages,
                 model=self.model_name,
-                stream_callback=stream_chunk_cb
+                stream_callback=stream_chunk_cb,
+                call_site="create_persona"
             )
 
             intro_text = full_intro.strip().replace("\n", " ")
@@ -387,6 +419,7 @@ class Player:
                             available_actions_str: str,
                             next_player_name: str,
                             my_persona: str,
+                            my_status: str,
                             opponent_personas: str,
                             opponent_reflections: str,
                             opponent_private_impressions_str: str,
@@ -415,13 +448,15 @@ class Player:
             if not template:
                 raise RuntimeError("无法读取 Prompt 模板文件。")
 
-            prompt = template.format(
+            messages = build_messages(
+                template,
                 self_name=self.name,
                 game_state_summary=game_state_summary,
                 my_hand=my_hand,
                 available_actions=available_actions_str,
                 next_player_name=next_player_name,
                 my_persona=my_persona,
+                my_status=my_status,
                 opponent_personas=opponent_personas,
                 opponent_reflections=opponent_reflections,
                 opponent_private_impressions_str=opponent_private_impressions_str,
@@ -437,14 +472,14 @@ class Player:
                 table_seating=table_seating_str,
                 opponent_reference=opponent_reference_str
             )
-            messages = [{"role": "user", "content": prompt}]
 
             await stream_start_cb(f"[{self.name} 思考中...]: ")
 
             full_content = await self.llm_client.chat_stream(
                 messages,
                 model=self.model_name,
-                stream_callback=stream_chunk_cb
+                stream_callback=stream_chunk_cb,
+                call_site="decide_action"
             )
             full_content_debug = full_content  # (新) 存储
 
@@ -657,7 +692,8 @@ class Player:
             full_defense = await self.llm_client.chat_stream(
                 messages,
                 model=self.model_name,
-                stream_callback=stream_chunk_cb
+                stream_callback=stream_chunk_cb,
+                call_site="defend"
             )
             await stream_chunk_cb("\n")
             return full_defense.strip().replace("\n", " ")
@@ -682,7 +718,8 @@ class Player:
         if not template:
             return "NOT_GUILTY"
 
-        prompt = template.format(
+        messages = build_messages(
+            template,
             self_name=self.name,
             accuser_name=accuser_name,
             target_name_1=target_name_1,
@@ -691,7 +728,6 @@ class Player:
             defense_speech_1=defense_speech_1,
             defense_speech_2=defense_speech_2
         )
-        messages = [{"role": "user", "content": prompt}]
 
         await stream_start_cb(f"【上帝(陪审团投票)】: [{self.name} 正在秘密投票...]: ")
 
@@ -699,7 +735,8 @@ class Player:
             full_content = await self.llm_client.chat_stream(
                 messages,
                 model=self.model_name,
-                stream_callback=lambda s: asyncio.sleep(0.001)
+                stream_callback=lambda s: asyncio.sleep(0.001),
+                call_site="vote"
             )
 
             json_match = re.search(r'```json\s*({[\s\S]*?})\s*```|\s*({[\s\S]*})', full_content)
@@ -714,6 +751,11 @@ class Player:
             await stream_chunk_cb(" (已投: 无罪)\n")
             return "NOT_GUILTY"
 
+        except asyncio.CancelledError:
+            # (新) 裁决已定，投票被取消：补上结尾，不留下半行
+            await stream_chunk_cb(" (裁决已定，未计票)\n")
+            raise
+
         except Exception as e:
             await stream_chunk_cb(f"\n投票时出错: {str(e)} (自动投: 无罪)\n")
             return "NOT_GUILTY"
@@ -733,7 +775,8 @@ class Player:
         if not bribe_prompt_template:
             return {"bribe": False, "reason": "系统错误：贿赂模板未加载"}
 
-        prompt = bribe_prompt_template.format(
+        messages = build_messages(
+            bribe_prompt_template,
             self_name=self.name,
             bribe_cost=bribe_cost,
             success_chance_percent=success_chance * 100.0,
@@ -744,14 +787,14 @@ class Player:
             consequence_string=consequence_string
             # ↑↑ 添加完毕 ↑↑
         )
-        messages = [{"role": "user", "content": prompt}]
 
         await stream_start_cb(f"【上帝(密谈)】: [{self.name} 正在紧急决策...]: ")
         try:
             full_content = await self.llm_client.chat_stream(
                 messages,
                 model=self.model_name,
-                stream_callback=stream_chunk_cb
+                stream_callback=stream_chunk_cb,
+                call_site="decide_bribe"
             )
             await stream_chunk_cb("\n")
 
@@ -788,7 +831,8 @@ class Player:
             if not template:
                 raise RuntimeError("无法读取复盘 Prompt")
 
-            prompt = template.format(
+            messages = build_messages(
+                template,
                 self_name=self.name,
                 round_history=round_history,
                 round_result=round_result,
@@ -797,7 +841,6 @@ class Player:
                 player_self_details=player_self_details,
                 opponent_name_list=opponent_name_list
             )
-            messages = [{"role": "user", "content": prompt}]
 
             await stream_start_cb(f"【上帝(复盘中)】: [{self.name}]: ")
 
@@ -805,7 +848,8 @@ class Player:
             full_content = await self.llm_client.chat_stream(
                 messages,
                 model=self.model_name,
-                stream_callback=lambda s: asyncio.sleep(0.001)
+                stream_callback=lambda s: asyncio.sleep(0.001),
+                call_site="reflect"
             )
             full_content_debug = full_content  # (新)
 
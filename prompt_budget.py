@@ -0,0 +1,148 @@
+"""
+ ClassName prompt_budget
+ Description: Prompt token 预算器
+ 按模型设定每轮决策 prompt 的 token 预算；超出时按段落优先级从低到高截断，
+ 可裁剪段落留空后渲染出的整份模板 (局面、手牌、可选动作、座位表等) 计入固定开销。
+ 玩家自己的背包只截短道具描述，"名称 (ID)" 始终保留，道具不会因裁剪而"消失"。
+"""
+import re
+from typing import Callable, Dict, Iterable, Tuple
+
+# 每个模型的决策 prompt 预算 (估算 token)。未列出的模型使用 "default"。
+PROMPT_TOKEN_BUDGETS: Dict[str, int] = {
+    "default": 9000,
+    "doubao-seed-1-6-lite-251015": 8000,
+}
+
+# 段落优先级：数值越小越先被裁剪
+SECTION_PRIORITIES: Dict[str, int] = {
+    "opponent_reflections": 1,  # 对手的过往复盘
+    "opponent_personas": 2,  # 对手开场人设
+    "player_inventory": 3,  # 道具描述 (只截短描述，不丢道具)
+    "field_item_intel": 3,
+    "opponent_private_impressions": 4,
+    "observed_speech": 5,
+    "observed_moods": 5,
+    "received_secret_messages": 6,
+    "my_persona": 7,
+}
+
+MIN_SECTION_TOKENS = 40  # 裁剪后每个段落至少保留的 token
+TRIM_MARK = "…"
+
+_WIDE_CHAR = re.compile("[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算：中日韩字符 / 全角标点约 1 token，其余约 4 字符 1 token。"""
+    if not text:
+        return 0
+    wide = len(_WIDE_CHAR.findall(text))
+    return wide + (len(text) - wide + 3) // 4
+
+
+def _truncate_to_tokens(text: str, target_tokens: int) -> str:
+    """把文本裁到目标 token 以内：每行按比例截短，行尾加省略号，保留行结构。"""
+    current = estimate_tokens(text)
+    if current <= target_tokens:
+        return text
+    ratio = target_tokens / current
+    lines = text.split("\n")
+    trimmed = []
+    for line in lines:
+        keep = max(8, int(len(line) * ratio))
+        trimmed.append(line if len(line) <= keep else line[:keep] + TRIM_MARK)
+    result = "\n".join(trimmed)
+    # 行数过多时按比例截短仍可能超标，再按行从尾部丢弃
+    while len(trimmed) > 1 and estimate_tokens(result) > target_tokens:
+        trimmed.pop()
+        result = "\n".join(trimmed + [f"  - (其余 {len(lines) - len(trimmed)} 条已省略)"])
+    return result
+
+
+_ITEM_LINE = re.compile(r"^(\s*- .*?\([A-Za-z0-9_]+\)): (.*)$")
+
+
+def _truncate_item_descriptions(text: str, target_tokens: int) -> str:
+    """背包段落：按比例截短每件道具的描述，"  - 名称 (ID)" 部分原样保留，一行也不丢。"""
+    current = estimate_tokens(text)
+    if current <= target_tokens:
+        return text
+    lines = text.split("\n")
+    matches = [_ITEM_LINE.match(line) for line in lines]
+    fixed = sum(estimate_tokens(match.group(1) if match else line) for match, line in zip(matches, lines))
+    described = current - fixed
+    ratio = max(0, target_tokens - fixed) / described if described > 0 else 0.0
+    trimmed = []
+    for match, line in zip(matches, lines):
+        if match is None:
+            trimmed.append(line)
+            continue
+        head, description = match.groups()
+        keep = int(len(description) * ratio)
+        if keep >= len(description):
+            trimmed.append(line)
+        elif keep <= 0:
+            trimmed.append(head)
+        else:
+            trimmed.append(f"{head}: {description[:keep]}{TRIM_MARK}")
+    return "\n".join(trimmed)
+
+
+# 需要专门裁剪方式的段落；其余段落使用 _truncate_to_tokens
+SECTION_TRIMMERS: Dict[str, Callable[[str, int], str]] = {
+    "player_inventory": _truncate_item_descriptions,
+}
+
+
+class PromptBudgeter:
+
+    def __init__(self, budgets: Dict[str, int] = None, priorities: Dict[str, int] = None):
+        self.budgets = dict(PROMPT_TOKEN_BUDGETS if budgets is None else budgets)
+        self.priorities = dict(SECTION_PRIORITIES if priorities is None else priorities)
+        self.trimmed_prompts = 0
+        self.tokens_saved = 0
+
+    def budget_for(self, model_name: str) -> int:
+        return self.budgets.get(model_name, self.budgets.get("default", 9000))
+
+    def fit(self, model_name: str, fixed_parts: Iterable[str],
+            sections: Dict[str, str]) -> Tuple[Dict[str, str], int]:
+        """
+        返回 (裁剪后的段落, 节省的 token 数)。
+        fixed_parts: 不可裁剪的内容 (通常是可裁剪段落留空后渲染的整份模板)，只计入开销。
+        """
+        budget = self.budget_for(model_name)
+        fixed_tokens = sum(estimate_tokens(part) for part in fixed_parts)
+        section_tokens = {name: estimate_tokens(text) for name, text in sections.items()}
+        overflow = fixed_tokens + sum(section_tokens.values()) - budget
+        if overflow <= 0:
+            return sections, 0
+
+        fitted = dict(sections)
+        saved = 0
+        order = sorted(sections, key=lambda name: self.priorities.get(name, 99))
+        for name in order:
+            if overflow <= 0:
+                break
+            if name not in self.priorities:
+                continue  # 未声明优先级的段落视为不可裁剪
+            tokens = section_tokens[name]
+            if tokens <= MIN_SECTION_TOKENS:
+                continue
+            target = max(MIN_SECTION_TOKENS, tokens - overflow)
+            fitted[name] = SECTION_TRIMMERS.get(name, _truncate_to_tokens)(sections[name], target)
+            reduced = tokens - estimate_tokens(fitted[name])
+            if reduced <= 0:
+                fitted[name] = sections[name]
+                continue
+            saved += reduced
+            overflow -= reduced
+
+        if saved:
+            self.trimmed_prompts += 1
+            self.tokens_saved += saved
+        return fitted, saved
+
+    def describe(self) -> dict:
+        return {"trimmed_prompts": self.trimmed_prompts, "tokens_saved": self.tokens_saved}
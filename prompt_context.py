@@ -0,0 +1,78 @@
+"""
+ ClassName prompt_context
+ Description: Prompt 段落缓存 (增量构建决策上下文)
+ 每个段落按 (段落名, 观察者) 缓存，并声明自己依赖的事件主题。
+ 控制器在对应事件发生时调用 invalidate(主题)，下次取用时只重建受影响的段落。
+"""
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+# 事件主题
+TOPIC_PERSONA = "persona"  # 开场人设
+TOPIC_REFLECTION = "reflection"  # 复盘发言
+TOPIC_IMPRESSION = "impression"  # 私有笔记
+TOPIC_SPEECH = "speech"  # 牌桌发言
+TOPIC_MOOD = "mood"  # 情绪观察
+TOPIC_INVENTORY = "inventory"  # 背包变化
+
+
+class PromptContextCache:
+
+    def __init__(self):
+        self._topic_versions: Dict[str, int] = {}
+        # (段落, 观察者) -> (依赖主题版本, 附加 key, 值)
+        self._entries: Dict[Tuple[str, int], Tuple[Tuple[int, ...], Hashable, Any]] = {}
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    def invalidate(self, *topics: str):
+        for topic in topics:
+            self._topic_versions[topic] = self._topic_versions.get(topic, 0) + 1
+
+    def get(self, section: str, viewer_id: int, builder: Callable[[], Any],
+            topics: Sequence[str] = (), key: Optional[Hashable] = None) -> Any:
+        """
+        取出缓存段落；依赖主题被失效或 key (由易变输入组成的指纹) 变化时重建。
+        """
+        versions = tuple(self._topic_versions.get(topic, 0) for topic in topics)
+        cached = self._entries.get((section, viewer_id))
+        if cached is not None and cached[0] == versions and cached[1] == key:
+            self.hits[section] = self.hits.get(section, 0) + 1
+            return cached[2]
+
+        self.misses[section] = self.misses.get(section, 0) + 1
+        value = builder()
+        self._entries[(section, viewer_id)] = (versions, key, value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def hit_rate(self, section: Optional[str] = None) -> float:
+        if section is None:
+            hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        else:
+            hits, misses = self.hits.get(section, 0), self.misses.get(section, 0)
+        total = hits + misses
+        return hits / total if total else 0.0
+
+    def describe(self) -> dict:
+        sections = sorted(set(self.hits) | set(self.misses))
+        return {
+            "hit_rate": round(self.hit_rate(), 3),
+            "sections": {
+                name: {
+                    "hits": self.hits.get(name, 0),
+                    "misses": self.misses.get(name, 0),
+                    "hit_rate": round(self.hit_rate(name), 3),
+                }
+                for name in sections
+            },
+        }
+
+    def format_stats(self) -> str:
+        stats = self.describe()
+        parts = [
+            f"{name} {info['hits']}/{info['hits'] + info['misses']}"
+            for name, info in stats["sections"].items()
+        ]
+        return f"Prompt 段落缓存命中率 {stats['hit_rate']:.0%} ({', '.join(parts)})"
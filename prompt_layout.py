@@ -0,0 +1,55 @@
+"""
+ ClassName prompt_layout
+ Description: 可缓存的 Prompt 分层
+ 模板用两行标记分成三段：
+   (标记之前)     规则前缀 -> system 消息，所有玩家、所有回合完全相同，可命中服务商的前缀缓存
+   <<<PLAYER>>>  玩家稳定块 -> user 消息开头，同一玩家在整局内基本不变
+   <<<TURN>>>    本轮状态 -> user 消息结尾，每次调用都会变化
+ 没有标记的模板 (如辩护、人设) 仍作为单条 user 消息发送。
+"""
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+PLAYER_MARKER = "<<<PLAYER>>>"
+TURN_MARKER = "<<<TURN>>>"
+
+
+@lru_cache(maxsize=32)
+def split_template(template: str) -> Tuple[str, str, str]:
+    """返回 (规则前缀, 玩家稳定块, 本轮状态)。标记必须独占一行。"""
+    lines = template.split("\n")
+    stripped = [line.strip() for line in lines]
+    if PLAYER_MARKER not in stripped or TURN_MARKER not in stripped:
+        return "", "", template
+    player_at = stripped.index(PLAYER_MARKER)
+    turn_at = stripped.index(TURN_MARKER)
+    if turn_at < player_at:
+        raise ValueError(f"Prompt 模板中 {TURN_MARKER} 必须位于 {PLAYER_MARKER} 之后")
+    return (
+        "\n".join(lines[:player_at]).strip("\n"),
+        "\n".join(lines[player_at + 1:turn_at]).strip("\n"),
+        "\n".join(lines[turn_at + 1:]).strip("\n"),
+    )
+
+
+@lru_cache(maxsize=32)
+def _render_prefix(template: str) -> str:
+    # 规则前缀不含占位符，只需处理 {{ }} 转义，渲染一次即可
+    return split_template(template)[0].format()
+
+
+def render_text(template: str, **values) -> str:
+    """build_messages 各条消息的正文拼接 (用于估算整份 prompt 的长度)。"""
+    return "\n\n".join(message["content"] for message in build_messages(template, **values))
+
+
+def build_messages(template: str, **values) -> List[Dict[str, str]]:
+    """按分层模板生成 chat messages；规则前缀中不应出现占位符，否则前缀缓存失效。"""
+    prefix, player_block, turn_block = split_template(template)
+    if not prefix:
+        return [{"role": "user", "content": turn_block.format(**values)}]
+    user_parts = [part.format(**values) for part in (player_block, turn_block) if part]
+    return [
+        {"role": "system", "content": _render_prefix(template)},
+        {"role": "user", "content": "\n\n".join(user_parts)},
+    ]
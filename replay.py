@@ -0,0 +1,318 @@
+"""
+ ClassName replay
+ Description: 按结构化事件日志确定性重放锦标赛 (复现线上问题 / 控制器重构的回归测试)
+ 用法: python replay.py logs/game_log_<ts>.events.jsonl [更多事件日志...]
+ - 种子与座位顺序来自 game_start 事件，每次 LLM 调用的返回文本来自 llm_call 事件。
+ - ReplayLLMClient 按 (玩家, 调用点) 依次返回录制的文本，不访问任何模型；节奏为 headless (零延时)。
+ - 比较录制与重放的筹码轨迹 (hand_start / redeal / payout 事件中的 chips 以及最终筹码)，逐项完全一致才算通过。
+ - 未正常结束的牌局 (手动停止 / 崩溃) 只重放到录制结束处，比较已重放的部分。
+ - (新) StreamingRecording 惰性读取事件日志，供牌桌把录制的牌局重新直播给观众 (GameTable.start_replay)。
+"""
+import asyncio
+import os
+import random
+import sys
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from game_controller import GameController
+from game_log import iter_events
+from pacing import Pacer
+from persona_store import PersonaStore
+
+TRAJECTORY_EVENTS = ("hand_start", "redeal", "payout")
+COMPLETED_REASON = "正常结束"
+
+
+class ReplayExhausted(BaseException):
+    """录制的调用已用完 (录制本身在此处结束)。继承 BaseException，不会被控制器的容错逻辑吞掉。"""
+
+
+class ReplayDivergence(BaseException):
+    """重放请求了录制中不存在的调用，说明控制器行为已与录制不同。"""
+
+
+@dataclass
+class RecordedCall:
+    seq: int
+    outcome: str
+    response: str
+
+
+@dataclass
+class RecordedTournament:
+    path: Path
+    seed: Optional[int] = None
+    players: List[dict] = field(default_factory=list)
+    calls: Dict[Tuple[int, str], Deque[RecordedCall]] = field(default_factory=dict)
+    trajectory: List[tuple] = field(default_factory=list)
+    final_chips: Optional[List[int]] = None
+    end_reason: Optional[str] = None
+    last_completed_call: int = 0  # 最后一次未被取消的 LLM 调用的序号
+
+    @property
+    def completed(self) -> bool:
+        return self.end_reason == COMPLETED_REASON
+
+    def next_call(self, player_id: int, call_site: str) -> Optional[RecordedCall]:
+        queue = self.calls.get((player_id, call_site))
+        return queue.popleft() if queue else None
+
+    def has_completed_call_after(self, seq: int) -> bool:
+        return seq < self.last_completed_call
+
+    @classmethod
+    def load(cls, path: Path) -> "RecordedTournament":
+        """逐行读取事件日志，只保留重放需要的部分。"""
+        recording = cls(Path(path))
+        for event in iter_events(recording.path):
+            kind = event.get("type")
+            if kind == "game_start":
+                if event.get("resumed_from"):
+                    raise ValueError(f"{path}: 从检查点恢复的牌局 (第 {event['resumed_from']} 手之后) 无法重放。")
+                recording.seed = event["seed"]
+                recording.players = event["players"]
+            elif kind == "llm_call":
+                if "response" not in event:
+                    raise ValueError(f"{path}: llm_call 事件缺少 response 字段，无法重放。")
+                key = (event["player"], event.get("call_site", ""))
+                recording.calls.setdefault(key, deque()).append(
+                    RecordedCall(event["seq"], event.get("outcome", "ok"), event["response"]))
+                if event.get("outcome") != "cancelled":
+                    recording.last_completed_call = event["seq"]
+            elif kind in TRAJECTORY_EVENTS:
+                recording.trajectory.append(trajectory_point(event))
+            elif kind == "game_end":
+                recording.final_chips = event.get("chips")
+                recording.end_reason = event.get("reason")
+        if recording.seed is None:
+            raise ValueError(f"{path}: 没有 game_start 事件 (种子)，无法重放。")
+        return recording
+
+
+class StreamingRecording:
+    """
+    惰性读取的录制：只在重放需要下一次调用时才继续往后读事件日志，从不把整个文件读入内存。
+    只有乱序完成的调用 (如并发的陪审投票) 会暂存，数量受同时在途的调用数限制。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.seed: Optional[int] = None
+        self.players: List[dict] = []
+        self.end_reason: Optional[str] = None
+        self.hands_recorded = 0
+        self._pending: Dict[Tuple[int, str], Deque[RecordedCall]] = {}
+        self._events: Optional[Iterator[dict]] = iter_events(self.path)
+        for event in self._events:
+            if event.get("type") == "game_start":
+                if event.get("resumed_from"):
+                    self.close()
+                    raise ValueError(f"{path}: 从检查点恢复的牌局 (第 {event['resumed_from']} 手之后) 无法重放。")
+                self.seed = event["seed"]
+                self.players = event["players"]
+                break
+        if self.seed is None:
+            self.close()
+            raise ValueError(f"{path}: 没有 game_start 事件 (种子)，无法重放。")
+
+    @property
+    def completed(self) -> bool:
+        return self.end_reason == COMPLETED_REASON
+
+    def close(self):
+        if self._events is not None:
+            self._events.close()
+            self._events = None
+
+    def _read_call(self) -> Optional[RecordedCall]:
+        """读到下一条 llm_call 事件并暂存；读到文件末尾时返回 None。"""
+        if self._events is None:
+            return None
+        for event in self._events:
+            kind = event.get("type")
+            if kind == "llm_call":
+                call = RecordedCall(event["seq"], event.get("outcome", "ok"), event.get("response", ""))
+                self._pending.setdefault((event["player"], event.get("call_site", "")), deque()).append(call)
+                return call
+            if kind == "hand_start":
+                self.hands_recorded = event.get("hand", self.hands_recorded)
+            elif kind == "game_end":
+                self.end_reason = event.get("reason")
+        self.close()
+        return None
+
+    def next_call(self, player_id: int, call_site: str) -> Optional[RecordedCall]:
+        key = (player_id, call_site)
+        while not self._pending.get(key):
+            if self._read_call() is None:
+                return None
+        return self._pending[key].popleft()
+
+    def has_completed_call_after(self, seq: int) -> bool:
+        for queue in self._pending.values():
+            if any(call.seq > seq and call.outcome != "cancelled" for call in queue):
+                return True
+        while True:
+            call = self._read_call()
+            if call is None:
+                return False
+            if call.seq > seq and call.outcome != "cancelled":
+                return True
+
+
+def trajectory_point(event: dict) -> tuple:
+    return event["type"], event.get("hand"), tuple(event.get("chips") or ())
+
+
+class ReplayLLMClient:
+    """代替 LLMClient：按调用点依次返回录制的文本 (source 为 RecordedTournament 或 StreamingRecording)。"""
+
+    def __init__(self, source, player_id: int):
+        self.source = source
+        self.player_id = player_id
+        self.calls_replayed = 0
+        self.call_listener = None
+
+    async def chat_stream(self, messages, model, stream_callback: Callable[[str], Awaitable[None]],
+                          call_site: str = "") -> str:
+        call = self.source.next_call(self.player_id, call_site)
+        if call is None:
+            if self.source.completed:
+                raise ReplayDivergence(f"玩家 {self.player_id} 的 {call_site} 调用超出录制")
+            raise ReplayExhausted()
+        if call.outcome == "cancelled":
+            # 先向后查找 (惰性录制会因此读到文件末尾并得知牌局是否正常结束)
+            if not self.source.has_completed_call_after(call.seq) and not self.source.completed:
+                raise ReplayExhausted()  # 录制在这次调用进行中被停止
+            await asyncio.Future()  # 原局中此调用被取消 (如裁决已定后的陪审投票)，这里同样等待被取消
+        self.calls_replayed += 1
+        if call.response:
+            await stream_callback(call.response)
+        return call.response
+
+
+@dataclass
+class ReplayResult:
+    path: Path
+    ok: bool
+    completed: bool
+    hands: int
+    calls_replayed: int
+    expected: List[tuple]
+    actual: List[tuple]
+    error: Optional[str] = None
+
+    def first_mismatch(self) -> Optional[int]:
+        for index, (expected, actual) in enumerate(zip(self.expected, self.actual)):
+            if expected != actual:
+                return index
+        if len(self.expected) != len(self.actual):
+            return min(len(self.expected), len(self.actual))
+        return None
+
+    def summary(self) -> str:
+        if self.ok:
+            return f"OK    {self.path.name}: {self.hands} 手, {self.calls_replayed} 次调用, 筹码轨迹一致"
+        index = self.first_mismatch()
+        detail = self.error or ""
+        if index is not None:
+            expected = self.expected[index] if index < len(self.expected) else None
+            actual = self.actual[index] if index < len(self.actual) else None
+            detail = f"第 {index} 项不一致: 录制 {expected} / 重放 {actual} {detail}".strip()
+        return f"DIFF  {self.path.name}: {detail}"
+
+
+async def _noop_print(message: str, delay: float = 0.5):
+    pass
+
+
+async def _noop_panel(data: dict):
+    pass
+
+
+def build_replay_controller(source, god_print_callback, god_stream_start_callback, god_stream_chunk_callback,
+                            god_panel_update_callback, pacer: Pacer,
+                            event_callback: Optional[Callable[[str, dict], None]] = None
+                            ) -> Tuple[GameController, List[ReplayLLMClient]]:
+    """按录制的种子与座位顺序创建控制器，并把所有玩家的 LLM 客户端换成重放客户端。"""
+    controller = GameController(
+        [dict(p) for p in source.players],
+        god_print_callback=god_print_callback,
+        god_stream_start_callback=god_stream_start_callback,
+        god_stream_chunk_callback=god_stream_chunk_callback,
+        god_panel_update_callback=god_panel_update_callback,
+        pacer=pacer,
+        event_callback=event_callback,
+        rng=random.Random(source.seed),
+    )
+    clients = [ReplayLLMClient(source, i) for i in range(len(controller.players))]
+    for player, client in zip(controller.players, clients):
+        player.llm_client = client
+    # 重放不写入线上的人设记录
+    controller.persona_store = PersonaStore(Path(os.devnull), None)
+    return controller, clients
+
+
+async def replay_tournament(path: Path,
+                            event_callback: Optional[Callable[[str, dict], None]] = None) -> ReplayResult:
+    """重放一局录制的锦标赛并比较筹码轨迹。"""
+    recording = RecordedTournament.load(path)
+    actual: List[tuple] = []
+    final_chips: List[int] = []
+
+    def on_event(kind: str, data: dict):
+        if kind in TRAJECTORY_EVENTS:
+            actual.append(trajectory_point(dict(data, type=kind)))
+        if event_callback is not None:
+            event_callback(kind, data)
+
+    controller, clients = build_replay_controller(
+        recording, _noop_print, _noop_print, _noop_print, _noop_panel,
+        pacer=Pacer("headless"), event_callback=on_event,
+    )
+
+    error = None
+    try:
+        await controller.run_game()
+        final_chips = list(controller.persistent_chips)
+    except ReplayExhausted:
+        pass
+    except ReplayDivergence as e:
+        error = str(e)
+
+    expected = list(recording.trajectory)
+    if recording.completed:
+        ok = error is None and actual == expected and final_chips == recording.final_chips
+        if ok is False and error is None and actual == expected:
+            error = f"最终筹码不一致: 录制 {recording.final_chips} / 重放 {final_chips}"
+    else:
+        # 录制中途停止：最后一手可能只录到一半，只比较重放到的部分
+        ok = error is None and actual == expected[:len(actual)] and len(actual) >= len(expected) - 1
+    return ReplayResult(
+        path=Path(path), ok=ok, completed=recording.completed, hands=controller.hand_count,
+        calls_replayed=sum(client.calls_replayed for client in clients),
+        expected=expected, actual=actual, error=error,
+    )
+
+
+async def main(paths: List[str]) -> int:
+    failures = 0
+    for path in paths:
+        try:
+            result = await replay_tournament(Path(path))
+        except (OSError, ValueError) as e:
+            print(f"SKIP  {path}: {e}")
+            continue
+        print(result.summary())
+        failures += not result.ok
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法: python replay.py logs/game_log_<ts>.events.jsonl [...]")
+        sys.exit(2)
+    sys.exit(asyncio.run(main(sys.argv[1:])))
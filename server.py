@@ -1,15 +1,17 @@
 import asyncio
-import random  # (新) 1. 导入 random
-from typing import Set, List
+from contextlib import asynccontextmanager
+from typing import Optional
 import uvicorn
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import FileResponse
-from game_controller import GameController
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from pacing import DEFAULT_PACING_PROFILE, PACING_PROFILES
+from table_manager import TableManager, DEFAULT_TABLE_ID, DEFAULT_IDLE_ACTION
+from llm_client import MODEL_RATE_LIMITER
+from log_archive import list_logs, resolve_log, log_base_name, log_response, hand_slice_response
+from game_log import EVENTS_SUFFIX
+from metrics import METRICS
 # --- 1. (新) 日志记录和下载所需的库 ---
-import time
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from pathlib import Path
-import threading
-from fastapi.responses import FileResponse, JSONResponse
 import os
 
 # --- (结束) ---
@@ -26,319 +28,297 @@ player_configs = [
 ENABLE_AUTO_SHUTDOWN = True
 # 无人观看时，自动关闭游戏等待时间 (秒)
 AUTO_SHUTDOWN_TIMEOUT = 60 * 5
+# (新) 超时后的处理 (stop / suspend / headless，见 table_manager.IDLE_ACTIONS)，默认暂停
+AUTO_SHUTDOWN_ACTION = DEFAULT_IDLE_ACTION
+# --------------------------
+# --- 3. (新) 节奏控制 ---
+# 默认速度档位 (live / x4 / fast / x16 / headless)，可在 START_GAME 或 SET_PACING 中修改
+DEFAULT_PACING = DEFAULT_PACING_PROFILE
+# 无人观看时跳过所有观战延时，让锦标赛以 LLM 速度运行
+PACING_SKIP_WHEN_UNWATCHED = True
+# --------------------------
+# --- (新) 多牌桌 ---
+# 同一进程内可同时存在的牌桌数量上限
+MAX_TABLES = 64
 # --------------------------
-# --- (新) 全局变量，用于存储最新日志文件的路径 ---
-LATEST_LOG_FILE: str | None = None
-
-
-# --- (新) 日志收集器类 ---
-class GameLogCollector:
-    """一个线程安全的类，用于收集完整的游戏日志，包括流式消息。"""
-
-    def __init__(self):
-        self._log_history: List[str] = []
-        self._stream_buffer: str = ""
-        self._lock = threading.Lock()  # 确保缓冲区操作的原子性
-
-    def _flush_buffer(self):
-        """（内部）将当前缓冲区内容作为一行完整日志存入历史记录。"""
-        if self._stream_buffer:
-            self._log_history.append(self._stream_buffer)
-            self._stream_buffer = ""
-
-    def add_log(self, message: str):
-        """为非流式消息（如 god_print）添加一条新日志。"""
-        with self._lock:
-            self._flush_buffer()  # 确保上一条流已结束
-            self._log_history.append(message)
-
-    def start_stream(self, message: str):
-        """开始一条新的流式消息（如 god_stream_start）。"""
-        with self._lock:
-            self._flush_buffer()  # 确保上一条流已结束
-            self._stream_buffer = message
-
-    def append_stream(self, chunk: str):
-        """向当前流式消息追加内容（如 god_stream_chunk）。"""
-        with self._lock:
-            self._stream_buffer += chunk
-
-    def get_full_log(self) -> str:
-        """获取完整的日志文本，用于最终保存。"""
-        with self._lock:
-            self._flush_buffer()  # 确保最后一条流被存入
-            return "\n".join(self._log_history)
-
-    def clear(self):
-        """清空日志。"""
-        with self._lock:
-            self._log_history = []
-            self._stream_buffer = ""
-
-
-# --- 2. WebSocket 连接管理器 (无修改) ---
-class ConnectionManager:
-    def __init__(self):
-        self.active_spectators: Set[WebSocket] = set()
-        self._shutdown_timer: asyncio.Task | None = None  # 新增：自动关闭计时器任务
-
-    async def _manage_timer(self):
-        """管理自动关闭计时器：启动或取消"""
-        global game_loop_task
-
-        if not ENABLE_AUTO_SHUTDOWN or len(self.active_spectators) > 0:
-            # 有观众或功能关闭：取消计时器
-            if self._shutdown_timer:
-                self._shutdown_timer.cancel()
-                self._shutdown_timer = None
-            return
-
-        # 无观众且游戏运行中，启动计时器
-        if game_loop_task and not game_loop_task.done() and not self._shutdown_timer:
-            print(f"【系统】: 无人观看，{AUTO_SHUTDOWN_TIMEOUT}秒后自动关闭游戏...")
-            # 创建新的计时器任务
-            self._shutdown_timer = asyncio.create_task(self._shutdown_after_delay())
-
-    async def _shutdown_after_delay(self):
-        """延迟后执行关闭操作"""
-        await asyncio.sleep(AUTO_SHUTDOWN_TIMEOUT)
-
-        global game_loop_task
-        if game_loop_task and not game_loop_task.done():
-            # 确认在延迟结束后依然没有观众
-            if len(self.active_spectators) == 0:
-                print("【系统】: 达到自动关闭时间，强制停止游戏。")
-
-                # 必须安全地取消游戏任务
-                game_loop_task.cancel()
-                game_loop_task = None
-
-                # --- [动态时间修复] ---
-                # 将 AUTO_SHUTDOWN_TIMEOUT (秒) 转换为动态描述
-                if AUTO_SHUTDOWN_TIMEOUT < 60:
-                    time_desc = f"{AUTO_SHUTDOWN_TIMEOUT} 秒"
-                else:
-                    minutes = AUTO_SHUTDOWN_TIMEOUT // 60
-                    seconds = AUTO_SHUTDOWN_TIMEOUT % 60
-                    time_desc = f"{minutes} 分钟"
-                    if seconds > 0:
-                        time_desc += f" {seconds} 秒"
-
-                await self.broadcast_log(f"【系统警告】: 无人观看超过 {time_desc}，游戏已自动关闭。")
-                # --- [修复结束] ---
-                await self.broadcast_status(running=False)
 
-            self._shutdown_timer = None  # 任务已完成，清空引用
+# (新) 牌桌管理器：每张牌桌 (房间) 独立的日志收集器、观众频道与节奏控制器；
+# 页面通过 ?room=<房间ID> 选择房间，未指定时进入 DEFAULT_TABLE_ID
+tables = TableManager(
+    player_configs,
+    max_tables=MAX_TABLES,
+    default_pacing=DEFAULT_PACING,
+    idle_timeout=AUTO_SHUTDOWN_TIMEOUT if ENABLE_AUTO_SHUTDOWN else None,
+    skip_pacing_when_unwatched=PACING_SKIP_WHEN_UNWATCHED,
+    idle_action=AUTO_SHUTDOWN_ACTION,
+)
+default_table = tables.get_or_create(DEFAULT_TABLE_ID)
 
-    async def connect(self, ws: WebSocket):
-        await ws.accept()
-        self.active_spectators.add(ws)
-        await self._manage_timer()  # 连接时，取消计时器
-        global game_loop_task
-        if game_loop_task is not None and not game_loop_task.done():
-            await ws.send_json({"type": "status", "running": True})
 
-    def disconnect(self, ws: WebSocket):
-        self.active_spectators.discard(ws)
-        # 延迟调用计时器管理，确保连接断开操作完成
-        asyncio.create_task(self._manage_timer())  # 断开时，启动计时器
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # (新) 后台采样事件循环延迟，供 /metrics 导出
+    lag_monitor = asyncio.create_task(METRICS.monitor_loop_lag())
+    yield
+    lag_monitor.cancel()
 
-    async def broadcast_log(self, message: str):
-        await self._broadcast_json({"type": "log", "message": message})
 
-    async def broadcast_stream_start(self, message: str):
-        await self._broadcast_json({"type": "stream_start", "message": message})
+app = FastAPI(lifespan=lifespan)
 
-    async def broadcast_stream_chunk(self, chunk: str):
-        await self._broadcast_json({"type": "stream_chunk", "chunk": chunk})
 
-    async def broadcast_status(self, running: bool):
-        await self._broadcast_json({"type": "status", "running": running})
+# --- 4. FastAPI 路由 (无修改) ---
+@app.get("/")
+async def get_index():
+    return FileResponse("index.html")
 
-    async def broadcast_panel_data(self, data: dict):
-        await self._broadcast_json({"type": "panel_update", "data": data})  # <-- 正确：有下划线
 
-    async def _broadcast_json(self, json_message: dict):
-        disconnected = set()
+@app.get("/mobile")
+async def get_mobile():
+    return FileResponse("mobile.html")
 
-        for ws in self.active_spectators.copy():
-            try:
-                await ws.send_json(json_message)
-            except Exception:
-                disconnected.add(ws)
 
-        for ws in disconnected:
-            self.active_spectators.discard(ws)
+def _resolve_room(room: Optional[str]):
+    """按 room 参数取出已有房间；未指定时为默认房间。不存在时返回 None。"""
+    return tables.get(room) if room else default_table
 
 
-# --- (新) 游戏结束时调用的辅助函数 ---
-async def save_log_and_cleanup(log_collector: GameLogCollector, controller_hand_count: int, reason: str):
+# --- (新) 日志下载 API 端口 ---
+@app.get("/download_latest_log")
+async def download_latest_log(request: Request, room: Optional[str] = None):
     """
-    保存日志文件，广播状态，并重置全局游戏任务。
+    提供最近一次游戏日志的下载。指定 room 时只看该房间，否则取所有房间中最新的一份。
+    (新) 与 /logs/{name} 相同，支持压缩与 Range 断点续传。
     """
-    global game_loop_task, LATEST_LOG_FILE
+    if room:
+        table = tables.get(room)
+        latest_log_file = table.latest_log_file if table else None
+    else:
+        latest_log_file = tables.latest_log_file
+    if latest_log_file and os.path.exists(latest_log_file):
+        # (新) 确保浏览器以下载方式处理
+        return log_response(Path(latest_log_file), request.headers,
+                            download_name=os.path.basename(latest_log_file))
+    return JSONResponse(
+        status_code=404,
+        content={"error": "No log file available or found."}
+    )
 
-    log_text = log_collector.get_full_log()
-    log_dir = Path("logs")
-    log_dir.mkdir(exist_ok=True)
-    timestamp = time.strftime("%Y%m%d_%H%M%S")
-    log_filename = log_dir / f"game_log_{timestamp}.txt"
 
+# --- (新) 历史日志 API ---
+@app.get("/logs")
+async def get_logs(limit: int = 200):
+    """列出 logs/ 下的日志文件 (最新的在前)，包括文本日志、结构化事件与索引。"""
+    return {"logs": list_logs()[:max(0, limit)]}
+
+
+@app.get("/logs/{name}")
+async def get_log(name: str, request: Request, download: bool = False):
+    """下载任一日志文件：按 Accept-Encoding 压缩 (gzip / zstd)，支持 Range 请求。"""
+    try:
+        path = resolve_log(name)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except FileNotFoundError:
+        return JSONResponse(status_code=404, content={"error": f"日志 {name} 不存在。"})
+    return log_response(path, request.headers, download_name=name if download else None)
+
+
+@app.get("/logs/{name}/hands")
+async def get_log_hands(name: str, request: Request, first: int = 1, last: Optional[int] = None):
+    """借助手牌索引，只返回第 first..last 手 (默认只有 first 一手) 的结构化事件 (NDJSON)。"""
+    return hand_slice_response(name, first, last, request.headers)
+
+
+# --- (新) 节奏档位查询 ---
+@app.get("/pacing")
+async def get_pacing(room: Optional[str] = None):
+    """返回房间当前的速度档位和所有可选档位。"""
+    table = _resolve_room(room)
+    if table is None:
+        return JSONResponse(status_code=404, content={"error": f"房间 {room} 不存在。"})
+    return {
+        "current": table.pacer.describe(),
+        "profiles": {name: {"label": p.label, "scale": p.scale} for name, p in PACING_PROFILES.items()}
+    }
+
+
+# --- (新) 运行指标 ---
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus 文本格式的进程内指标 (手牌、动作、强制弃牌、LLM 延迟、牌桌、观众、广播队列、事件循环延迟)。"""
+    return PlainTextResponse(METRICS.render(tables.describe(), MODEL_RATE_LIMITER.describe()),
+                             media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# --- (新) 牌桌管理 API ---
+@app.get("/tables")
+async def list_tables():
+    """列出所有牌桌及其状态，以及各模型的在途请求数。"""
+    return dict(tables.describe(), llm=MODEL_RATE_LIMITER.describe())
+
+
+@app.get("/tables/{table_id}")
+async def get_table(table_id: str):
+    table = tables.get(table_id)
+    if table is None:
+        return JSONResponse(status_code=404, content={"error": f"房间 {table_id} 不存在。"})
+    return table.describe()
+
+
+@app.post("/tables/{table_id}/start")
+async def start_table(table_id: str, pacing: Optional[str] = None, resume: bool = False):
+    """开始 (必要时新建) 指定牌桌的锦标赛；resume=true 时从本桌的检查点继续。"""
     try:
-        with open(log_filename, "w", encoding="utf-8") as f:
-            f.write(f"--- 游戏结束 ({reason}) ---\n")
-            f.write(f"--- 共 {controller_hand_count} 手牌 ---\n\n")
-            f.write(log_text)
+        started = await tables.start(table_id, pacing=pacing, resume=resume)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    if not started:
+        return JSONResponse(status_code=409, content={"error": "游戏已在运行中。"})
+    return tables.get(table_id).describe()
 
-        log_announce_msg = f"--- 游戏日志已保存: {log_filename} ---"
-        print(f"【上帝视角】: {log_announce_msg}")
-        await manager.broadcast_log(log_announce_msg)
 
-        # 更新全局变量以便下载
-        LATEST_LOG_FILE = str(log_filename)
+@app.post("/tables/{table_id}/stop")
+async def stop_table(table_id: str):
+    """停止指定牌桌的锦标赛。"""
+    if not await tables.stop(table_id, announce="上帝停止了本桌游戏..."):
+        return JSONResponse(status_code=404, content={"error": "游戏未在运行。"})
+    return tables.get(table_id).describe()
 
-    except Exception as e:
-        log_error_msg = f"!! 保存日志失败: {e} !!"
-        print(f"【上帝视角】: {log_error_msg}")
-        await manager.broadcast_log(log_error_msg)
-
-    await manager.broadcast_status(running=False)
-    game_loop_task = None
-
-
-manager = ConnectionManager()
-app = FastAPI()
-game_loop_task: asyncio.Task | None = None
-
-
-# --- 3. 游戏循环 (已修改以支持日志记录) ---
-async def run_llm_game_loop():
-    global game_loop_task
-
-    # (新) 创建日志收集器实例
-    log_collector = GameLogCollector()
-    controller = None  # (新) 将 controller 提升到 try 之外
-
-    async def god_print_and_broadcast(message: str, delay: float = 0.5):
-        log_collector.add_log(message)  # <-- (新) 捕获日志
-        print(f"【上帝视角】: {message}")
-        await manager.broadcast_log(message)
-        await asyncio.sleep(delay)
-
-    async def god_stream_start(message: str, delay: float = 0.5):
-        log_collector.start_stream(message)  # <-- (新) 捕获日志
-        print(f"【上帝视角】: {message}", end='', flush=True)
-        await manager.broadcast_stream_start(message)
-        await asyncio.sleep(delay)
-
-    async def god_stream_chunk(chunk: str, delay: float = 0.05):
-        log_collector.append_stream(chunk)  # <-- (新) 捕获日志
-        print(chunk, end='', flush=True)
-        await manager.broadcast_stream_chunk(chunk)
-        await asyncio.sleep(delay)
-
-    async def god_panel_update(data: dict):
-        await manager.broadcast_panel_data(data)
-
-    # --- (新) 2. 随机打乱玩家顺序 ---
-    shuffled_configs = player_configs.copy()
-    random.shuffle(shuffled_configs)
-    new_order_str = ", ".join([p["name"] for p in shuffled_configs])
-    await god_print_and_broadcast(f"--- 玩家顺序已随机打乱 ---", 0.1)
-    await god_print_and_broadcast(f"本局顺序: {new_order_str}", 0.5)
-    # --- (修改结束) ---
-
-    controller = GameController(  # (新) 赋值给外部变量
-        shuffled_configs,
-        god_print_callback=god_print_and_broadcast,
-        god_stream_start_callback=god_stream_start,
-        god_stream_chunk_callback=god_stream_chunk,
-        god_panel_update_callback=god_panel_update
-    )
 
+def _resolve_events_log(name: Optional[str]) -> Path:
+    """任一日志文件名 -> 对应的结构化事件日志 (名称无效或文件不存在时抛出 ValueError)。"""
     try:
-        await controller.run_game()
-        hand_count = controller.hand_count if controller else 0
-        await god_print_and_broadcast(f"--- 锦标赛结束 (共 {hand_count} 手牌) ---", 2.0)
-        # (新) 游戏正常结束，保存日志
-        await save_log_and_cleanup(log_collector, hand_count, "正常结束")
-
-    except asyncio.CancelledError:
-        hand_count = controller.hand_count if controller else 0
-        await god_print_and_broadcast(f"--- 锦标赛被上帝强制终止 ---", 1.0)
-        # (新) 游戏被取消，保存日志
-        await save_log_and_cleanup(log_collector, hand_count, "手动停止")
+        return resolve_log(log_base_name(name or "") + EVENTS_SUFFIX)
+    except FileNotFoundError:
+        raise ValueError(f"日志 {name} 没有结构化事件，无法重播。")
 
-    except Exception as e:
-        hand_count = controller.hand_count if controller else 0
-        await god_print_and_broadcast(f"!! 游戏控制器发生严重错误: {e} !!", 1)
-        import traceback
-        traceback.print_exc()
-        # (新) 游戏崩溃，保存日志
-        await save_log_and_cleanup(log_collector, hand_count, f"崩溃 (Error: {e})")
 
+async def _start_replay(table, log: Optional[str], speed: Optional[str], hand: int, announce: str) -> bool:
+    """在牌桌上重播日志 (未指定日志时为最近保存的一份)；无效参数抛出 ValueError。"""
+    if not log:
+        if not tables.latest_log_file:
+            raise ValueError("还没有已保存的日志可供重播。")
+        log = os.path.basename(tables.latest_log_file)
+    try:
+        return await table.start_replay(_resolve_events_log(log), from_hand=hand, speed=speed, announce=announce)
+    except OSError as e:
+        raise ValueError(f"无法读取日志 {log}: {e}")
 
-# --- 4. FastAPI 路由 (无修改) ---
-@app.get("/")
-async def get_index():
-    return FileResponse("index.html")
 
+@app.post("/tables/{table_id}/replay")
+async def replay_table(table_id: str, log: Optional[str] = None, speed: Optional[str] = None, hand: int = 1):
+    """(新) 在指定牌桌上重播已保存的牌局 (不调用模型)，可指定速度档位与起始手牌。"""
+    try:
+        table = tables.get_or_create(table_id)
+        started = await _start_replay(table, log, speed, hand, announce=f"上帝开始重播牌局 {log or '(最近一局)'}...")
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    if not started:
+        return JSONResponse(status_code=409, content={"error": "游戏已在运行中。"})
+    return table.describe()
 
-@app.get("/mobile")
-async def get_mobile():
-    return FileResponse("mobile.html")
 
+@app.post("/tables/{table_id}/replay/seek")
+async def seek_table_replay(table_id: str, hand: int):
+    """(新) 让正在重播的牌桌跳到第 hand 手。"""
+    table = tables.get(table_id)
+    if table is None or not await table.seek_replay(hand):
+        return JSONResponse(status_code=404, content={"error": "该牌桌没有正在进行的重播。"})
+    return table.describe()
 
-# --- (新) 日志下载 API 端口 ---
-@app.get("/download_latest_log")
-async def download_latest_log():
-    """
-    提供最近一次游戏日志的下载。
-    """
-    global LATEST_LOG_FILE
-    if LATEST_LOG_FILE and os.path.exists(LATEST_LOG_FILE):
-        return FileResponse(
-            path=LATEST_LOG_FILE,
-            # (新) 确保浏览器以下载方式处理
-            filename=os.path.basename(LATEST_LOG_FILE),
-            media_type='text/plain'
-        )
-    return JSONResponse(
-        status_code=404,
-        content={"error": "No log file available or found."}
-    )
+
+async def _leave_room(table, ws: WebSocket):
+    table.disconnect(ws)
+    tables.remove(table.table_id)  # 空闲且已无观众的房间随之释放
 
 
 @app.websocket("/ws")
-async def websocket_endpoint(ws: WebSocket):
-    await manager.connect(ws)
-    global game_loop_task
+async def websocket_endpoint(ws: WebSocket, room: str = DEFAULT_TABLE_ID, since: Optional[int] = None):
+    # (新) 观众通过 /ws?room=<房间ID> 订阅房间，只接收该房间的消息；房间不存在时自动创建
+    # (新) 重连时带上 since=<已收到的最后日志序号>，补齐帧只包含缺失的日志
+    try:
+        table = tables.get_or_create(room)
+    except ValueError as e:
+        await ws.accept()
+        await ws.send_json({"type": "log", "message": str(e)})
+        await ws.close(code=1008)
+        return
+    await table.connect(ws, since=since)
     try:
         while True:
             data = await ws.receive_json()
 
-            if data.get("type") == "START_GAME":
-                if game_loop_task is None or game_loop_task.done():
-                    await manager.broadcast_log("上帝点击了【开始游戏】...")
-                    await manager.broadcast_status(running=True)
-                    game_loop_task = asyncio.create_task(run_llm_game_loop())
+            if data.get("type") == "JOIN_ROOM":
+                # (新) 不断开连接切换到另一个房间
+                try:
+                    target = tables.get_or_create(data.get("room"))
+                except ValueError as e:
+                    table.channel.send_to(ws, {"type": "log", "message": str(e)})
+                    continue
+                if target is not table:
+                    await _leave_room(table, ws)
+                    table = target
+                    await table.connect(ws, accept=False)
+
+            elif data.get("type") == "PANEL_RESYNC":
+                # (新) 客户端发现面板补丁版本不连续时请求完整快照
+                table.channel.send_panel_snapshot(ws)
+
+            elif data.get("type") == "START_GAME":
+                if not table.is_running():
+                    # (新) 允许在开局时指定本局的速度档位
+                    if data.get("pacing"):
+                        try:
+                            table.pacer.set_profile(data["pacing"])
+                        except ValueError as e:
+                            table.channel.send_to(ws, {"type": "log", "message": str(e)})
+                    # (新) {"resume": true} 从本桌最后保存的检查点继续
+                    try:
+                        await table.start(announce="上帝点击了【开始游戏】...", resume=bool(data.get("resume")))
+                    except ValueError as e:
+                        table.channel.send_to(ws, {"type": "log", "message": str(e)})
                 else:
-                    await ws.send_json({"type": "log", "message": "游戏已在运行中。"})
+                    table.channel.send_to(ws, {"type": "log", "message": "游戏已在运行中。"})
+
+            elif data.get("type") == "START_REPLAY":
+                # (新) 重播已保存的牌局：{"log": 日志名 (可省略), "speed": 档位, "hand": 起始手牌}
+                try:
+                    started = await _start_replay(table, data.get("log"), data.get("speed"), int(data.get("hand") or 1),
+                                                  announce="上帝点击了【重播牌局】...")
+                except ValueError as e:
+                    table.channel.send_to(ws, {"type": "log", "message": str(e)})
+                    continue
+                if not started:
+                    table.channel.send_to(ws, {"type": "log", "message": "游戏已在运行中。"})
+
+            elif data.get("type") == "SEEK_REPLAY":
+                try:
+                    hand = int(data.get("hand"))
+                except (TypeError, ValueError):
+                    table.channel.send_to(ws, {"type": "log", "message": "请指定要跳转的手牌。"})
+                    continue
+                if not await table.seek_replay(hand):
+                    table.channel.send_to(ws, {"type": "log", "message": "当前没有正在进行的重播。"})
 
             elif data.get("type") == "STOP_GAME":
-                if game_loop_task and not game_loop_task.done():
-                    game_loop_task.cancel()
-                    game_loop_task = None
-                    await manager.broadcast_log("上帝点击了【停止游戏】...")
-                    await manager.broadcast_status(running=False)
-                else:
-                    await ws.send_json({"type": "log", "message": "游戏未在运行。"})
+                if not await table.stop(announce="上帝点击了【停止游戏】..."):
+                    table.channel.send_to(ws, {"type": "log", "message": "游戏未在运行。"})
+
+            elif data.get("type") == "SET_PACING":
+                # (新) 运行时切换速度档位，正在进行的停顿会立即按新档位生效
+                try:
+                    profile = table.pacer.set_profile(data.get("profile"))
+                except ValueError as e:
+                    table.channel.send_to(ws, {"type": "log", "message": str(e)})
+                    continue
+                await table.channel.broadcast_log(f"上帝将节奏切换为【{profile.label}】。")
+                await table.channel.broadcast_pacing(table.pacer.describe())
 
     except WebSocketDisconnect:
-        manager.disconnect(ws)
+        await _leave_room(table, ws)
     except Exception as e:
         print(f"WebSocket 错误: {e}")
-        manager.disconnect(ws)
+        await _leave_room(table, ws)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,461 @@
+"""
+ ClassName spectators
+ Description: 观众 WebSocket 连接管理 (每个房间 / 牌桌一个频道)
+ 频道只负责连接、广播、观众计数与无人观看计时；牌局是否在运行、超时后如何停止由牌桌通过回调告知。
+ 观众只会收到自己所在房间的日志 / 流式 / 面板消息。
+ (新) 每个观众有自己的有界发送队列和写任务，广播只入队不等待，牌局进度不受最慢观众影响。
+ (新) 流式片段先在频道内攒批，每 STREAM_FLUSH_INTERVAL 秒或攒够 STREAM_FLUSH_BYTES 字节合成一帧；
+      每帧只序列化一次，所有观众共用同一份文本。
+ (新) 面板以版本化补丁 (panel_patch) 广播，连接或重新同步时发送完整快照 (panel_update)。
+ (新) 频道保留最近的日志行、正在进行的流式消息与最新面板，观众加入 / 重连时合成一个 catch_up 帧发送。
+"""
+import asyncio
+import json
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from fastapi import WebSocket
+
+from metrics import METRICS
+from panel_state import PanelState
+
+# (新) 可选的快速 JSON 编码器：安装了 orjson 时自动使用 (pip install orjson)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# --- (新) 慢客户端策略 ---
+LATEST_ONLY_KINDS = frozenset({"panel_update", "spectators", "pacing"})  # 只需最新一份的快照类消息
+SEND_QUEUE_LIMIT = 512  # 每个观众最多积压的帧数，超出后先丢弃过期的流式片段
+STREAM_MERGE_BACKLOG = 32  # 积压超过此值时，新的流式片段并入队尾片段 (无损合并)
+SEND_TIMEOUT = 10.0  # 单帧发送超过此时间视为卡死，断开该观众
+SLOW_CLIENT_CLOSE_CODE = 1013  # "Try Again Later"
+
+RECENT_LOG_LINES = 200  # 加入时补齐的最近日志行数
+
+# --- (新) 流式片段攒批 ---
+STREAM_FLUSH_INTERVAL = 0.05  # 秒
+STREAM_FLUSH_BYTES = 1024  # UTF-8 字节
+
+
+def _encode_stdlib(message: dict) -> str:
+    """与 WebSocket.send_json 相同的编码方式。"""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def _encode_orjson(message: dict) -> str:
+    try:
+        # 解码回 str：页面按文本帧 JSON.parse，二进制帧会变成 Blob
+        return orjson.dumps(message, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    except TypeError:
+        return _encode_stdlib(message)  # orjson 不支持的类型交给标准库
+
+
+FRAME_ENCODER = "orjson" if orjson is not None else "json"
+encode_frame: Callable[[dict], str] = _encode_orjson if orjson is not None else _encode_stdlib
+
+
+def describe_duration(seconds: int) -> str:
+    """把秒数转换为 "X 分钟 Y 秒" 形式的描述。"""
+    if seconds < 60:
+        return f"{seconds} 秒"
+    minutes, rest = divmod(seconds, 60)
+    text = f"{minutes} 分钟"
+    if rest > 0:
+        text += f" {rest} 秒"
+    return text
+
+
+class RecentLog:
+    """
+    最近日志的环形缓冲 (含正在进行的流式消息)。
+    每条 log 与每次 stream_start 各占一个递增序号 (随广播帧发送)，客户端据此在重连时只补齐缺失的部分。
+    """
+
+    def __init__(self, max_lines: int = RECENT_LOG_LINES):
+        self.lines: Deque[Tuple[int, str, bool]] = deque(maxlen=max_lines)  # (序号, 文本, 是否流式)
+        self.seq = 0
+        self._stream_parts: Optional[List[str]] = None
+
+    def add_line(self, message: str):
+        self._close_stream()
+        self.seq += 1
+        self.lines.append((self.seq, message, False))
+
+    def start_stream(self, message: str):
+        self._close_stream()
+        self.seq += 1
+        self._stream_parts = [message]
+
+    def append_stream(self, chunk: str):
+        if self._stream_parts is not None:
+            self._stream_parts.append(chunk)
+
+    def _close_stream(self):
+        if self._stream_parts is not None:
+            self.lines.append((self.seq, "".join(self._stream_parts), True))
+            self._stream_parts = None
+
+    def since(self, since: Optional[int]) -> Tuple[bool, List[list], Optional[str]]:
+        """
+        返回 (是否整体重置, 日志行 [[文本, 是否流式]...], 进行中的流式文本)。
+        客户端给出的 since 仍在缓冲范围内时，从序号 since 那一行 (可能不完整) 开始补齐。
+        """
+        streaming = self._stream_parts is not None
+        if self.lines:
+            oldest = self.lines[0][0]
+        else:
+            oldest = self.seq if streaming else self.seq + 1
+        reset = since is None or since < max(oldest, 1) or since > self.seq
+        entries = [[text, int(is_stream)] for seq, text, is_stream in self.lines if reset or seq >= since]
+        stream = "".join(self._stream_parts) if streaming else None
+        return reset, entries, stream
+
+
+class _Frame:
+    __slots__ = ("kind", "message", "text")
+
+    def __init__(self, kind: str, message: dict, text: Optional[str] = None):
+        self.kind = kind
+        self.message = message
+        self.text = text  # 预先序列化好的文本；合并后的帧为 None，发送时再编码
+
+
+class SpectatorClient:
+    """单个观众的发送队列：面板等快照只保留最新一份，积压时合并 / 丢弃流式片段，仍然跟不上则断开。"""
+
+    def __init__(self, ws: WebSocket, on_failed: Callable[["SpectatorClient", str], None]):
+        self.ws = ws
+        self.queue: Deque[_Frame] = deque()
+        self.closed = False
+        self.sent_frames = 0
+        self.dropped_frames = 0
+        self.coalesced_frames = 0
+        self._pending_latest: Dict[str, _Frame] = {}
+        self._wake = asyncio.Event()
+        self._send_timed_out = False
+        self._on_failed = on_failed
+        self._writer_task = asyncio.create_task(self._writer())
+
+    def enqueue(self, message: dict, text: Optional[str] = None):
+        if self.closed:
+            return
+        kind = message.get("type", "")
+        queue = self.queue
+
+        if kind in LATEST_ONLY_KINDS:
+            # 面板等是完整快照：新快照之前 (含) 的补丁都已包含在内，不必再发
+            if kind == "panel_update":
+                self._drop_patches_until(message.get("v"))
+            stale = self._pending_latest.get(kind)
+            if stale is not None:
+                # 未发出的旧快照原位替换，不挪到队尾：其后入队的帧仍在它之后送达
+                stale.message, stale.text = message, text
+                self.coalesced_frames += 1
+                return
+            frame = self._pending_latest[kind] = _Frame(kind, message, text)
+        elif kind == "stream_chunk" and len(queue) >= STREAM_MERGE_BACKLOG and queue[-1].kind == "stream_chunk":
+            tail = queue[-1]
+            tail.message = {"type": "stream_chunk", "chunk": tail.message["chunk"] + message["chunk"]}
+            tail.text = None
+            self.coalesced_frames += 1
+            return
+        else:
+            frame = _Frame(kind, message, text)
+
+        queue.append(frame)
+        if len(queue) > SEND_QUEUE_LIMIT:
+            self._shed()
+        self._wake.set()
+
+    def _drop_patches_until(self, version: Optional[int]):
+        """丢弃队列中版本不高于 version 的面板补丁 (已被对应的完整快照取代)。"""
+        if version is None or not any(frame.kind == "panel_patch" for frame in self.queue):
+            return
+        kept = deque(frame for frame in self.queue
+                     if frame.kind != "panel_patch" or frame.message.get("v", 0) > version)
+        self.coalesced_frames += len(self.queue) - len(kept)
+        self.queue = kept
+
+    def _shed(self):
+        """队列溢出：从最旧的开始丢弃流式片段；只剩必须送达的帧仍然溢出时，断开该观众。"""
+        excess = len(self.queue) - SEND_QUEUE_LIMIT
+        kept: Deque[_Frame] = deque()
+        for frame in self.queue:
+            if excess > 0 and frame.kind == "stream_chunk":
+                excess -= 1
+                self.dropped_frames += 1
+                METRICS.dropped_frames.inc()
+                continue
+            kept.append(frame)
+        self.queue = kept
+        if excess > 0:
+            self.fail("发送队列已满")
+
+    def fail(self, reason: str):
+        if self.closed:
+            return
+        self.closed = True
+        self.dropped_frames += len(self.queue)
+        if self.queue:
+            METRICS.dropped_frames.inc(amount=len(self.queue))
+        self.queue.clear()
+        if self._writer_task is not asyncio.current_task():
+            self._writer_task.cancel()
+        self._on_failed(self, reason)
+
+    def close(self):
+        self.closed = True
+        self.queue.clear()
+        self._writer_task.cancel()
+
+    def _on_send_timeout(self):
+        self._send_timed_out = True
+        self._writer_task.cancel()
+
+    async def _writer(self):
+        # 发送超时用定时器取消写任务实现，避免每帧 wait_for 额外创建一个 Task
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                while not self.queue:
+                    self._wake.clear()
+                    await self._wake.wait()
+                frame = self.queue.popleft()
+                if self._pending_latest.get(frame.kind) is frame:
+                    del self._pending_latest[frame.kind]
+                text = frame.text if frame.text is not None else encode_frame(frame.message)
+                watchdog = loop.call_later(SEND_TIMEOUT, self._on_send_timeout)
+                try:
+                    await self.ws.send_text(text)
+                finally:
+                    watchdog.cancel()
+                self.sent_frames += 1
+        except asyncio.CancelledError:
+            if self._send_timed_out:
+                self.fail("发送超时")
+                return
+            raise
+        except Exception:
+            self.fail("连接已断开")
+
+
+class ConnectionManager:
+    def __init__(self,
+                 is_game_running: Callable[[], bool] = lambda: False,
+                 on_idle_timeout: Optional[Callable[[], Awaitable[None]]] = None,
+                 idle_timeout: Optional[int] = None,
+                 label: str = "",
+                 idle_action_label: str = "自动关闭游戏"):
+        self.active_spectators: Dict[WebSocket, SpectatorClient] = {}
+        self._shutdown_timer: asyncio.Task | None = None  # 新增：自动关闭计时器任务
+        self._is_game_running = is_game_running
+        self._on_idle_timeout = on_idle_timeout
+        self.idle_timeout = idle_timeout  # None 表示不自动关闭
+        self.label = label  # 控制台提示中的牌桌名
+        self.idle_action_label = idle_action_label  # (新) 超时后的处理 (关闭 / 暂停 / 后台打完)，用于控制台提示
+        self.dropped_frames = 0  # 已断开观众累计丢弃的帧
+        self.slow_disconnects = 0
+        self.panel = PanelState()
+        self.recent = RecentLog()
+        # (新) 尚未发出的流式片段
+        self._pending_chunks: List[str] = []
+        self._pending_bytes = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    async def _manage_timer(self):
+        """管理自动关闭计时器：启动或取消"""
+        if self.idle_timeout is None or len(self.active_spectators) > 0:
+            # 有观众或功能关闭：取消计时器
+            if self._shutdown_timer:
+                self._shutdown_timer.cancel()
+                self._shutdown_timer = None
+            return
+
+        # 无观众且游戏运行中，启动计时器
+        if self._is_game_running() and not self._shutdown_timer:
+            print(f"【系统】: {self.label}无人观看，{self.idle_timeout}秒后{self.idle_action_label}...")
+            # 创建新的计时器任务
+            self._shutdown_timer = asyncio.create_task(self._shutdown_after_delay())
+
+    async def _shutdown_after_delay(self):
+        """延迟后执行关闭操作"""
+        await asyncio.sleep(self.idle_timeout)
+
+        # 确认在延迟结束后依然没有观众
+        if self._is_game_running() and len(self.active_spectators) == 0:
+            print(f"【系统】: {self.label}达到无人观看时限，{self.idle_action_label}。")
+            if self._on_idle_timeout is not None:
+                await self._on_idle_timeout()
+
+            # (新) 牌桌可以选择暂停或后台打完，而不是停止游戏；此时由牌桌自行通知
+            if not self._is_game_running():
+                await self.broadcast_log(
+                    f"【系统警告】: 无人观看超过 {describe_duration(self.idle_timeout)}，游戏已自动关闭。")
+                await self.broadcast_status(running=False)
+
+        self._shutdown_timer = None  # 任务已完成，清空引用
+
+    async def connect(self, ws: WebSocket, accept: bool = True,
+                      since: Optional[int] = None, extra: Optional[dict] = None):
+        """
+        加入频道并发送 catch_up 补齐帧；切换房间时连接已建立，传入 accept=False。
+        since: 客户端已收到的最后一行日志序号 (重连时)；extra: 牌桌附加的状态字段。
+        """
+        if accept:
+            await ws.accept()
+        self._flush_stream()  # 已攒的片段只发给老观众，新观众从补齐帧里拿到完整内容
+        client = SpectatorClient(ws, self._on_client_failed)
+        self.active_spectators[ws] = client
+        client.enqueue(self.catch_up_message(since, **(extra or {})))
+        await self._on_membership_change()  # 连接时，取消计时器
+
+    def catch_up_message(self, since: Optional[int] = None, **extra) -> dict:
+        reset, entries, stream = self.recent.since(since)
+        message = {
+            "type": "catch_up",
+            "seq": self.recent.seq,
+            "reset": reset,
+            "log": entries,
+            "stream": stream,
+            "panel": self.panel.full_message(),
+            "spectators": self.spectator_count,
+        }
+        message.update(extra)
+        return message
+
+    def disconnect(self, ws: WebSocket):
+        client = self.active_spectators.pop(ws, None)
+        if client is not None:
+            client.close()
+        # 延迟调用计时器管理，确保连接断开操作完成
+        asyncio.create_task(self._on_membership_change())  # 断开时，启动计时器
+
+    def _on_client_failed(self, client: SpectatorClient, reason: str):
+        """写任务发现发送失败 / 跟不上时调用：移出频道并关闭连接。"""
+        if self.active_spectators.get(client.ws) is client:
+            del self.active_spectators[client.ws]
+            if reason != "连接已断开":
+                self.slow_disconnects += 1
+                METRICS.slow_disconnects.inc()
+            self.dropped_frames += client.dropped_frames
+            print(f"【系统】: {self.label}观众连接{reason}，已断开。")
+            asyncio.create_task(self._close_client(client))
+            asyncio.create_task(self._on_membership_change())
+
+    @staticmethod
+    async def _close_client(client: SpectatorClient):
+        try:
+            await client.ws.close(code=SLOW_CLIENT_CLOSE_CODE)
+        except Exception:
+            pass
+
+    def send_to(self, ws: WebSocket, message: dict):
+        """经由该观众的发送队列单独发送一条消息 (保持与广播的先后顺序)。"""
+        client = self.active_spectators.get(ws)
+        if client is not None:
+            self._flush_stream()
+            client.enqueue(message)
+
+    def send_panel_snapshot(self, ws: WebSocket):
+        """向单个观众发送完整面板快照 (新连接或客户端请求 PANEL_RESYNC)。"""
+        message = self.panel.full_message()
+        if message is not None:
+            self.send_to(ws, message)
+
+    def queue_depth(self) -> int:
+        return sum(len(client.queue) for client in self.active_spectators.values())
+
+    def describe(self) -> dict:
+        clients = list(self.active_spectators.values())
+        return {
+            "spectators": len(clients),
+            "queue_depth": sum(len(c.queue) for c in clients),
+            "max_queue_depth": max((len(c.queue) for c in clients), default=0),
+            "dropped_frames": self.dropped_frames + sum(c.dropped_frames for c in clients),
+            "coalesced_frames": sum(c.coalesced_frames for c in clients),
+            "slow_disconnects": self.slow_disconnects,
+            "encoder": FRAME_ENCODER,
+            "panel": self.panel.describe(),
+        }
+
+    async def _on_membership_change(self):
+        await self._manage_timer()
+        await self.broadcast_spectator_count()
+
+    def has_spectators(self) -> bool:
+        return len(self.active_spectators) > 0
+
+    @property
+    def spectator_count(self) -> int:
+        return len(self.active_spectators)
+
+    async def broadcast_spectator_count(self):
+        await self._broadcast_json({"type": "spectators", "count": self.spectator_count})
+
+    async def broadcast_log(self, message: str):
+        self.recent.add_line(message)
+        await self._broadcast_json({"type": "log", "message": message, "seq": self.recent.seq})
+
+    async def broadcast_stream_start(self, message: str):
+        self.recent.start_stream(message)
+        await self._broadcast_json({"type": "stream_start", "message": message, "seq": self.recent.seq})
+
+    async def broadcast_stream_chunk(self, chunk: str):
+        # (新) 攒批：到达字节上限立即发出，否则等待定时器 (或下一条其它消息) 一并发出
+        if not chunk:
+            return
+        self.recent.append_stream(chunk)
+        if not self.active_spectators:
+            return
+        self._pending_chunks.append(chunk)
+        self._pending_bytes += len(chunk.encode("utf-8"))
+        if self._pending_bytes >= STREAM_FLUSH_BYTES:
+            self._flush_stream()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(STREAM_FLUSH_INTERVAL, self._flush_stream)
+
+    async def broadcast_status(self, running: bool):
+        await self._broadcast_json({"type": "status", "running": running})
+
+    async def broadcast_panel_data(self, data: dict):
+        # (新) 无人观看时也要更新状态，保证之后加入的观众拿到最新快照
+        message = self.panel.update(data)
+        if message is not None:
+            await self._broadcast_json(message)
+
+    async def broadcast_pacing(self, data: dict):
+        await self._broadcast_json({"type": "pacing", "data": data})
+
+    def _flush_stream(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending_chunks:
+            return
+        chunk = "".join(self._pending_chunks)
+        self._pending_chunks = []
+        self._pending_bytes = 0
+        self._enqueue_all({"type": "stream_chunk", "chunk": chunk})
+
+    def _enqueue_all(self, json_message: dict):
+        # (新) 只入队，由各观众的写任务发送；发送失败的观众由写任务自行移除
+        clients = list(self.active_spectators.values())
+        if not clients:
+            return
+        text = encode_frame(json_message)  # 每帧只序列化一次
+        full_panel = full_text = None
+        for client in clients:
+            if json_message["type"] == "panel_patch" and len(client.queue) >= STREAM_MERGE_BACKLOG:
+                # 积压的观众不再逐个应用补丁，改发完整快照 (只保留最新一份)
+                if full_panel is None:
+                    full_panel = self.panel.full_message()
+                    full_text = encode_frame(full_panel)
+                client.enqueue(full_panel, full_text)
+                continue
+            client.enqueue(json_message, text)
+
+    async def _broadcast_json(self, json_message: dict):
+        self._flush_stream()  # 先发出攒着的流式片段，保证先后顺序
+        self._enqueue_all(json_message)
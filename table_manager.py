@@ -0,0 +1,552 @@
+"""
+ ClassName table_manager
+ Description: 多牌桌管理 (同一进程内同时运行多个 GameController)
+ - 每张牌桌拥有独立的日志写入器、观众频道与节奏控制器，可单独开始 / 停止。
+ - LLM 客户端与按模型的限流器在 llm_client 中进程级共享，牌桌之间不重复建连接。
+ - 牌局几乎全部时间都在等待 LLM 响应 (I/O)，单进程即可承载数十张牌桌。
+ - (新) 每手结束后保存检查点 (checkpoint.py)，进程重启后可用 start(resume=True) 从最后完成的一手继续。
+ - (新) 无人观看超时后的处理 (idle_action)：stop 停止游戏；suspend 在下一个安全点暂停、观众回来后继续；
+   headless 切换到无延时档位在后台打完，观众回来后恢复原档位。
+ - (新) 牌桌也可以重播已保存的牌局 (start_replay)：按录制的事件日志重放，不调用任何模型，
+   可按节奏档位 1x / 4x / 16x 播放，或跳到指定手 (之前的手牌静默快进，不广播)。
+"""
+import asyncio
+import random
+import re
+import time
+import traceback
+from typing import Dict, List, Optional
+
+from fastapi import WebSocket
+
+from checkpoint import checkpoint_path, read_checkpoint, remove_checkpoint, validate_checkpoint, write_checkpoint
+from game_controller import GameController
+from game_log import GameLogWriter
+from log_archive import PRECOMPRESS_ON_SAVE, precompress
+from metrics import METRICS
+from pacing import Pacer, DEFAULT_PACING_PROFILE
+from replay import ReplayDivergence, ReplayExhausted, StreamingRecording, build_replay_controller
+from spectators import ConnectionManager, describe_duration
+
+DEFAULT_TABLE_ID = "main"
+DEFAULT_MAX_TABLES = 64  # 同时存在的牌桌上限
+_TABLE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+# 无人观看超时后的处理："stop" 停止游戏 (已花费的 LLM 调用作废)；
+# "suspend" 在下一个安全点暂停，有观众进入时继续；"headless" 切换到无延时档位在后台打完
+IDLE_ACTIONS = {"stop": "自动关闭游戏", "suspend": "暂停游戏", "headless": "切换到后台模式"}
+DEFAULT_IDLE_ACTION = "suspend"
+
+
+class GameTable:
+    """一张牌桌：一个控制器任务 + 独立的日志、观众频道与节奏。"""
+
+    def __init__(self, table_id: str, player_configs: List[dict],
+                 pacing: str = DEFAULT_PACING_PROFILE,
+                 idle_timeout: Optional[int] = None,
+                 skip_pacing_when_unwatched: bool = True,
+                 on_log_saved=None,
+                 idle_action: str = DEFAULT_IDLE_ACTION):
+        if idle_action not in IDLE_ACTIONS:
+            raise ValueError(f"未知的无人观看处理: {idle_action} (可选: {', '.join(IDLE_ACTIONS)})")
+        self.table_id = table_id
+        self.player_configs = list(player_configs)
+        self.idle_action = idle_action
+        self.channel = ConnectionManager(
+            is_game_running=self.is_running,
+            on_idle_timeout=self._on_idle,
+            idle_timeout=idle_timeout,
+            label="" if table_id == DEFAULT_TABLE_ID else f"牌桌 {table_id} ",
+            idle_action_label=IDLE_ACTIONS[idle_action],
+        )
+        self.skip_pacing_when_unwatched = skip_pacing_when_unwatched
+        self.pacer = Pacer(pacing, audience_probe=self._pacing_audience)
+        self.log_writer: Optional[GameLogWriter] = None
+        self.controller: Optional[GameController] = None
+        self.task: Optional[asyncio.Task] = None
+        self.latest_log_file: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.games_played = 0
+        self.checkpoint_file = checkpoint_path(table_id)  # (新) 本桌的检查点
+        self.seed: Optional[int] = None
+        self._profile_before_idle: Optional[str] = None  # (新) headless 处理前的档位，观众回来后恢复
+        self.replay_source: Optional[str] = None  # (新) 正在重播的事件日志
+        self._seek_hand = 0  # (新) 重播时静默快进到这一手
+        self._stopping = False  # (新) stop() 正在等待旧任务退出
+        self._on_log_saved = on_log_saved
+        # 默认牌桌沿用原有的控制台输出；其它牌桌加前缀，且不回显流式内容以免交错
+        self._console_tag = "【上帝视角】" if table_id == DEFAULT_TABLE_ID else f"【上帝视角·{table_id}】"
+        self._echo_stream = table_id == DEFAULT_TABLE_ID
+
+    # ---------- 状态 ----------
+    def is_running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    @property
+    def hand_count(self) -> int:
+        return self.controller.hand_count if self.controller else 0
+
+    def _seeking(self) -> bool:
+        """重播快进中：尚未到达目标手牌，不广播、不停顿。"""
+        return self._seek_hand > 0 and self.hand_count < self._seek_hand
+
+    def _pacing_audience(self) -> bool:
+        if self._seeking():
+            return False
+        return self.channel.has_spectators() if self.skip_pacing_when_unwatched else True
+
+    def describe(self) -> dict:
+        return {
+            "table_id": self.table_id,
+            "running": self.is_running(),
+            "suspended": self.pacer.suspended,
+            "idle_action": self.idle_action,
+            "spectators": self.channel.spectator_count,
+            "channel": self.channel.describe(),
+            "hand_count": self.hand_count,
+            "games_played": self.games_played,
+            "players": [p["name"] for p in self.player_configs],
+            "pacing": self.pacer.describe(),
+            "latest_log_file": self.latest_log_file,
+            "log": self.log_writer.describe() if self.log_writer else None,
+            "checkpoint": str(self.checkpoint_file) if self.checkpoint_file.is_file() else None,
+            "replay": {"source": self.replay_source, "seek_hand": self._seek_hand} if self.replay_source else None,
+        }
+
+    # ---------- 观众 ----------
+    async def connect(self, ws: WebSocket, accept: bool = True, since: Optional[int] = None):
+        """加入本桌频道；补齐帧附带房间、运行状态与节奏档位。"""
+        await self.channel.connect(ws, accept=accept, since=since, extra={
+            "room": self.table_id,
+            "running": self.is_running(),
+            "pacing": self.pacer.describe(),
+        })
+        await self._wake_from_idle()
+
+    def disconnect(self, ws: WebSocket):
+        self.channel.disconnect(ws)
+
+    # ---------- 控制 ----------
+    async def set_pacing(self, profile_name: str):
+        """切换速度档位并通知观众 (未知档位抛出 ValueError)。"""
+        profile = self.pacer.set_profile(profile_name)
+        await self.channel.broadcast_pacing(self.pacer.describe())
+        return profile
+
+    async def start(self, announce: Optional[str] = None, resume: bool = False) -> bool:
+        """
+        开始新的一局锦标赛；已在运行时返回 False。
+        (新) resume=True 时从本桌的检查点继续 (没有检查点或检查点损坏时抛出 ValueError)。
+        """
+        if self.is_running():
+            return False
+        resume_state = None
+        if resume:
+            try:
+                resume_state = await asyncio.to_thread(read_checkpoint, self.checkpoint_file)
+            except OSError as e:
+                raise ValueError(f"无法读取检查点: {e}")
+            if resume_state is None:
+                raise ValueError("本桌没有可恢复的检查点。")
+            # 在创建任务与日志之前拒绝不兼容的检查点 (检查点保留，不会被当作一局崩溃)
+            validate_checkpoint(resume_state, [p["name"] for p in self.player_configs])
+        self.pacer.resume()
+        await self.channel.broadcast_pacing(self.pacer.describe())
+        if announce:
+            await self.channel.broadcast_log(announce)
+        await self.channel.broadcast_status(running=True)
+        self.task = asyncio.create_task(self._run(resume_state))
+        return True
+
+    async def stop(self, announce: Optional[str] = None) -> bool:
+        """
+        取消正在运行的锦标赛，并等任务自身保存完日志后再返回；未运行 (或已在停止中) 时返回 False。
+        等待期间 self.task 仍指向旧任务，新的 start() 会被拒绝，旧任务的结尾不会写进新一局。
+        """
+        if not self.is_running() or self._stopping:
+            return False
+        task = self.task
+        self._stopping = True
+        self.pacer.resume()  # 暂停中的任务同样可以取消，之后的新局不应沿用暂停状态
+        task.cancel()
+        try:
+            await asyncio.gather(task, return_exceptions=True)
+        finally:
+            self._stopping = False
+        if self.task is task:
+            # 任务在开始执行前就被取消，没有走到自己的清理
+            self.task = None
+            await self.channel.broadcast_status(running=False)
+        if announce:
+            await self.channel.broadcast_log(announce)
+        return True
+
+    async def start_replay(self, events_path, from_hand: int = 1, speed: Optional[str] = None,
+                           announce: Optional[str] = None) -> bool:
+        """
+        重播一份已保存的事件日志；已在运行时返回 False。
+        日志无效时抛出 ValueError / OSError，未知档位抛出 ValueError。
+        """
+        if self.is_running():
+            return False
+        StreamingRecording(events_path).close()  # 先校验 (需要 game_start 中的种子与座位)
+        if speed:
+            self.pacer.set_profile(speed)
+        self.pacer.resume()
+        await self.channel.broadcast_pacing(self.pacer.describe())
+        if announce:
+            await self.channel.broadcast_log(announce)
+        await self.channel.broadcast_status(running=True)
+        self.task = asyncio.create_task(self._run_replay(events_path, max(1, int(from_hand))))
+        return True
+
+    async def seek_replay(self, hand: int) -> bool:
+        """重播跳到第 hand 手：从头静默快进 (牌局是确定性的)。未在重播时返回 False。"""
+        if not self.is_running() or self.replay_source is None:
+            return False
+        source, task = self.replay_source, self.task
+        self.task = None
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return await self.start_replay(source, from_hand=hand,
+                                       announce=f"上帝将重播跳转到第 {max(1, int(hand))} 手...")
+
+    async def _on_idle(self):
+        """无人观看超时：按 idle_action 停止、暂停或转入后台。"""
+        if self.task is None:
+            return
+        idle_for = describe_duration(self.channel.idle_timeout)
+        if self.idle_action == "suspend":
+            # 正在进行的 LLM 调用照常完成，之后在下一个安全点停住，不再产生新的调用
+            self.pacer.suspend()
+            await self.channel.broadcast_log(
+                f"【系统】: 无人观看超过 {idle_for}，游戏将在当前动作结束后暂停，有观众进入时自动继续。")
+            await self.channel.broadcast_pacing(self.pacer.describe())
+        elif self.idle_action == "headless":
+            if self._profile_before_idle is None:
+                self._profile_before_idle = self.pacer.profile.name
+            await self.set_pacing("headless")
+            await self.channel.broadcast_log(f"【系统】: 无人观看超过 {idle_for}，游戏转入后台以无延时模式继续。")
+        else:
+            await self.stop()
+
+    async def _wake_from_idle(self):
+        """(新) 观众进入：恢复被暂停的游戏，或恢复转入后台前的速度档位。"""
+        if self.pacer.suspended:
+            self.pacer.resume()
+            await self.channel.broadcast_log("【系统】: 有观众进入，游戏继续。")
+            await self.channel.broadcast_pacing(self.pacer.describe())
+        if self._profile_before_idle is not None:
+            profile, self._profile_before_idle = self._profile_before_idle, None
+            if self.pacer.profile.name == "headless":  # 期间被手动切换过则保持
+                await self.set_pacing(profile)
+
+    # ---------- 游戏循环 ----------
+    async def _god_print(self, message: str, delay: float = 0.5):
+        if self._seeking():
+            await asyncio.sleep(0)
+            return
+        if self.log_writer is not None:
+            self.log_writer.add_log(message)
+        print(f"{self._console_tag}: {message}")
+        await self.channel.broadcast_log(message)
+        await self.pacer.sleep(delay)
+
+    async def _god_stream_start(self, message: str, delay: float = 0.5):
+        if self._seeking():
+            return
+        if self.log_writer is not None:
+            self.log_writer.start_stream(message)
+        if self._echo_stream:
+            print(f"{self._console_tag}: {message}", end='', flush=True)
+        await self.channel.broadcast_stream_start(message)
+        await self.pacer.sleep(delay)
+
+    async def _god_stream_chunk(self, chunk: str, delay: float = 0.05):
+        if self._seeking():
+            return
+        if self.log_writer is not None:
+            self.log_writer.append_stream(chunk)
+        if self._echo_stream:
+            print(chunk, end='', flush=True)
+        await self.channel.broadcast_stream_chunk(chunk)
+        await self.pacer.sleep(delay)
+
+    async def _god_panel_update(self, data: dict):
+        if self._seeking():
+            return
+        await self.channel.broadcast_panel_data(data)
+
+    def _god_event(self, kind: str, data: dict):
+        METRICS.observe_event(kind, data)
+        if self.log_writer is not None:
+            self.log_writer.add_event(kind, data)
+
+    async def _save_checkpoint(self, state: dict):
+        """每手结束后在线程中原子写入检查点 (写入失败只警告，不影响牌局)。"""
+        state.update(table=self.table_id, seed=self.seed, saved_at=round(time.time(), 3),
+                     log=self.log_writer.base_name if self.log_writer else None)
+        try:
+            await asyncio.to_thread(write_checkpoint, self.checkpoint_file, state)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"【上帝(警告)】: 保存检查点失败: {e}")
+
+    def _open_log(self) -> Optional[GameLogWriter]:
+        """开局时打开本局的日志文件 (logs/game_log_<开局时间>[_<牌桌>].txt)，之后逐行追加。"""
+        timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(self.started_at))
+        suffix = "" if self.table_id == DEFAULT_TABLE_ID else f"_{self.table_id}"
+        writer = GameLogWriter(f"game_log_{timestamp}{suffix}", hand_probe=lambda: self.hand_count)
+        try:
+            writer.open()
+        except OSError as e:
+            print(f"【上帝(警告)】: 无法创建日志文件，本局日志不会保存: {e}")
+            return None
+        return writer
+
+    async def _run(self, resume_state: Optional[dict] = None):
+        # 控制器与日志都用本地引用：清理时不会误用之后新开一局的 self.controller / self.log_writer
+        self.controller = controller = None
+        self.started_at = time.time()
+        self.log_writer = writer = self._open_log()
+        try:
+            if resume_state is not None:
+                # (新) 从检查点恢复：沿用原来的座位顺序与随机源状态
+                shuffled_configs = [dict(p) for p in resume_state["players"]]
+                seed = resume_state.get("seed") or random.getrandbits(63)
+            else:
+                # --- (新) 随机打乱玩家顺序 ---
+                shuffled_configs = self.player_configs.copy()
+                random.shuffle(shuffled_configs)
+                # (新) 牌局使用独立的带种子随机源；种子与座位顺序写入事件日志，replay.py 据此重放
+                seed = random.getrandbits(63)
+            self.seed = seed
+            start_event = {"hand": 0, "seed": seed, "table": self.table_id,
+                           "players": [{"name": p["name"], "model": p["model"]} for p in shuffled_configs]}
+            if resume_state is not None:
+                start_event["resumed_from"] = resume_state["hand"]
+            self._god_event("game_start", start_event)
+            new_order_str = ", ".join([p["name"] for p in shuffled_configs])
+            if resume_state is not None:
+                await self._god_print(f"--- 从检查点恢复 (第 {resume_state['hand']} 手之后) ---", 0.1)
+            else:
+                await self._god_print(f"--- 玩家顺序已随机打乱 ---", 0.1)
+            await self._god_print(f"本局顺序: {new_order_str}", 0.5)
+
+            self.controller = controller = GameController(
+                shuffled_configs,
+                god_print_callback=self._god_print,
+                god_stream_start_callback=self._god_stream_start,
+                god_stream_chunk_callback=self._god_stream_chunk,
+                god_panel_update_callback=self._god_panel_update,
+                pacer=self.pacer,
+                event_callback=self._god_event,
+                rng=random.Random(seed),
+                checkpoint_callback=self._save_checkpoint
+            )
+
+            await controller.run_game(resume_state)
+            await self._god_print(f"--- 锦标赛结束 (共 {controller.hand_count} 手牌) ---", 2.0)
+            remove_checkpoint(self.checkpoint_file)  # 锦标赛已完成，不再需要恢复
+            await self._save_log_and_cleanup("正常结束", writer, controller)
+
+        except asyncio.CancelledError:
+            await self._god_print(f"--- 锦标赛被上帝强制终止 ---", 1.0)
+            await self._save_log_and_cleanup("手动停止", writer, controller)
+
+        except Exception as e:
+            await self._god_print(f"!! 游戏控制器发生严重错误: {e} !!", 1)
+            traceback.print_exc()
+            await self._save_log_and_cleanup(f"崩溃 (Error: {e})", writer, controller)
+
+    async def _run_replay(self, events_path, seek_hand: int):
+        """重播录制的牌局：与 _run 相同的回调与节奏，但玩家发言来自录制，不写新的日志。"""
+        self.controller = None
+        self.started_at = time.time()
+        self.replay_source = str(events_path)
+        self._seek_hand = 0
+        source = StreamingRecording(events_path)
+        reason = "重播结束"
+        try:
+            await self._god_print(f"--- 重播牌局: {source.path.name} ---", 0.1)
+            await self._god_print(f"本局顺序: {', '.join(p['name'] for p in source.players)}", 0.5)
+            if seek_hand > 1:
+                await self._god_print(f"--- 快进到第 {seek_hand} 手... ---", 0.1)
+                self._seek_hand = seek_hand
+            self.controller, _ = build_replay_controller(
+                source,
+                self._god_print, self._god_stream_start, self._god_stream_chunk, self._god_panel_update,
+                pacer=self.pacer,
+            )
+            await self.controller.run_game()
+            if self._seeking():
+                reason = f"录制中没有第 {seek_hand} 手 (共 {self.hand_count} 手)"
+                self._seek_hand = 0
+                await self._god_print(f"--- {reason} ---", 1.0)
+            else:
+                await self._god_print(f"--- 锦标赛结束 (共 {self.hand_count} 手牌) ---", 2.0)
+
+        except ReplayExhausted:
+            reason = "录制到此结束"
+            if self._seeking():
+                reason = f"录制中没有第 {seek_hand} 手 (共 {self.hand_count} 手)"
+            self._seek_hand = 0
+            await self._god_print(f"--- {reason} ---", 1.0)
+
+        except ReplayDivergence as e:
+            reason = "重播与录制不一致"
+            self._seek_hand = 0
+            await self._god_print(f"!! {reason}: {e} !!", 1.0)
+
+        except asyncio.CancelledError:
+            reason = "手动停止"
+            self._seek_hand = 0
+            await self._god_print(f"--- 重播被上帝终止 ---", 0.0)
+
+        except Exception as e:
+            reason = f"崩溃 (Error: {e})"
+            self._seek_hand = 0
+            await self._god_print(f"!! 重播发生错误: {e} !!", 1)
+            traceback.print_exc()
+
+        finally:
+            source.close()
+
+        print(f"{self._console_tag}: 重播结束 ({reason})")
+        if self.task is asyncio.current_task():
+            self.replay_source = None
+            self._seek_hand = 0
+            self.task = None
+            await self.channel.broadcast_status(running=False)
+
+    async def _save_log_and_cleanup(self, reason: str, writer: Optional[GameLogWriter],
+                                    controller: Optional[GameController]):
+        """写入日志结尾并关闭本局的日志文件；仍是本桌当前任务时才广播状态并清除任务引用。"""
+        if self.log_writer is writer:
+            self.log_writer = None
+        hand_count = controller.hand_count if controller else 0
+        if writer is not None:
+            if controller is not None:
+                writer.add_event("game_end", {"hand": hand_count, "reason": reason,
+                                              "chips": list(controller.persistent_chips)})
+            try:
+                paths = await writer.close([f"--- 游戏结束 ({reason}) ---", f"--- 共 {hand_count} 手牌 ---"])
+                if len(paths) > 1:
+                    log_announce_msg = f"--- 游戏日志已保存: {paths[0]} 等 {len(paths)} 个分卷 ---"
+                else:
+                    log_announce_msg = f"--- 游戏日志已保存: {paths[-1]} ---"
+                print(f"{self._console_tag}: {log_announce_msg}")
+                await self.channel.broadcast_log(log_announce_msg)
+
+                self.latest_log_file = str(paths[-1])
+                if self._on_log_saved is not None:
+                    self._on_log_saved(self, self.latest_log_file)
+
+                if PRECOMPRESS_ON_SAVE:
+                    # 在线程中生成 .gz / .zst，下载时直接发送，不必每次重新压缩
+                    for path in [*paths, writer.events_path]:
+                        await asyncio.to_thread(precompress, path)
+
+            except Exception as e:
+                log_error_msg = f"!! 保存日志失败: {e} !!"
+                print(f"{self._console_tag}: {log_error_msg}")
+                await self.channel.broadcast_log(log_error_msg)
+
+        self.games_played += 1
+        METRICS.observe_event("game_end", {"reason": reason})
+        # 只清除自己的引用、只广播自己的结束：self.task 已指向新任务时不能让新局看起来停止了
+        if self.task is asyncio.current_task():
+            self.task = None
+            await self.channel.broadcast_status(running=False)
+
+
+class TableManager:
+    """进程内的牌桌注册表，按 table_id 创建、查找、开始、停止牌桌。"""
+
+    def __init__(self, player_configs: List[dict], max_tables: int = DEFAULT_MAX_TABLES,
+                 default_pacing: str = DEFAULT_PACING_PROFILE,
+                 idle_timeout: Optional[int] = None,
+                 skip_pacing_when_unwatched: bool = True,
+                 idle_action: str = DEFAULT_IDLE_ACTION):
+        if idle_action not in IDLE_ACTIONS:
+            raise ValueError(f"未知的无人观看处理: {idle_action} (可选: {', '.join(IDLE_ACTIONS)})")
+        self.player_configs = list(player_configs)
+        self.max_tables = max_tables
+        self.default_pacing = default_pacing
+        self.idle_timeout = idle_timeout
+        self.idle_action = idle_action
+        self.skip_pacing_when_unwatched = skip_pacing_when_unwatched
+        self.tables: Dict[str, GameTable] = {}
+        self.latest_log_file: Optional[str] = None  # 所有牌桌中最近保存的日志
+
+    @staticmethod
+    def validate_table_id(table_id: str) -> str:
+        table_id = str(table_id or "").strip()
+        if not _TABLE_ID_PATTERN.match(table_id):
+            raise ValueError(f"无效的牌桌 ID: {table_id!r} (仅限 1-32 位字母、数字、下划线或连字符)")
+        return table_id
+
+    def _remember_log(self, table: GameTable, path: str):
+        self.latest_log_file = path
+
+    def get(self, table_id: str) -> Optional[GameTable]:
+        return self.tables.get(table_id)
+
+    def get_or_create(self, table_id: str = DEFAULT_TABLE_ID,
+                      player_configs: Optional[List[dict]] = None) -> GameTable:
+        """取出已有牌桌，或按默认配置新建 (ID 无效或超过上限时抛出 ValueError)。"""
+        table_id = self.validate_table_id(table_id)
+        table = self.tables.get(table_id)
+        if table is not None:
+            return table
+        if len(self.tables) >= self.max_tables:
+            self._evict_idle()
+        if len(self.tables) >= self.max_tables:
+            raise ValueError(f"牌桌数量已达上限 ({self.max_tables})。")
+        table = GameTable(
+            table_id,
+            player_configs or self.player_configs,
+            pacing=self.default_pacing,
+            idle_timeout=self.idle_timeout,
+            skip_pacing_when_unwatched=self.skip_pacing_when_unwatched,
+            on_log_saved=self._remember_log,
+            idle_action=self.idle_action,
+        )
+        self.tables[table_id] = table
+        return table
+
+    async def start(self, table_id: str, pacing: Optional[str] = None,
+                    announce: Optional[str] = None, resume: bool = False) -> bool:
+        table = self.get_or_create(table_id)
+        if pacing and not table.is_running():
+            table.pacer.set_profile(pacing)
+        return await table.start(announce=announce, resume=resume)
+
+    async def stop(self, table_id: str, announce: Optional[str] = None) -> bool:
+        table = self.tables.get(table_id)
+        return await table.stop(announce=announce) if table else False
+
+    async def stop_all(self):
+        for table in list(self.tables.values()):
+            await table.stop()
+
+    def remove(self, table_id: str) -> bool:
+        """移除空闲且无人观看的牌桌，释放名额 (默认牌桌始终保留)。"""
+        table = self.tables.get(table_id)
+        if (table is None or table_id == DEFAULT_TABLE_ID
+                or table.is_running() or table.channel.has_spectators()):
+            return False
+        del self.tables[table_id]
+        return True
+
+    def _evict_idle(self):
+        for table_id in list(self.tables):
+            self.remove(table_id)
+
+    def running_tables(self) -> List[GameTable]:
+        return [table for table in self.tables.values() if table.is_running()]
+
+    def describe(self) -> dict:
+        return {
+            "max_tables": self.max_tables,
+            "running": len(self.running_tables()),
+            "tables": [table.describe() for table in self.tables.values()],
+        }
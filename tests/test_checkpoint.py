@@ -0,0 +1,117 @@
+import json
+import random
+
+import pytest
+
+from checkpoint import (CHECKPOINT_VERSION, checkpoint_path, read_checkpoint, remove_checkpoint, validate_checkpoint,
+                        write_checkpoint)
+from game_controller import GameController
+from game_log import encode_event
+from pacing import Pacer
+from replay import RecordedTournament, StreamingRecording
+
+PLAYERS = [{"name": name, "model": "test-model"} for name in ("甲", "乙", "丙")]
+
+
+async def _noop(*args, **kwargs):
+    pass
+
+
+def _controller(seed: int = 5) -> GameController:
+    return GameController([dict(p) for p in PLAYERS], _noop, _noop, _noop, _noop,
+                          pacer=Pacer("headless"), rng=random.Random(seed))
+
+
+def _as_json(state: dict) -> dict:
+    return json.loads(json.dumps(state))
+
+
+def _played_controller() -> GameController:
+    """模拟打了几手之后的控制器状态。"""
+    controller = _controller()
+    controller.hand_count = 4
+    controller.persistent_chips = [1500, 0, 2500]
+    controller.last_winner_id = 2
+    controller.global_alert_level = 1.5
+    controller.player_personas = {0: "冷静的数学家", 1: "我是 乙 (已淘汰)", 2: "赌场老千"}
+    controller.player_reflections = {0: "下次少跟注"}
+    controller.player_observed_moods = {2: "得意"}
+    controller.player_last_speech = {0: None, 2: "来啊"}
+    controller.player_private_impressions = {0: {2: "爱诈唬"}}
+    controller.active_effects.add({"effect_id": "lock", "target_id": 0, "turns_left": 2})
+    controller.secret_message_log.append((4, 0, 2, "合作吗"))
+    controller.players[1].alive = False
+    controller.players[2].inventory.append("ITEM_001")
+    controller.players[2].loan_data = {"amount": 300, "due_hand": 6}
+    controller.rng.random()  # 随机源状态也要随快照保存
+    return controller
+
+
+def test_write_and_read_round_trip(tmp_path):
+    path = checkpoint_path("t1", tmp_path / "checkpoints")
+    state = {"version": CHECKPOINT_VERSION, "hand": 3, "note": "中文"}
+
+    write_checkpoint(path, state)
+
+    assert read_checkpoint(path) == state
+    assert [p.name for p in path.parent.iterdir()] == ["t1.json"]  # 临时文件已改名
+    remove_checkpoint(path)
+    remove_checkpoint(path)  # 不存在时静默
+    assert read_checkpoint(path) is None
+
+
+def test_corrupt_checkpoint_raises_value_error(tmp_path):
+    path = tmp_path / "t1.json"
+    path.write_text('{"version": 1, "hand"', encoding="utf-8")
+    with pytest.raises(ValueError):
+        read_checkpoint(path)
+
+
+def test_controller_state_survives_checkpoint_file(tmp_path):
+    original = _played_controller()
+    path = tmp_path / "t1.json"
+    write_checkpoint(path, original.snapshot_state())
+
+    restored = _controller(seed=99)
+    restored.restore_state(read_checkpoint(path))
+
+    assert _as_json(restored.snapshot_state()) == _as_json(original.snapshot_state())
+    assert restored.player_private_impressions == {0: {2: "爱诈唬"}}  # 键恢复为整数
+    assert restored.active_effects.find(0, "lock")["turns_left"] == 2
+    assert restored.players[2].inventory == ["ITEM_001"]
+    assert restored.rng.random() == original.rng.random()
+
+
+@pytest.mark.parametrize("mutate, message", [
+    (lambda s: s.update(version=CHECKPOINT_VERSION + 1), "版本"),
+    (lambda s: s.pop("active_effects"), "缺少字段"),
+    (lambda s: s.update(players=[{"name": "甲"}]), "玩家列表"),
+    (lambda s: s["persistent_chips"].pop(), "数量不一致"),
+])
+def test_invalid_snapshots_are_rejected(mutate, message):
+    state = _as_json(_controller().snapshot_state())
+    mutate(state)
+    with pytest.raises(ValueError, match=message):
+        validate_checkpoint(state)
+
+
+def test_player_names_must_match_ignoring_seat_order():
+    state = _controller().snapshot_state()
+    validate_checkpoint(state, ["丙", "甲", "乙"])
+    with pytest.raises(ValueError):
+        validate_checkpoint(state, ["甲", "乙", "丁"])
+
+    reseated = GameController([dict(p) for p in reversed(PLAYERS)], _noop, _noop, _noop, _noop,
+                              pacer=Pacer("headless"))
+    with pytest.raises(ValueError):
+        reseated.restore_state(state)
+
+
+def test_resumed_recordings_cannot_be_replayed(tmp_path):
+    events_path = tmp_path / "resumed.events.jsonl"
+    events_path.write_bytes(encode_event({"seq": 1, "type": "game_start", "hand": 0, "seed": 3,
+                                          "players": PLAYERS, "resumed_from": 5}))
+    with pytest.raises(ValueError):
+        RecordedTournament.load(events_path)
+    with pytest.raises(ValueError):
+        StreamingRecording(events_path)
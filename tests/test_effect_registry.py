@@ -0,0 +1,55 @@
+from effect_registry import EffectRegistry
+
+
+def _effect(effect_id, target_id=0, turns_left=None, **extra):
+    return dict(effect_id=effect_id, target_id=target_id, turns_left=turns_left, **extra)
+
+
+def test_tick_expires_effects_in_registration_order():
+    registry = EffectRegistry()
+    late = registry.add(_effect("lock", turns_left=2))
+    early = registry.add(_effect("mute", target_id=1, turns_left=1))
+    permanent = registry.add(_effect("shield"))
+
+    assert registry.tick() == [early]
+    assert registry.turns_left(late) == 1
+    assert registry.tick() == [late]
+    assert late["turns_left"] == 0
+    assert list(registry) == [permanent]
+    assert registry.tick() == []
+
+
+def test_removed_effect_is_not_expired_later():
+    registry = EffectRegistry()
+    effect = registry.add(_effect("lock", turns_left=1))
+    assert registry.consume(0, "lock") is effect
+    assert registry.find(0, "lock") is None
+    assert registry.tick() == []
+    assert len(registry) == 0
+
+
+def test_indexes_follow_adds_and_removes():
+    registry = EffectRegistry()
+    first = registry.add(_effect("lock", target_id=2))
+    second = registry.add(_effect("lock", target_id=2))
+    refund = registry.add(_effect("loss_refund", target_id=3, hand_id=7))
+
+    assert registry.find(2, "lock") is first
+    assert registry.find_all(2, "lock") == [first, second]
+    assert registry.with_effect("lock") == [first, second]
+    assert registry.for_target(3) == [refund]
+    assert registry.for_hand("loss_refund", 7) == [refund]
+    assert registry.for_hand("loss_refund", 8) == []
+
+    version = registry.version
+    registry.remove(first)
+    assert registry.version > version
+    assert registry.find(2, "lock") is second
+    assert registry.remove(first) is False
+
+
+def test_snapshot_reports_live_turns_left():
+    registry = EffectRegistry()
+    registry.add(_effect("lock", turns_left=3))
+    registry.tick()
+    assert [e["turns_left"] for e in registry.snapshot()] == [2]
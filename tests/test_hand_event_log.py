@@ -0,0 +1,49 @@
+from hand_event_log import ARCHIVE_TEXT_LIMIT, HandEventLog
+
+
+def _message(hand, sender, receiver, text="hi"):
+    return (hand, sender, receiver, text)
+
+
+def test_entries_are_indexed_by_hand_and_participant():
+    log = HandEventLog(participant_fields=(1, 2))
+    a = _message(1, 0, 1)
+    b = _message(1, 2, 0)
+    c = _message(2, 1, 2)
+    for entry in (a, b, c):
+        log.append(entry)
+
+    assert log.for_hand(1) == [a, b]
+    assert log.for_hand_player(1, 0) == [a, b]
+    assert log.for_hand_player(1, 1) == [a]
+    assert log.involving([2]) == [b, c]
+    assert list(log) == [a, b, c]
+
+
+def test_old_hands_move_to_a_bounded_compacted_archive():
+    log = HandEventLog(participant_fields=(1, 2), retention_hands=2, archive_per_player=2)
+    long_text = "密" * (ARCHIVE_TEXT_LIMIT + 10)
+    for hand in range(1, 5):
+        log.start_hand(hand)
+        log.append(_message(hand, 0, 1, long_text if hand == 1 else f"h{hand}"))
+    log.start_hand(5)
+
+    # 第 1、2 手超出保留窗口：活跃区只剩 3、4 手
+    assert log.for_hand(1) == [] and log.for_hand(2) == []
+    assert len(log) == 2
+    # 存档每名玩家最多 2 条，文本被截短
+    archived = log.involving([0])
+    assert [entry[0] for entry in archived] == [1, 2, 3, 4]
+    assert archived[0][3] == long_text[:ARCHIVE_TEXT_LIMIT] + "…"
+    assert log.involving([0], include_archive=False) == log.for_hand(3) + log.for_hand(4)
+
+    log.start_hand(7)
+    assert [entry[0] for entry in log.involving([1])] == [3, 4]
+
+
+def test_drop_hand_removes_all_indexes():
+    log = HandEventLog(participant_fields=(1,))
+    log.append((3, 0, "x"))
+    log.drop_hand(3)
+    assert log.for_hand_player(3, 0) == []
+    assert log.involving([0]) == []
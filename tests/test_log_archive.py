@@ -0,0 +1,90 @@
+import asyncio
+import gzip
+
+import pytest
+
+import log_archive
+from log_archive import log_response, negotiate_encoding, parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-4", (0, 5)),
+    ("bytes=3-", (3, 10)),
+    ("bytes=-3", (7, 10)),
+    ("bytes=-30", (0, 10)),
+    ("bytes=5-99", (5, 10)),
+    ("BYTES = 2 - 2", (2, 3)),
+])
+def test_parse_range_satisfiable(header, expected):
+    assert parse_range(header, 10) == expected
+
+
+@pytest.mark.parametrize("header", [
+    "bytes=5-3", "bytes=abc", "bytes=-", "bytes=+1-2", "bytes=1_0-", "items=0-1", "bytes=0-1,3-4", "",
+])
+def test_parse_range_ignores_invalid_headers(header):
+    assert parse_range(header, 10) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=10-", "bytes=99-100", "bytes=-0"])
+def test_parse_range_rejects_unsatisfiable_ranges(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 10)
+
+
+def test_negotiate_encoding_orders_by_quality(monkeypatch):
+    monkeypatch.setattr(log_archive, "zstandard", object())  # 视为已安装
+    assert negotiate_encoding("gzip, zstd") == ["zstd", "gzip"]
+    assert negotiate_encoding("gzip;q=1, zstd;q=0.5") == ["gzip", "zstd"]
+    assert negotiate_encoding("zstd;q=0, gzip") == ["gzip"]
+    assert negotiate_encoding("*;q=0.3, gzip;q=0") == ["zstd"]
+    assert negotiate_encoding("br, identity") == []
+    assert negotiate_encoding("") == []
+
+
+def test_negotiate_encoding_without_zstandard(monkeypatch):
+    monkeypatch.setattr(log_archive, "zstandard", None)
+    assert negotiate_encoding("zstd, gzip;q=0.1") == ["gzip"]
+
+
+def _body(response):
+    async def collect():
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return asyncio.run(collect())
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "game_log_test.txt"
+    path.write_bytes(("第 1 手\n" * 400).encode("utf-8"))
+    return path
+
+
+def test_log_response_serves_ranges(log_file):
+    data = log_file.read_bytes()
+    response = log_response(log_file, {"range": "bytes=10-19", "accept-encoding": "gzip"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 10-19/{len(data)}"
+    assert _body(response) == data[10:20]
+
+
+def test_log_response_ignores_invalid_range_and_416s_unsatisfiable(log_file):
+    data = log_file.read_bytes()
+    ignored = log_response(log_file, {"range": "bytes=5-3"})
+    assert ignored.status_code == 200 and _body(ignored) == data
+
+    rejected = log_response(log_file, {"range": f"bytes={len(data)}-"})
+    assert rejected.status_code == 416
+    assert rejected.headers["content-range"] == f"bytes */{len(data)}"
+
+
+def test_log_response_compresses_and_prefers_precompressed(log_file):
+    data = log_file.read_bytes()
+    streamed = log_response(log_file, {"accept-encoding": "gzip"})
+    assert streamed.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(_body(streamed)) == data
+
+    log_archive.precompress(log_file)
+    stored = log_response(log_file, {"accept-encoding": "gzip"})
+    assert stored.headers["content-length"] == str((log_file.parent / (log_file.name + ".gz")).stat().st_size)
+    assert gzip.decompress(_body(stored)) == data
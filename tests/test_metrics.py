@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from metrics import METRICS, Counter, GameMetrics, Histogram, game_end_reason, render_gauge
+from spectators import SEND_QUEUE_LIMIT, SpectatorClient
+
+
+def test_counter_renders_labels_and_zero_default():
+    counter = Counter("demo_total", "示例", ("model",))
+    counter.inc("a")
+    counter.inc("a", amount=2)
+    counter.inc('say "hi"\n')
+    assert counter.render() == [
+        "# HELP zhajinhua_demo_total 示例",
+        "# TYPE zhajinhua_demo_total counter",
+        'zhajinhua_demo_total{model="a"} 3',
+        'zhajinhua_demo_total{model="say \\"hi\\"\\n"} 1',
+    ]
+    assert Counter("idle_total", "示例").render()[-1] == "zhajinhua_idle_total 0"
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "示例", (1, 0.5), ("model",))
+    for value in (0.2, 0.7, 3):
+        histogram.observe(value, "m")
+    assert histogram.render()[2:] == [
+        'zhajinhua_latency_seconds_bucket{model="m",le="0.5"} 1',
+        'zhajinhua_latency_seconds_bucket{model="m",le="1"} 2',
+        'zhajinhua_latency_seconds_bucket{model="m",le="+Inf"} 3',
+        'zhajinhua_latency_seconds_sum{model="m"} 3.9',
+        'zhajinhua_latency_seconds_count{model="m"} 3',
+    ]
+
+
+def test_render_gauge():
+    assert render_gauge("tables", "牌桌数", [({"state": "running"}, 2), ({}, 0.5)])[2:] == [
+        'zhajinhua_tables{state="running"} 2',
+        "zhajinhua_tables 0.5",
+    ]
+
+
+@pytest.mark.parametrize("reason, label", [
+    ("正常结束", "completed"),
+    ("手动停止", "stopped"),
+    ("崩溃: KeyError('x')", "crashed"),
+    ("无人观看", "other"),
+])
+def test_game_end_reason_has_bounded_labels(reason, label):
+    assert game_end_reason(reason) == label
+
+
+def test_events_drive_counters_and_histograms():
+    metrics = GameMetrics()
+    metrics.observe_event("hand_start", {"hand": 1})
+    metrics.observe_event("action", {"action": "CALL"})
+    metrics.observe_event("forced_fold", {"cause": "timeout"})
+    metrics.observe_event("llm_call", {"model": "m", "call_site": "vote", "outcome": "ok", "latency_ms": 1500,
+                                       "queue_ms": 20, "prompt_chars": 3000, "prompt_tokens": 800,
+                                       "completion_tokens": None})
+    metrics.observe_event("game_end", {"reason": "正常结束"})
+    metrics.observe_event("unknown", {})
+
+    text = metrics.render()
+    assert "zhajinhua_hands_total 1\n" in text
+    assert 'zhajinhua_actions_total{action="CALL"} 1\n' in text
+    assert 'zhajinhua_forced_folds_total{cause="timeout"} 1\n' in text
+    assert 'zhajinhua_llm_calls_total{model="m",call_site="vote",outcome="ok"} 1\n' in text
+    assert 'zhajinhua_llm_tokens_total{model="m",kind="prompt"} 800\n' in text
+    assert 'kind="completion"' not in text
+    assert 'zhajinhua_llm_latency_seconds_bucket{model="m",call_site="vote",le="2"} 1\n' in text
+    assert 'zhajinhua_llm_latency_seconds_bucket{model="m",call_site="vote",le="1"} 0\n' in text
+    assert 'zhajinhua_games_finished_total{reason="completed"} 1\n' in text
+    assert text.endswith("\n")
+
+
+def test_render_reads_table_and_llm_snapshots():
+    channel = {"spectators": 2, "queue_depth": 5, "max_queue_depth": 4}
+    tables = {"max_tables": 8, "tables": [
+        {"running": True, "suspended": False, "channel": channel},
+        {"running": True, "suspended": True, "channel": dict(channel, spectators=0, queue_depth=0)},
+        {"running": False, "channel": dict(channel, spectators=1, queue_depth=1, max_queue_depth=9)},
+    ]}
+    text = GameMetrics().render(tables, {"m": {"in_flight": 3, "waiting": 1}})
+    for line in ('zhajinhua_tables{state="running"} 1', 'zhajinhua_tables{state="suspended"} 1',
+                 'zhajinhua_tables{state="idle"} 1', "zhajinhua_tables_max 8", "zhajinhua_spectators 3",
+                 "zhajinhua_broadcast_queue_depth 6", "zhajinhua_broadcast_max_queue_depth 9",
+                 'zhajinhua_llm_in_flight{model="m"} 3', 'zhajinhua_llm_waiting{model="m"} 1'):
+        assert line + "\n" in text
+
+
+class StalledSocket:
+    async def send_text(self, text):
+        await asyncio.Event().wait()
+
+
+def test_shed_frames_are_counted_in_the_process_counter():
+    def dropped():
+        return METRICS.dropped_frames.values.get((), 0)
+
+    async def scenario():
+        client = SpectatorClient(StalledSocket(), lambda client, reason: None)
+        client.enqueue({"type": "log", "message": "first"})
+        await asyncio.sleep(0)  # 写任务卡在第一帧上
+        for i in range(SEND_QUEUE_LIMIT // 2 + 10):
+            client.enqueue({"type": "stream_chunk", "chunk": str(i)})
+            client.enqueue({"type": "log", "message": str(i)})
+        shed = client.dropped_frames
+        client.fail("发送超时")
+        await asyncio.sleep(0)
+        return shed, client.dropped_frames
+
+    before = dropped()
+    shed, total = asyncio.run(scenario())
+    assert shed == 20
+    assert total > shed  # 断开时队列中剩余的帧也算丢弃
+    assert dropped() - before == total
@@ -0,0 +1,96 @@
+import copy
+import json
+import random
+
+from panel_state import PanelState, diff_panel
+
+
+def apply_ops(state, ops):
+    """与页面 applyPanelOps 相同的补丁应用方式。"""
+    for op in ops:
+        path = op[0]
+        target = state
+        for key in path[:-1]:
+            target = target[key]
+        if len(op) > 1:
+            target[path[-1]] = op[1]
+        else:
+            del target[path[-1]]
+    return state
+
+
+def _panel(pot=640, chips=(1000, 1037, 1074, 1111), **extra):
+    panel = {
+        "hand_count": 7, "current_pot": pot, "global_alert_level": 35.0,
+        "players": [{"name": f"P{i}", "chips": c, "status": "在局中", "inventory": ["ITM_003"]}
+                    for i, c in enumerate(chips)],
+    }
+    panel.update(extra)
+    return panel
+
+
+def _roundtrip(old, new):
+    ops = json.loads(json.dumps(diff_panel(old, new)))  # 经过与线上相同的 JSON 编码
+    return apply_ops(copy.deepcopy(old), ops), ops
+
+
+def test_patch_reproduces_the_new_snapshot():
+    old = _panel()
+    new = _panel(pot=700, chips=(1000, 977, 1074, 1111))
+    new["players"][2]["inventory"] = []  # 列表长度变化：整体替换
+    new["players"][3]["loan"] = {"due_hand": 9}  # 新增键
+    del new["global_alert_level"]  # 删除键
+    patched, ops = _roundtrip(old, new)
+    assert patched == new
+    assert [["current_pot"], 700] in ops
+    assert [["global_alert_level"]] in ops
+
+
+def test_identical_snapshots_produce_no_ops():
+    assert diff_panel(_panel(), _panel()) == []
+
+
+def test_type_change_replaces_the_value():
+    old = _panel(winner=None)
+    new = _panel(winner={"name": "P1"})
+    patched, ops = _roundtrip(old, new)
+    assert patched == new and ops == [[["winner"], {"name": "P1"}]]
+
+
+def test_random_sequence_of_updates_stays_in_sync():
+    rng = random.Random(7)
+    state = PanelState()
+    client = None
+    for _ in range(200):
+        chips = tuple(rng.randrange(0, 3000) for _ in range(4))
+        data = _panel(pot=rng.randrange(0, 2000), chips=chips)
+        if rng.random() < 0.2:
+            data["players"].pop()
+        message = state.update(copy.deepcopy(data))
+        if message is None:
+            continue
+        message = json.loads(json.dumps(message))
+        if message["type"] == "panel_update":
+            client, version = message["data"], message["v"]
+        else:
+            assert message["v"] == version + 1
+            apply_ops(client, message["ops"])
+            version = message["v"]
+        assert client == data
+    assert state.patches > 0
+
+
+def test_versions_and_unchanged_counter():
+    state = PanelState()
+    assert state.update(_panel())["type"] == "panel_update"
+    assert state.update(_panel()) is None
+    patch = state.update(_panel(pot=1))
+    assert patch == {"type": "panel_patch", "v": 2, "ops": [[["current_pot"], 1]]}
+    assert state.describe() == {"version": 2, "patches": 1, "full_snapshots": 1, "unchanged": 1}
+
+
+def test_large_changes_fall_back_to_a_full_snapshot():
+    state = PanelState(max_ops=2)
+    state.update(_panel())
+    message = state.update(_panel(pot=1, chips=(1, 2, 3, 4)))
+    assert message["type"] == "panel_update" and message["v"] == 2
@@ -0,0 +1,52 @@
+import json
+
+from persona_store import PersonaStore
+
+PERSONA = "我是一名来自赌城的老千，表面温文尔雅，实则心狠手辣，从不在牌桌上留下破绽。"
+
+
+def _store(tmp_path, legacy=None):
+    return PersonaStore(tmp_path / "used_personas.jsonl", legacy)
+
+
+def test_add_appends_once_and_reloads(tmp_path):
+    store = _store(tmp_path)
+    assert store.add(PERSONA) is True
+    assert store.add("  " + PERSONA + "  ") is False  # 去掉首尾空白后相同
+    assert store.add("") is False
+
+    lines = (tmp_path / "used_personas.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["text"] for line in lines] == [PERSONA]
+
+    reloaded = _store(tmp_path)
+    assert len(reloaded) == 1 and PERSONA in reloaded
+
+
+def test_near_duplicates_are_found_and_unrelated_text_is_not(tmp_path):
+    store = _store(tmp_path)
+    store.add(PERSONA)
+    store.add("退休的数学教授，只相信概率，说话慢条斯理，喜欢引用统计学名言。")
+
+    near = PERSONA.replace("心狠手辣", "冷酷无情")
+    match = store.find_near_duplicate(near)
+    assert match is not None and match[0] == PERSONA and match[1] >= 0.5
+    assert store.find_near_duplicate("一只会打牌的橘猫，看到鱼就会立刻梭哈。") is None
+
+
+def test_legacy_json_is_migrated(tmp_path):
+    legacy = tmp_path / "used_personas.json"
+    legacy.write_text(json.dumps([{"text": "旧人设一"}, {"text": "旧人设二"}], ensure_ascii=False), encoding="utf-8")
+    store = _store(tmp_path, legacy)
+    assert len(store) == 2
+    assert (tmp_path / "used_personas.jsonl").exists()
+
+
+def test_prompt_sample_is_bounded_and_ends_with_recent(tmp_path):
+    store = _store(tmp_path)
+    texts = [f"人设编号 {i}，风格各不相同的玩家 {i * 7}" for i in range(30)]
+    for text in texts:
+        store.add(text)
+    sample = store.sample_for_prompt(recent=3, random_count=2)
+    assert len(sample) == 5
+    assert sample[-3:] == texts[-3:]
+    assert set(sample[:2]) <= set(texts[:-3])
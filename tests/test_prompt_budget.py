@@ -0,0 +1,47 @@
+from prompt_budget import MIN_SECTION_TOKENS, PromptBudgeter, estimate_tokens
+
+
+def _inventory(count=5):
+    description = "暂时禁止一名对手执行 RAISE，持续两个回合，期间对手只能跟注或弃牌。" * 3
+    return "\n".join(f"  - 锁筹卡{i} (ITM_00{i}): {description}" for i in range(count))
+
+
+def test_under_budget_sections_are_untouched():
+    budgeter = PromptBudgeter({"default": 10_000})
+    sections = {"opponent_reflections": "复盘" * 50}
+    assert budgeter.fit("m", ("固定",), sections) == (sections, 0)
+    assert budgeter.describe() == {"trimmed_prompts": 0, "tokens_saved": 0}
+
+
+def test_lowest_priority_section_is_trimmed_first():
+    budgeter = PromptBudgeter({"default": 400})
+    sections = {"opponent_reflections": "复盘内容" * 100, "my_persona": "人设" * 50}
+    fitted, saved = budgeter.fit("m", ("x" * 40,), sections)
+    assert saved > 0
+    assert fitted["my_persona"] == sections["my_persona"]
+    assert estimate_tokens(fitted["opponent_reflections"]) < estimate_tokens(sections["opponent_reflections"])
+    assert budgeter.describe()["tokens_saved"] == saved
+
+
+def test_fixed_parts_count_against_the_budget():
+    sections = {"opponent_reflections": "复盘内容" * 100}
+    _, saved_small = PromptBudgeter({"default": 500}).fit("m", ("短",), sections)
+    _, saved_large = PromptBudgeter({"default": 500}).fit("m", ("长" * 300,), sections)
+    assert saved_large > saved_small
+
+
+def test_inventory_keeps_every_item_name_and_id():
+    inventory = _inventory()
+    for budget in (300, 120, 10):
+        fitted, _ = PromptBudgeter({"default": budget}).fit("m", ("x" * 100,), {"player_inventory": inventory})
+        lines = fitted["player_inventory"].split("\n")
+        assert len(lines) == 5
+        for i, line in enumerate(lines):
+            assert line.startswith(f"  - 锁筹卡{i} (ITM_00{i})")
+
+
+def test_small_sections_are_never_trimmed():
+    sections = {"opponent_reflections": "短"}
+    assert estimate_tokens("短") <= MIN_SECTION_TOKENS
+    fitted, saved = PromptBudgeter({"default": 1}).fit("m", ("x" * 400,), sections)
+    assert fitted == sections and saved == 0
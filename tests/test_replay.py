@@ -0,0 +1,177 @@
+import asyncio
+import json
+import random
+import re
+from collections import deque
+
+import pytest
+
+import persona_store
+import replay
+from game_controller import GameController
+from game_log import GameLogWriter, encode_event, iter_events
+from pacing import Pacer
+from persona_store import PersonaStore
+from replay import (COMPLETED_REASON, RecordedCall, RecordedTournament, ReplayDivergence, ReplayExhausted,
+                    ReplayLLMClient, StreamingRecording, build_replay_controller, replay_tournament)
+
+PLAYERS = [{"name": name, "model": "test-model"} for name in ("甲", "乙", "丙", "丁")]
+_ACTION_LINE = re.compile(r"- ([A-Z_]+): 成本=")
+
+
+class ScriptedLLMClient:
+    """按调用点返回随机但合法的回复 (自带种子)，并像 LLMClient 一样回调调用元数据。"""
+
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.call_listener = None
+
+    def _respond(self, call_site: str, text: str) -> str:
+        if call_site == "create_persona":
+            return f"我是测试人设 {self.rng.randint(0, 10 ** 9)}，出手果断。"
+        if call_site == "auction_bid":
+            return json.dumps({"bid": self.rng.choice([0, 0, 100])})
+        if call_site == "decide_bribe":
+            return json.dumps({"bribe": self.rng.random() < 0.5})
+        if call_site == "vote":
+            return json.dumps({"vote": self.rng.choice(["GUILTY", "NOT_GUILTY"])})
+        if call_site == "reflect":
+            return json.dumps({"public_reflection": "下一手再战", "private_impressions": {}}, ensure_ascii=False)
+        if call_site == "decide_action":
+            actions = [a for a in _ACTION_LINE.findall(text) if a in ("CALL", "FOLD", "LOOK", "ALL_IN_SHOWDOWN")]
+            action = self.rng.choices(actions, weights=[{"CALL": 3, "FOLD": 1, "LOOK": 1, "ALL_IN_SHOWDOWN": 2}[a]
+                                                        for a in actions])[0] if actions else "FOLD"
+            return json.dumps({"action": action, "reason": "测试", "mood": "平静", "speech": None},
+                              ensure_ascii=False)
+        return "{}"
+
+    async def chat_stream(self, messages, model, stream_callback, call_site: str = "") -> str:
+        response = self._respond(call_site, "\n".join(m["content"] for m in messages))
+        await stream_callback(response)
+        if self.call_listener is not None:
+            self.call_listener({"model": model, "call_site": call_site, "outcome": "ok", "response": response})
+        return response
+
+
+async def _noop(*args, **kwargs):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def isolated_persona_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(persona_store, "_STORE", PersonaStore(tmp_path / "used_personas.jsonl", None))
+
+
+async def _record(tmp_path, seed: int) -> GameLogWriter:
+    """像牌桌一样录制一整局 (game_start、控制器事件、game_end)，返回已关闭的日志。"""
+    writer = GameLogWriter("game_log_test", log_dir=tmp_path)
+    writer.open()
+    writer.add_event("game_start", {"hand": 0, "seed": seed, "players": PLAYERS})
+    controller = GameController([dict(p) for p in PLAYERS], _noop, _noop, _noop, _noop,
+                                pacer=Pacer("headless"), event_callback=writer.add_event,
+                                rng=random.Random(seed))
+    for i, player in enumerate(controller.players):
+        player.llm_client = ScriptedLLMClient(seed * 10 + i)
+        player.llm_client.call_listener = lambda meta, i=i: controller._emit("llm_call", player=i, **meta)
+    await asyncio.wait_for(controller.run_game(), 60)
+    writer.add_event("game_end", {"hand": controller.hand_count, "reason": COMPLETED_REASON,
+                                  "chips": list(controller.persistent_chips)})
+    await writer.close()
+    return writer
+
+
+def _recorded(tmp_path, seed: int = 7):
+    return asyncio.run(_record(tmp_path, seed)).events_path
+
+
+def test_replay_reproduces_recorded_chip_trajectory(tmp_path):
+    events_path = _recorded(tmp_path)
+    recorded_calls = sum(1 for event in iter_events(events_path) if event["type"] == "llm_call")
+
+    result = asyncio.run(replay_tournament(events_path))
+
+    assert result.ok, result.summary()
+    assert result.completed
+    assert result.actual == result.expected and len(result.expected) > 1
+    assert result.calls_replayed == recorded_calls
+
+
+def test_replay_is_deterministic_across_runs(tmp_path):
+    events_path = _recorded(tmp_path, seed=11)
+
+    first = asyncio.run(replay_tournament(events_path))
+    second = asyncio.run(replay_tournament(events_path))
+
+    assert first.ok and second.ok
+    assert first.actual == second.actual
+    assert first.calls_replayed == second.calls_replayed
+
+
+def test_streaming_recording_replays_the_same_trajectory(tmp_path):
+    events_path = _recorded(tmp_path)
+    expected = RecordedTournament.load(events_path).trajectory
+    actual = []
+
+    def on_event(kind, data):
+        if kind in replay.TRAJECTORY_EVENTS:
+            actual.append(replay.trajectory_point(dict(data, type=kind)))
+
+    async def run():
+        source = StreamingRecording(events_path)
+        controller, _ = build_replay_controller(source, _noop, _noop, _noop, _noop,
+                                                pacer=Pacer("headless"), event_callback=on_event)
+        try:
+            await controller.run_game()
+        finally:
+            source.close()
+
+    asyncio.run(run())
+    assert actual == expected
+
+
+def test_interrupted_recording_replays_up_to_where_it_stopped(tmp_path):
+    events_path = _recorded(tmp_path)
+    events = list(iter_events(events_path))
+    hand_starts = [i for i, event in enumerate(events) if event["type"] == "hand_start"]
+    assert len(hand_starts) >= 2
+    # 模拟在第二手中途停止：去掉之后的全部事件 (包括 game_end)
+    cut = hand_starts[1] + 3
+    events_path.write_bytes(b"".join(encode_event(event) for event in events[:cut]))
+
+    result = asyncio.run(replay_tournament(events_path))
+
+    assert not result.completed
+    assert result.ok, result.summary()
+    assert result.actual == result.expected[:len(result.actual)]
+
+
+def test_replay_client_distinguishes_exhausted_from_divergent():
+    async def call(recording):
+        return await ReplayLLMClient(recording, 0).chat_stream([], "m", _noop, call_site="decide_action")
+
+    stopped = RecordedTournament(path=None, seed=1)
+    with pytest.raises(ReplayExhausted):
+        asyncio.run(call(stopped))
+
+    finished = RecordedTournament(path=None, seed=1, end_reason=COMPLETED_REASON)
+    with pytest.raises(ReplayDivergence):
+        asyncio.run(call(finished))
+
+    finished.calls[(0, "decide_action")] = deque([RecordedCall(1, "ok", '{"action": "FOLD"}')])
+    chunks = []
+
+    async def collect(chunk):
+        chunks.append(chunk)
+
+    response = asyncio.run(ReplayLLMClient(finished, 0).chat_stream([], "m", collect, call_site="decide_action"))
+    assert response == '{"action": "FOLD"}' and chunks == [response]
+
+
+def test_recording_without_game_start_is_rejected(tmp_path):
+    events_path = tmp_path / "bad.events.jsonl"
+    events_path.write_bytes(encode_event({"seq": 1, "type": "hand_start", "hand": 1}))
+
+    with pytest.raises(ValueError):
+        RecordedTournament.load(events_path)
+    with pytest.raises(ValueError):
+        StreamingRecording(events_path)
@@ -0,0 +1,58 @@
+import asyncio
+import json
+
+from spectators import SpectatorClient
+
+
+class BlockedSocket:
+    """第一帧之后阻塞，直到测试放行。"""
+
+    def __init__(self):
+        self.frames = []
+        self.gate = asyncio.Event()
+
+    async def send_text(self, text):
+        await self.gate.wait()
+        self.frames.append(json.loads(text))
+
+
+def _run_client(messages):
+    async def scenario():
+        ws = BlockedSocket()
+        client = SpectatorClient(ws, lambda client, reason: None)
+        client.enqueue({"type": "log", "message": "first"})
+        await asyncio.sleep(0)  # 写任务取走第一帧并阻塞，其余消息在队列中积压
+        for message in messages:
+            client.enqueue(message)
+        ws.gate.set()
+        for _ in range(50):
+            await asyncio.sleep(0)
+        client.close()
+        return ws.frames[1:], client
+
+    return asyncio.run(scenario())
+
+
+def test_superseded_snapshot_keeps_its_slot_and_drops_covered_patches():
+    frames, client = _run_client([
+        {"type": "panel_update", "v": 1, "data": {}},
+        {"type": "panel_patch", "v": 2, "ops": []},
+        {"type": "log", "message": "between"},
+        {"type": "panel_patch", "v": 3, "ops": []},
+        {"type": "panel_update", "v": 3, "data": {"pot": 1}},
+        {"type": "panel_patch", "v": 4, "ops": []},
+    ])
+    assert [(f["type"], f.get("v", f.get("message"))) for f in frames] == [
+        ("panel_update", 3), ("log", "between"), ("panel_patch", 4),
+    ]
+    assert frames[0]["data"] == {"pot": 1}
+    assert client.coalesced_frames == 3
+
+
+def test_latest_only_kinds_keep_only_the_newest_value():
+    frames, _ = _run_client([
+        {"type": "spectators", "count": 1},
+        {"type": "log", "message": "x"},
+        {"type": "spectators", "count": 2},
+    ])
+    assert frames == [{"type": "spectators", "count": 2}, {"type": "log", "message": "x"}]
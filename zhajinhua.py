@@ -7,9 +7,11 @@ class ZhajinhuaGame:
     def __init__(self, config: GameConfig = GameConfig(),
                  initial_chips_list: List[int] | None = None,
                  start_player_id: int = 0,
-                 event_listeners: Optional[Dict[str, Callable[..., Optional[dict]]]] = None):
+                 event_listeners: Optional[Dict[str, Callable[..., Optional[dict]]]] = None,
+                 rng=None):
         # ... (_init_game 逻辑不变) ...
         self.config = config
+        self.rng = rng if rng is not None else random  # (新) 每张牌桌独立的随机源，便于按种子重放
         self._event_listeners: Dict[str, Callable[..., Optional[dict]]] = event_listeners or {}
         if initial_chips_list is None:
             initial_chips_list = [self.config.initial_chips] * self.config.num_players
@@ -17,7 +19,7 @@ class ZhajinhuaGame:
 
     def _init_game(self, current_chips: List[int], start_player_id: int) -> GameState:
         # ... (此函数无修改) ...
-        deck = create_deck()
+        deck = create_deck(self.rng)
         players = []
         for i in range(self.config.num_players):
             players.append(PlayerState(chips=current_chips[i]))